@@ -2,9 +2,9 @@ from __future__ import annotations
 
 import asyncio
 import threading
-from collections import deque
-from dataclasses import dataclass
-from typing import Any, Deque, Dict
+from collections import OrderedDict, defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Any, DefaultDict, Deque, Sequence
 
 
 @dataclass
@@ -12,6 +12,37 @@ class SessionChannel:
     events: Deque[dict[str, Any]]
     condition: asyncio.Condition | None = None
     loop: asyncio.AbstractEventLoop | None = None
+    # Per-type view of ``events`` in the same FIFO order, so typed lookups skip a full backlog scan.
+    events_by_type: DefaultDict[Any, Deque[dict[str, Any]]] = field(default_factory=lambda: defaultdict(deque))
+
+    def append(self, event: dict[str, Any]) -> None:
+        if self.events.maxlen is not None and len(self.events) == self.events.maxlen:
+            self._unindex(self.events[0])
+        self.events.append(event)
+        self.events_by_type[event.get("type")].append(event)
+
+    def popleft(self) -> dict[str, Any]:
+        event = self.events.popleft()
+        self._unindex(event)
+        return event
+
+    def clear(self) -> int:
+        cleared = len(self.events)
+        self.events.clear()
+        self.events_by_type.clear()
+        return cleared
+
+    def events_of(self, event_type: str) -> Sequence[dict[str, Any]]:
+        return tuple(self.events_by_type.get(event_type, ()))
+
+    def _unindex(self, event: dict[str, Any]) -> None:
+        # Both views are FIFO, so the oldest event overall is also the oldest of its type.
+        event_type = event.get("type")
+        bucket = self.events_by_type.get(event_type)
+        if bucket:
+            bucket.popleft()
+            if not bucket:
+                del self.events_by_type[event_type]
 
 
 class EventBroker:
@@ -21,20 +52,20 @@ class EventBroker:
     Tracks a small backlog of events per session and notifies active listeners
     via an asyncio.Condition. When no listeners are connected, published events
     are stored in the backlog and replayed the next time a listener subscribes.
+    At most ``max_channels`` sessions are kept; the least recently used channel
+    without an active listener is evicted first.
     """
 
-    def __init__(self, max_backlog: int = 200) -> None:
+    def __init__(self, max_backlog: int = 200, max_channels: int = 512) -> None:
         self._lock = threading.RLock()
-        self._channels: Dict[str, SessionChannel] = {}
+        self._channels: OrderedDict[str, SessionChannel] = OrderedDict()
         self._max_backlog = max_backlog
+        self._max_channels = max_channels
 
     def register(self, session_id: str) -> SessionChannel:
         loop = asyncio.get_running_loop()
         with self._lock:
-            channel = self._channels.get(session_id)
-            if channel is None:
-                channel = SessionChannel(events=deque(maxlen=self._max_backlog))
-                self._channels[session_id] = channel
+            channel = self._get_or_create(session_id)
             if channel.condition is None:
                 channel.condition = asyncio.Condition()
             channel.loop = loop
@@ -57,25 +88,38 @@ class EventBroker:
             channel = self._channels.get(session_id)
             if channel is None:
                 return 0
-            cleared = len(channel.events)
-            channel.events.clear()
-            return cleared
+            return channel.clear()
 
     def publish(self, session_id: str, event: dict[str, Any]) -> None:
         with self._lock:
-            channel = self._channels.get(session_id)
-            if channel is None:
-                channel = SessionChannel(events=deque(maxlen=self._max_backlog))
-                self._channels[session_id] = channel
+            channel = self._get_or_create(session_id)
             loop = channel.loop
             condition = channel.condition
 
         if condition is None or loop is None or not loop.is_running():
-            channel.events.append(event)
+            channel.append(event)
             return
 
         asyncio.run_coroutine_threadsafe(self._push(channel, event), loop)
 
+    def _get_or_create(self, session_id: str) -> SessionChannel:
+        channel = self._channels.get(session_id)
+        if channel is not None:
+            self._channels.move_to_end(session_id)
+            return channel
+
+        channel = SessionChannel(events=deque(maxlen=self._max_backlog))
+        self._channels[session_id] = channel
+        if len(self._channels) > self._max_channels:
+            self._evict_idle(keep=session_id)
+        return channel
+
+    def _evict_idle(self, *, keep: str) -> None:
+        for candidate_id, candidate in self._channels.items():
+            if candidate_id != keep and candidate.loop is None:
+                del self._channels[candidate_id]
+                return
+
     async def next_event(
         self,
         session_id: str,
@@ -87,12 +131,12 @@ class EventBroker:
 
         if condition is None:
             if channel.events:
-                return channel.events.popleft()
+                return channel.popleft()
             raise asyncio.TimeoutError("No events available.")
 
         async with condition:
             if channel.events:
-                return channel.events.popleft()
+                return channel.popleft()
 
             if timeout is None:
                 await condition.wait()
@@ -100,19 +144,24 @@ class EventBroker:
                 await asyncio.wait_for(condition.wait(), timeout=timeout)
 
             if channel.events:
-                return channel.events.popleft()
+                return channel.popleft()
             raise asyncio.TimeoutError("No events available.")
 
     async def _push(self, channel: SessionChannel, event: dict[str, Any]) -> None:
         if channel.condition is None:
-            channel.events.append(event)
+            channel.append(event)
             return
 
         async with channel.condition:
-            channel.events.append(event)
+            channel.append(event)
             channel.condition.notify_all()
 
 
 event_broker = EventBroker()
 
 
+def get_event_broker() -> EventBroker:
+    """
+    FastAPI dependency returning the process-wide broker; tests override it with an isolated instance.
+    """
+    return event_broker
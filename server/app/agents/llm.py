@@ -3,9 +3,10 @@ from __future__ import annotations
 import json
 import threading
 from collections import deque
+from contextlib import contextmanager
 import hashlib
 from dataclasses import dataclass
-from typing import Any, Callable, Deque, Dict, Optional, Protocol, Sequence, Tuple, Type, TypeVar
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, Optional, Protocol, Sequence, Tuple, Type, TypeVar
 
 from pydantic import BaseModel
 
@@ -51,16 +52,21 @@ class PlannerLlm(Protocol):
         ...
 
 
+def _digest(data: str) -> str:
+    # A 16-byte BLAKE2b digest is cheaper than SHA-256 and keeps cache keys a fixed, short size.
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
+
+
 def _hash_variables(variables: dict[str, Any]) -> str:
     try:
         payload = json.dumps(variables, sort_keys=True, default=str)
     except TypeError as exc:  # pragma: no cover - defensive
         raise PlannerLlmError(f"Variables not JSON serializable: {variables}") from exc
-    return payload
+    return _digest(payload)
 
 
 def _hash_prompt(prompt: str) -> str:
-    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    return _digest(prompt)
 
 
 @dataclass
@@ -166,11 +172,14 @@ class _BasePlannerLlm:
         raise NotImplementedError  # pragma: no cover - implemented by subclasses
 
 
-_fake_responses: Deque[dict[str, Any]] = deque()
+# Payloads are raw dicts to validate against the requested schema, or ready-built schema instances.
+FakePayload = dict[str, Any] | BaseModel
+
+_fake_responses: Deque[FakePayload] = deque()
 _fake_lock = threading.RLock()
 
 
-def queue_fake_response(payload: dict[str, Any]) -> None:
+def queue_fake_response(payload: FakePayload) -> None:
     with _fake_lock:
         _fake_responses.append(payload)
 
@@ -180,6 +189,24 @@ def clear_fake_responses() -> None:
         _fake_responses.clear()
 
 
+def queue_fake_responses(payloads: Iterable[FakePayload]) -> None:
+    with _fake_lock:
+        _fake_responses.extend(payloads)
+
+
+@contextmanager
+def fake_responses(*payloads: FakePayload) -> Iterator[None]:
+    """
+    Queues the given planner responses for the duration of the block and discards leftovers on exit.
+    """
+    clear_fake_responses()
+    queue_fake_responses(payloads)
+    try:
+        yield
+    finally:
+        clear_fake_responses()
+
+
 class _FakePlannerLlm(_BasePlannerLlm):
     def _invoke_model(
         self,
@@ -191,6 +218,8 @@ class _FakePlannerLlm(_BasePlannerLlm):
             if not _fake_responses:
                 raise PlannerLlmError("No fake responses queued for planner LLM")
             payload = _fake_responses.popleft()
+        if isinstance(payload, schema):
+            return payload
         return schema.model_validate(payload)
 
     async def _invoke_model_async(
@@ -344,7 +373,9 @@ __all__ = [
     "PlannerLlmError",
     "PlannerLlmFactory",
     "clear_fake_responses",
+    "fake_responses",
     "get_planner_llm",
     "queue_fake_response",
+    "queue_fake_responses",
 ]
 
@@ -5,13 +5,14 @@ import datetime as dt
 import json
 import re
 import time
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
+from functools import lru_cache
 from typing import Any, Callable, List, Optional
 
 from langgraph.graph import END, START, StateGraph
 
-from app.agents.events import event_broker
+from app.agents.events import EventBroker, get_event_broker
 from app.agents.llm import PlannerLlmFactory
 from app.agents.memory import memory_store
 from app.agents.prompts import (
@@ -126,17 +127,6 @@ def _timestamp() -> str:
     return dt.datetime.now(dt.UTC).isoformat()
 
 
-def _publish_event(session_id: str, event_type: str, node: str, data: dict[str, Any] | None = None) -> None:
-    payload = {
-        "sessionId": session_id,
-        "type": event_type,
-        "node": node,
-        "timestamp": _timestamp(),
-        "data": data or {},
-    }
-    event_broker.publish(session_id, payload)
-
-
 @dataclass
 class PlannerContext:
     calculator_factory: Callable[[], CalculatorService]
@@ -145,6 +135,7 @@ class PlannerContext:
     llm_factory: PlannerLlmFactory
     max_llm_calls: int
     callbacks: tuple[Any, ...] | None = None
+    broker: EventBroker = field(default_factory=get_event_broker)
 
 
 @dataclass
@@ -170,6 +161,18 @@ class ChatPlanner:
         self._llm = context.llm_factory()
         self._graph = self._build_graph()
 
+    def _publish_event(
+        self, session_id: str, event_type: str, node: str, data: dict[str, Any] | None = None
+    ) -> None:
+        payload = {
+            "sessionId": session_id,
+            "type": event_type,
+            "node": node,
+            "timestamp": _timestamp(),
+            "data": data or {},
+        }
+        self._context.broker.publish(session_id, payload)
+
     def _build_graph(self):
         graph = StateGraph(dict)
         graph.add_node("classify_intent", self._node_classify_intent)
@@ -248,18 +251,18 @@ class ChatPlanner:
         chat_state: ChatState = state["chat_state"]
         budget: PlannerBudget = state["budget"]
 
-        _publish_event(chat_state.sessionId, "node_start", "classify_intent")
+        self._publish_event(chat_state.sessionId, "node_start", "classify_intent")
         intent = await self._classify_intent_with_llm(chat_state, budget)
         if intent is None:
             intent = Intent.unknown
         chat_state.intent = intent.value
-        _publish_event(
+        self._publish_event(
             chat_state.sessionId,
             "decision",
             "classify_intent",
             {"intent": chat_state.intent},
         )
-        _publish_event(chat_state.sessionId, "node_end", "classify_intent")
+        self._publish_event(chat_state.sessionId, "node_end", "classify_intent")
         return state
 
     async def _classify_intent_with_llm(
@@ -346,7 +349,7 @@ class ChatPlanner:
             payload["latencyMs"] = round(latency_ms, 2)
         if extra:
             payload.update(extra)
-        _publish_event(chat_state.sessionId, "llm_call", node, payload)
+        self._publish_event(chat_state.sessionId, "llm_call", node, payload)
 
     async def _synthesize_with_llm(
         self,
@@ -368,7 +371,7 @@ class ChatPlanner:
         variables = {
             "conversation": self._format_conversation(chat_state.messages),
             "intent": chat_state.intent,
-            "slots_json": json.dumps(chat_state.slots.model_dump(), ensure_ascii=False),
+            "slots_json": chat_state.slots.model_dump_json(),
             "tool_summary": self._build_tool_summary(chat_state),
         }
         prompt_text = SYNTHESIS_PROMPT.render(variables)
@@ -493,13 +496,13 @@ class ChatPlanner:
         intent = Intent(chat_state.intent or Intent.unknown)
         budget: PlannerBudget = state["budget"]
 
-        _publish_event(chat_state.sessionId, "node_start", "extract_slots")
+        self._publish_event(chat_state.sessionId, "node_start", "extract_slots")
         llm_slots = await self._extract_slots_with_llm(intent, chat_state, budget)
         if llm_slots is not None:
             chat_state.slots = llm_slots
         else:
             chat_state.slots = SlotState()
-        _publish_event(
+        self._publish_event(
             chat_state.sessionId,
             "node_end",
             "extract_slots",
@@ -586,10 +589,9 @@ class ChatPlanner:
             )
             return None
 
-        slots_payload = slots.model_dump()
         variables = {
             "intent": intent.value,
-            "slots_json": json.dumps(slots_payload, ensure_ascii=False),
+            "slots_json": slots.model_dump_json(),
             "conversation": self._format_conversation(chat_state.messages),
         }
         prompt_text = DECISION_PROMPT.render(variables)
@@ -632,7 +634,7 @@ class ChatPlanner:
         intent_value = chat_state.intent or Intent.unknown.value
         intent = Intent(intent_value)
         budget: PlannerBudget = state["budget"]
-        _publish_event(chat_state.sessionId, "node_start", "decide_action")
+        self._publish_event(chat_state.sessionId, "node_start", "decide_action")
 
         slots = chat_state.slots
         decision = await self._decide_action_with_llm(intent, slots, chat_state, budget)
@@ -652,18 +654,18 @@ class ChatPlanner:
             chat_state.metadata["productAggregation"] = is_aggregation
 
         state["decision"] = decision.value
-        _publish_event(
+        self._publish_event(
             chat_state.sessionId,
             "decision",
             "decide_action",
             {"decision": decision.value},
         )
-        _publish_event(chat_state.sessionId, "node_end", "decide_action")
+        self._publish_event(chat_state.sessionId, "node_end", "decide_action")
         return state
 
     async def _node_ask_follow_up(self, state: dict[str, Any]) -> dict[str, Any]:
         chat_state: ChatState = state["chat_state"]
-        _publish_event(chat_state.sessionId, "node_start", "ask_follow_up")
+        self._publish_event(chat_state.sessionId, "node_start", "ask_follow_up")
         intent = Intent(chat_state.intent or Intent.unknown.value)
         budget: PlannerBudget = state["budget"]
         prompt_status = ToolStatus.success
@@ -684,7 +686,7 @@ class ChatPlanner:
             message=prompt,
         )
         state.setdefault("actions", []).append(action)
-        _publish_event(
+        self._publish_event(
             chat_state.sessionId,
             "node_end",
             "ask_follow_up",
@@ -697,7 +699,7 @@ class ChatPlanner:
         slots = chat_state.slots
         service = self._context.calculator_factory()
 
-        _publish_event(chat_state.sessionId, "node_start", "call_calc", {"expression": slots.calcExpression})
+        self._publish_event(chat_state.sessionId, "node_start", "call_calc", {"expression": slots.calcExpression})
 
         try:
             result = await asyncio.to_thread(service.evaluate, slots.calcExpression or "")
@@ -721,7 +723,7 @@ class ChatPlanner:
             )
 
         state.setdefault("actions", []).append(action)
-        _publish_event(
+        self._publish_event(
             chat_state.sessionId,
             "node_end",
             "call_calc",
@@ -734,7 +736,7 @@ class ChatPlanner:
         service = self._context.products_factory()
         query = chat_state.slots.productQuery or ""
 
-        _publish_event(chat_state.sessionId, "node_start", "call_products", {"query": query})
+        self._publish_event(chat_state.sessionId, "node_start", "call_products", {"query": query})
 
         try:
             result = await service.search_async(query)
@@ -758,7 +760,7 @@ class ChatPlanner:
             )
 
         state.setdefault("actions", []).append(action)
-        _publish_event(
+        self._publish_event(
             chat_state.sessionId,
             "node_end",
             "call_products",
@@ -772,7 +774,7 @@ class ChatPlanner:
         raw_question = chat_state.messages[-1].content.strip()
         query = buildOutletsQueryFromContext(chat_state)
 
-        _publish_event(chat_state.sessionId, "node_start", "call_outlets", {"query": query})
+        self._publish_event(chat_state.sessionId, "node_start", "call_outlets", {"query": query})
 
         try:
             result = await service.query_async(query)
@@ -809,7 +811,7 @@ class ChatPlanner:
             )
 
         state.setdefault("actions", []).append(action)
-        _publish_event(
+        self._publish_event(
             chat_state.sessionId,
             "node_end",
             "call_outlets",
@@ -819,7 +821,7 @@ class ChatPlanner:
 
     async def _node_respond_smalltalk(self, state: dict[str, Any]) -> dict[str, Any]:
         chat_state: ChatState = state["chat_state"]
-        _publish_event(chat_state.sessionId, "node_start", "respond_smalltalk")
+        self._publish_event(chat_state.sessionId, "node_start", "respond_smalltalk")
 
         state.setdefault("actions", []).append(
             ToolAction(
@@ -830,13 +832,13 @@ class ChatPlanner:
                 data={"decision": Decision.respond_smalltalk.value},
             )
         )
-        _publish_event(chat_state.sessionId, "node_end", "respond_smalltalk")
+        self._publish_event(chat_state.sessionId, "node_end", "respond_smalltalk")
         return state
 
     async def _node_synthesize(self, state: dict[str, Any]) -> dict[str, Any]:
         chat_state: ChatState = state["chat_state"]
         budget: PlannerBudget = state["budget"]
-        _publish_event(chat_state.sessionId, "node_start", "synthesize")
+        self._publish_event(chat_state.sessionId, "node_start", "synthesize")
 
         synthesis = await self._synthesize_with_llm(chat_state, budget)
         if synthesis is not None:
@@ -848,7 +850,7 @@ class ChatPlanner:
 
         message = ChatMessage(role="assistant", content=response_text)
         chat_state.append_message(message)
-        _publish_event(
+        self._publish_event(
             chat_state.sessionId,
             "node_end",
             "synthesize",
@@ -880,7 +882,7 @@ class ChatPlanner:
 
         variables = {
             "intent": intent.value,
-            "slots_json": json.dumps(chat_state.slots.model_dump(), ensure_ascii=False),
+            "slots_json": chat_state.slots.model_dump_json(),
             "conversation": self._format_conversation(chat_state.messages),
         }
         prompt_text = FOLLOW_UP_PROMPT.render(variables)
@@ -1030,6 +1032,27 @@ def buildOutletsQueryFromContext(chat_state: ChatState) -> str:
         if len(city_set) >= 3 and len(outlet_names) >= 3:
             break
 
+    return _compose_outlets_query(
+        latest_question,
+        previous_query,
+        assistant_context,
+        tuple(outlet_names[:3]),
+        tuple(city_set[:3]),
+    )
+
+
+@lru_cache(maxsize=128)
+def _compose_outlets_query(
+    latest_question: str,
+    previous_query: str,
+    assistant_context: str,
+    outlet_names: tuple[str, ...],
+    cities: tuple[str, ...],
+) -> str:
+    """
+    Assemble the enriched outlets query; memoized because follow-ups often repeat the same context.
+    """
+
     summary_bits: list[str] = []
     seen_sentences: set[str] = set()
 
@@ -1047,11 +1070,9 @@ def buildOutletsQueryFromContext(chat_state: ChatState) -> str:
     add_sentence("Previous outlets question: ", previous_query)
     add_sentence("Previous assistant response: ", assistant_context)
     if outlet_names:
-        joined = ", ".join(outlet_names[:3])
-        add_sentence("Previous results mentioned: ", joined)
-    elif city_set:
-        joined = ", ".join(city_set[:3])
-        add_sentence("Previous results covered cities: ", joined)
+        add_sentence("Previous results mentioned: ", ", ".join(outlet_names))
+    elif cities:
+        add_sentence("Previous results covered cities: ", ", ".join(cities))
 
     summary = " ".join(summary_bits).strip()
     if not summary:
@@ -1110,6 +1131,7 @@ def create_planner(
     llm_factory: PlannerLlmFactory,
     max_llm_calls: int,
     callbacks: tuple[Any, ...] | None = None,
+    broker: EventBroker | None = None,
 ) -> ChatPlanner:
     context = PlannerContext(
         calculator_factory=calculator_factory,
@@ -1118,6 +1140,7 @@ def create_planner(
         llm_factory=llm_factory,
         max_llm_calls=max_llm_calls,
         callbacks=callbacks,
+        broker=broker or get_event_broker(),
     )
     return ChatPlanner(context)
 
@@ -3,7 +3,7 @@ from __future__ import annotations
 from fastapi import APIRouter, Depends, Response
 from sqlalchemy.orm import Session
 
-from app.agents.events import event_broker
+from app.agents.events import EventBroker, get_event_broker
 from app.agents.llm import get_planner_llm
 from app.agents.planner import ChatPlanner, create_planner
 from app.agents.memory import memory_store
@@ -19,7 +19,10 @@ from app.core.langfuse import get_langchain_callbacks
 router = APIRouter(prefix="/chat", tags=["chat"])
 
 
-def get_chat_planner(session: Session = Depends(get_session)) -> ChatPlanner:
+def get_chat_planner(
+    session: Session = Depends(get_session),
+    broker: EventBroker = Depends(get_event_broker),
+) -> ChatPlanner:
     settings = get_settings()
     callbacks = tuple(get_langchain_callbacks(settings))
     llm_factory = get_planner_llm(settings, callbacks=callbacks)
@@ -35,6 +38,7 @@ def get_chat_planner(session: Session = Depends(get_session)) -> ChatPlanner:
         llm_factory=llm_factory,
         max_llm_calls=settings.planner_max_calls_per_turn,
         callbacks=callbacks,
+        broker=broker,
     )
 
 
@@ -47,9 +51,12 @@ async def chat_with_agent(
 
 
 @router.delete("/session/{session_id}", status_code=204)
-async def reset_chat_session(session_id: str) -> Response:
+async def reset_chat_session(
+    session_id: str,
+    broker: EventBroker = Depends(get_event_broker),
+) -> Response:
     memory_store.clear(session_id)
-    event_broker.clear(session_id)
+    broker.clear(session_id)
     return Response(status_code=204)
 
 
@@ -15,6 +15,10 @@ class AppSettings(BaseSettings):
     embeddings_provider: str = "openai"
     vector_store_path: str = "./data/faiss/products"
     product_vector_store_backend: str = "faiss"  # faiss | pinecone
+    # Drop retrieved products scoring below this relevance; unset keeps every hit. The scale
+    # depends on the backend: FAISS (L2 index) scores 1 - ||a-b||^2 / sqrt(2), about -1.83..1
+    # for unit-length embeddings (cosine 0.29 maps to 0); Pinecone scores (cosine + 1) / 2.
+    product_min_relevance_score: float | None = None
     pinecone_api_key: str | None = None
     pinecone_index_name: str | None = None
     pinecone_cloud: str = "aws"
@@ -1,3 +1,6 @@
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -6,6 +9,13 @@ from app.core.config import get_settings
 from app.core.exceptions import register_exception_handlers
 from app.core.logging import configure_logging
 from app.core.middleware import RequestContextMiddleware
+from app.services.calculator_http import close_shared_services
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    yield
+    close_shared_services()
 
 
 def create_app() -> FastAPI:
@@ -21,6 +31,7 @@ def create_app() -> FastAPI:
         title=settings.api_title,
         description="Backend services powering the RAG Chatbot.",
         version=settings.api_version,
+        lifespan=lifespan,
     )
 
     cors_origins = settings.resolved_cors_origins
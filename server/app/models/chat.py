@@ -3,12 +3,14 @@ from __future__ import annotations
 from enum import Enum
 from typing import Any, List, Literal
 
-from pydantic import BaseModel, Field, model_validator
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 
 ChatRole = Literal["user", "assistant", "tool"]
 
 
 class ChatMessage(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     role: ChatRole = Field(..., description="Message role within the conversation history.")
     content: str = Field(..., description="Message body content.")
 
@@ -50,6 +52,8 @@ class ToolAction(BaseModel):
 
 
 class ChatRequest(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     sessionId: str = Field(..., min_length=1, description="Conversation session identifier.")
     messages: List[ChatMessage] = Field(
         default_factory=list, description="Conversation history supplied by the client."
@@ -2,10 +2,12 @@ from __future__ import annotations
 
 from typing import List
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class ProductHit(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     title: str = Field(..., description="Product title")
     variantTitle: str | None = Field(None, description="Variant display name")
     variantId: str | None = Field(None, description="Variant identifier")
@@ -17,7 +19,7 @@ class ProductHit(BaseModel):
     imageUrl: str | None = Field(None, description="Image representing the variant")
     sku: str | None = Field(None, description="Stock keeping unit")
     productType: str | None = Field(None, description="Product type classification")
-    tags: list[str] = Field(default_factory=list, description="Tags associated with the product")
+    tags: tuple[str, ...] = Field(default_factory=tuple, description="Tags associated with the product")
     snippet: str | None = Field(None, description="Relevant excerpt from the product data")
 
 
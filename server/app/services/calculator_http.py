@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import threading
+from dataclasses import dataclass, field
 
 import httpx
 
@@ -18,26 +19,30 @@ class CalculatorHttpServiceError(CalculatorError):
 class CalculatorHttpService:
     base_url: str
     timeout: float = 5.0
+    transport: httpx.BaseTransport | None = field(default=None, repr=False)
+    _client: httpx.Client = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        # One pooled client per service keeps connections alive across planner tool calls.
+        self._client = httpx.Client(base_url=self.base_url, timeout=self.timeout, transport=self.transport)
 
     @classmethod
     def from_settings(cls) -> "CalculatorHttpService":
         settings = get_settings()
         if not settings.calc_http_base_url:
             raise CalculatorHttpServiceError("CALC_HTTP_BASE_URL is not configured.")
-        return cls(
-            base_url=settings.calc_http_base_url.rstrip("/"),
-            timeout=float(settings.calc_http_timeout_sec),
-        )
+        return _shared_service(settings.calc_http_base_url.rstrip("/"), float(settings.calc_http_timeout_sec))
+
+    def close(self) -> None:
+        self._client.close()
 
     def evaluate(self, expression: str) -> CalculatorResult:
         query = expression.strip()
         if not query:
             raise CalculatorError("Expression cannot be empty.")
 
-        url = f"{self.base_url}/calc"
         try:
-            with httpx.Client(timeout=self.timeout) as client:
-                response = client.get(url, params={"query": query})
+            response = self._client.get("/calc", params={"query": query})
         except httpx.RequestError as exc:
             raise CalculatorHttpServiceError("Calculator service is unavailable.") from exc
 
@@ -61,3 +66,24 @@ class CalculatorHttpService:
         return CalculatorResult.model_validate(payload)
 
 
+_SHARED_SERVICES: dict[tuple[str, float], CalculatorHttpService] = {}
+_SHARED_SERVICES_LOCK = threading.Lock()
+
+
+def _shared_service(base_url: str, timeout: float) -> CalculatorHttpService:
+    key = (base_url, timeout)
+    with _SHARED_SERVICES_LOCK:
+        service = _SHARED_SERVICES.get(key)
+        if service is None:
+            service = _SHARED_SERVICES[key] = CalculatorHttpService(base_url=base_url, timeout=timeout)
+        return service
+
+
+def close_shared_services() -> None:
+    """Close the pooled clients handed out by ``from_settings``; called on app shutdown."""
+
+    with _SHARED_SERVICES_LOCK:
+        services = list(_SHARED_SERVICES.values())
+        _SHARED_SERVICES.clear()
+    for service in services:
+        service.close()
@@ -3,6 +3,7 @@ from __future__ import annotations
 import asyncio
 import re
 from dataclasses import dataclass
+from functools import lru_cache
 from typing import Any, Protocol
 
 from langchain.prompts import PromptTemplate
@@ -26,87 +27,88 @@ class OutletsExecutionError(AppError):
     error_type = "OUTLETS_EXECUTION_ERROR"
 
 
+# Canonical area name -> substrings that identify it in a normalised query (fake provider only).
+_FAKE_TOKEN_ALIASES: tuple[tuple[str, tuple[str, ...]], ...] = (
+    ("ampang", ("ampang",)),
+    ("ampang jaya", ("ampang jaya",)),
+    ("bandar baru bangi", ("bandar baru bangi",)),
+    ("bandar sunway", ("bandar sunway", "sunway")),
+    ("bangi", ("bangi",)),
+    ("banting", ("banting",)),
+    ("batang kali", ("batang kali",)),
+    ("batu caves", ("batu caves",)),
+    ("cheras", ("cheras",)),
+    ("cyberjaya", ("cyberjaya",)),
+    ("dengkil", ("dengkil",)),
+    ("hulu langat", ("hulu langat",)),
+    ("jenjarom", ("jenjarom",)),
+    ("kajang", ("kajang",)),
+    ("kapar", ("kapar",)),
+    ("klang", ("klang", "port klang")),
+    ("klcc", ("klcc",)),
+    ("klia", ("klia",)),
+    ("kuala lumpur", ("kuala lumpur", "kualalumpur", "kl")),
+    ("kuala selangor", ("kuala selangor",)),
+    ("petaling jaya", ("petaling jaya", "petalingjaya", "pj")),
+    ("port klang", ("port klang",)),
+    ("puchong", ("puchong",)),
+    ("putrajaya", ("putrajaya",)),
+    ("rawang", ("rawang",)),
+    ("sabak bernam", ("sabak bernam",)),
+    ("sekinchan", ("sekinchan",)),
+    ("semenyih", ("semenyih",)),
+    ("sepang", ("sepang",)),
+    ("seremban", ("seremban",)),
+    ("serendah", ("serendah",)),
+    ("seri kembangan", ("seri kembangan",)),
+    ("shah alam", ("shah alam",)),
+    ("ss2", ("ss2", "ss 2")),
+    ("subang", ("subang",)),
+    ("subang jaya", ("subang jaya", "subangjaya")),
+    ("sungai buloh", ("sungai buloh",)),
+)
+
+_FAKE_SELECT_SQL = "SELECT name, city, state, postal_code, address, open_time, close_time, services FROM outlets"
+
+
+def _build_fake_alias_clauses() -> tuple[tuple[tuple[str, ...], str, dict[str, str]], ...]:
+    clauses = []
+    for canonical, variants in _FAKE_TOKEN_ALIASES:
+        slug = canonical.replace(" ", "_")
+        pattern = f"%{canonical}%"
+        clause = f"LOWER(name) LIKE :name_{slug} OR LOWER(city) LIKE :city_{slug}"
+        clauses.append((variants, clause, {f"name_{slug}": pattern, f"city_{slug}": pattern}))
+    return tuple(clauses)
+
+
+# (variants, WHERE fragment, bind params) per canonical area, built once at import.
+_FAKE_ALIAS_CLAUSES = _build_fake_alias_clauses()
+
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9\s]+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
 class SqlGenerator(Protocol):
     def __call__(self, query: str) -> tuple[str, dict[str, Any]]:
         ...
 
 
 def default_sql_generator(session: Session) -> SqlGenerator:
-    from langchain.chains import create_sql_query_chain
-    from langchain_community.utilities import SQLDatabase
-    from langchain_openai import ChatOpenAI
-
     settings = get_settings()
-    callbacks = get_langchain_callbacks(settings)
     provider = (settings.text2sql_provider or "openai").lower()
-    db = SQLDatabase(session.bind)
     if provider == "fake":
-        columns = "name, city, state, postal_code, address, open_time, close_time, services"
-
-        def _normalize(text: str) -> str:
-            lowered = text.lower()
-            stripped = re.sub(r"[^a-z0-9\s]+", " ", lowered)
-            return re.sub(r"\s+", " ", stripped).strip()
 
         def generate(query: str) -> tuple[str, dict[str, Any]]:
-            normalized = _normalize(query)
-            sql = f"SELECT {columns} FROM outlets"
+            normalized = _normalize_fake_query(query)
             params: dict[str, Any] = {}
             where_clauses: list[str] = []
 
-            def add_clause(field: str, value: str) -> None:
-                index = len(where_clauses)
-                param_key = f"{field}_param_{index}"
-                where_clauses.append(f"LOWER({field}) LIKE :{param_key}")
-                params[param_key] = f"%{value}%"
-
-            token_aliases = {
-                "ampang": ["ampang"],
-                "ampang jaya": ["ampang jaya"],
-                "bandar baru bangi": ["bandar baru bangi"],
-                "bandar sunway": ["bandar sunway", "sunway"],
-                "bangi": ["bangi"],
-                "banting": ["banting"],
-                "batang kali": ["batang kali"],
-                "batu caves": ["batu caves"],
-                "cheras": ["cheras"],
-                "cyberjaya": ["cyberjaya"],
-                "dengkil": ["dengkil"],
-                "hulu langat": ["hulu langat"],
-                "jenjarom": ["jenjarom"],
-                "kajang": ["kajang"],
-                "kapar": ["kapar"],
-                "klang": ["klang", "port klang"],
-                "klcc": ["klcc"],
-                "klia": ["klia"],
-                "kuala lumpur": ["kuala lumpur", "kualalumpur", "kl"],
-                "kuala selangor": ["kuala selangor"],
-                "petaling jaya": ["petaling jaya", "petalingjaya", "pj"],
-                "port klang": ["port klang"],
-                "puchong": ["puchong"],
-                "putrajaya": ["putrajaya"],
-                "rawang": ["rawang"],
-                "sabak bernam": ["sabak bernam"],
-                "sekinchan": ["sekinchan"],
-                "semenyih": ["semenyih"],
-                "sepang": ["sepang"],
-                "seremban": ["seremban"],
-                "serendah": ["serendah"],
-                "seri kembangan": ["seri kembangan"],
-                "shah alam": ["shah alam"],
-                "ss2": ["ss2", "ss 2"],
-                "subang": ["subang"],
-                "subang jaya": ["subang jaya", "subangjaya"],
-                "sungai buloh": ["sungai buloh"],
-            }
-
-            for canonical, variants in token_aliases.items():
-                for variant in variants:
-                    if variant in normalized:
-                        add_clause("name", canonical)
-                        add_clause("city", canonical)
-                        break
+            for variants, clause, clause_params in _FAKE_ALIAS_CLAUSES:
+                if any(variant in normalized for variant in variants):
+                    where_clauses.append(clause)
+                    params.update(clause_params)
 
+            sql = _FAKE_SELECT_SQL
             if where_clauses:
                 sql = f"{sql} WHERE " + " OR ".join(where_clauses)
             sql += " ORDER BY name LIMIT 10"
@@ -114,6 +116,51 @@ def default_sql_generator(session: Session) -> SqlGenerator:
 
         return generate
 
+    if provider not in {"local", "openai"}:
+        raise OutletsExecutionError(f"Unsupported text2sql provider: {settings.text2sql_provider}")
+    if provider == "openai" and not settings.openai_api_key:
+        raise OutletsExecutionError("OPENAI_API_KEY is not configured for outlets Text2SQL.")
+
+    chain = _get_sql_chain(
+        provider,
+        model=settings.text2sql_model,
+        temperature=settings.text2sql_temperature,
+        timeout=settings.text2sql_timeout_sec,
+        api_key=settings.openai_api_key,
+        ollama_host=settings.ollama_host,
+        callbacks=tuple(get_langchain_callbacks(settings)),
+        bind=session.bind,
+    )
+
+    def generate(query: str) -> tuple[str, dict[str, Any]]:
+        enriched = _prepare_text2sql_question(query)
+        sql = _normalize_generated_sql(chain.invoke({"question": enriched}))
+        return sql, {}
+
+    return generate
+
+
+@lru_cache(maxsize=4)
+def _get_sql_chain(
+    provider: str,
+    *,
+    model: str,
+    temperature: float,
+    timeout: int,
+    api_key: str | None,
+    ollama_host: str | None,
+    callbacks: tuple[Any, ...],
+    bind: Any,
+) -> Any:
+    """
+    Build the LLM-backed Text2SQL chain once per provider configuration and engine.
+
+    SQLDatabase reflects the schema when constructed, so reusing the chain keeps that
+    introspection and the LLM client setup off the per-request path.
+    """
+    from langchain.chains import create_sql_query_chain
+    from langchain_community.utilities import SQLDatabase
+
     if provider == "local":
         try:
             from langchain_community.chat_models import ChatOllama
@@ -121,46 +168,26 @@ def default_sql_generator(session: Session) -> SqlGenerator:
             raise OutletsExecutionError("langchain-community is required for local Text2SQL.") from exc
 
         kwargs: dict[str, Any] = {
-            "model": settings.text2sql_model,
-            "temperature": settings.text2sql_temperature,
+            "model": model,
+            "temperature": temperature,
         }
-        if settings.ollama_host:
-            kwargs["base_url"] = settings.ollama_host
+        if ollama_host:
+            kwargs["base_url"] = ollama_host
         if callbacks:
             kwargs["callbacks"] = list(callbacks)
         llm = ChatOllama(**kwargs)
-        prompt = _build_sql_prompt()
-        chain = create_sql_query_chain(llm, db, prompt=prompt)
-
-        def generate(query: str) -> tuple[str, dict[str, Any]]:
-            enriched = _prepare_text2sql_question(query)
-            sql = _normalize_generated_sql(chain.invoke({"question": enriched}))
-            return sql, {}
-
-        return generate
-
-    if provider == "openai":
-        if not settings.openai_api_key:
-            raise OutletsExecutionError("OPENAI_API_KEY is not configured for outlets Text2SQL.")
+    else:
+        from langchain_openai import ChatOpenAI
 
         llm = ChatOpenAI(
-            model=settings.text2sql_model,
-            temperature=settings.text2sql_temperature,
-            api_key=settings.openai_api_key,
-            timeout=settings.text2sql_timeout_sec,
+            model=model,
+            temperature=temperature,
+            api_key=api_key,
+            timeout=timeout,
             callbacks=list(callbacks),
         )
-        prompt = _build_sql_prompt()
-        chain = create_sql_query_chain(llm, db, prompt=prompt)
-
-        def generate(query: str) -> tuple[str, dict[str, Any]]:
-            enriched = _prepare_text2sql_question(query)
-            sql = _normalize_generated_sql(chain.invoke({"question": enriched}))
-            return sql, {}
 
-        return generate
-
-    raise OutletsExecutionError(f"Unsupported text2sql provider: {settings.text2sql_provider}")
+    return create_sql_query_chain(llm, SQLDatabase(bind), prompt=_SQL_PROMPT)
 
 
 @dataclass
@@ -187,11 +214,29 @@ class OutletsText2SQLService:
         return cls(session=session, sql_generator=generator)
 
     async def query_async(self, user_query: str) -> OutletsQueryResponse:
+        cleaned = self._clean_query(user_query)
+        sql, params = await asyncio.to_thread(self.sql_generator, cleaned)
+        return self._run_generated_sql(cleaned, sql, params)
+
+    def query(self, user_query: str) -> OutletsQueryResponse:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # The session is bound to the caller's thread, so the sync path runs inline
+            # rather than spinning up an event loop per call.
+            cleaned = self._clean_query(user_query)
+            sql, params = self.sql_generator(cleaned)
+            return self._run_generated_sql(cleaned, sql, params)
+
+        raise RuntimeError("query() cannot be called from an active event loop; use query_async().")
+
+    def _clean_query(self, user_query: str) -> str:
         cleaned = user_query.strip()
         if not cleaned:
             raise OutletsQueryError("Query cannot be empty.", details={"field": "query"})
+        return cleaned
 
-        sql, params = await asyncio.to_thread(self.sql_generator, cleaned)
+    def _run_generated_sql(self, cleaned: str, sql: str, params: dict[str, Any]) -> OutletsQueryResponse:
         self._validate_sql(sql)
 
         try:
@@ -201,15 +246,8 @@ class OutletsText2SQLService:
 
         return OutletsQueryResponse(query=cleaned, sql=sql, params=params, rows=rows)
 
-    def query(self, user_query: str) -> OutletsQueryResponse:
-        try:
-            asyncio.get_running_loop()
-        except RuntimeError:
-            return asyncio.run(self.query_async(user_query))
-
-        raise RuntimeError("query() cannot be called from an active event loop; use query_async().")
-
-    def _validate_sql(self, sql: str) -> None:
+    @classmethod
+    def _validate_sql(cls, sql: str) -> None:
         normalized = sql.strip()
         if not normalized:
             raise OutletsQueryError("Generated SQL was empty.", details={"sql": sql})
@@ -224,7 +262,7 @@ class OutletsText2SQLService:
                 "Generated SQL must be a SELECT statement.", details={"sql": sql}
             )
 
-        if self.UNSAFE_PATTERN.search(normalized):
+        if cls.UNSAFE_PATTERN.search(normalized):
             raise OutletsQueryError("Generated SQL was rejected for safety reasons.", details={"sql": sql})
 
     def _execute_sql(self, sql: str, params: dict[str, Any]) -> list[dict[str, Any]]:
@@ -245,6 +283,11 @@ class OutletsText2SQLService:
         return rows
 
 
+def _normalize_fake_query(text: str) -> str:
+    stripped = _NON_ALNUM_RE.sub(" ", text.lower())
+    return _WHITESPACE_RE.sub(" ", stripped).strip()
+
+
 def _prepare_text2sql_question(question: str) -> str:
     """
     Provide lightweight guidance to the LLM Text2SQL chain so it generates safe, useful SQL.
@@ -274,19 +317,30 @@ def _normalize_generated_sql(output: str) -> str:
 
     text = output.strip()
     if text.startswith("```"):
-        parts = text.split("```")
-        if len(parts) >= 3:
-            text = parts[1]
-        else:
-            text = parts[-1]
+        closing = text.find("```", 3)
+        text = text[3:closing] if closing != -1 else text[3:]
 
-    match = re.search(r"select\b", text, flags=re.IGNORECASE)
-    if match:
-        text = text[match.start():]
+    start = _find_select_keyword(text)
+    if start != -1:
+        text = text[start:]
 
     return text.strip()
 
 
+def _find_select_keyword(text: str) -> int:
+    """
+    Return the index of the first standalone ``select`` keyword (case-insensitive), or -1.
+    """
+    lowered = text.lower()
+    position = lowered.find("select")
+    while position != -1:
+        end = position + 6
+        if end == len(lowered) or not (lowered[end].isalnum() or lowered[end] == "_"):
+            return position
+        position = lowered.find("select", position + 1)
+    return -1
+
+
 def _build_sql_prompt() -> PromptTemplate:
     template = """
 You are an expert SQL generator for the ZUS Coffee outlets database.
@@ -310,3 +364,4 @@ SQL Query:
     return PromptTemplate.from_template(template.strip())
 
 
+_SQL_PROMPT = _build_sql_prompt()
@@ -1,41 +1,62 @@
 from __future__ import annotations
 
-from typing import Any, Iterable, Set
+from typing import Any, Callable, Iterable, Set
 
 
 def extract_index_names(response: object) -> Set[str]:
     """
     Normalizes the different return shapes from pinecone.list_indexes() into a set of names.
     """
-    names: Set[str] = set()
-
     if response is None:
-        return names
+        return set()
 
-    if hasattr(response, "names"):
-        try:
-            iterable = response.names()
-            for item in iterable:
-                if item:
-                    names.add(str(item))
+    for extractor in _EXTRACTORS:
+        names = extractor(response)
+        if names is not None:
             return names
-        except TypeError:
-            pass
-
-    iterable: Iterable[Any] | None
-    if hasattr(response, "indexes"):
-        iterable = getattr(response, "indexes")
-    elif isinstance(response, dict) and "indexes" in response:
-        iterable = response["indexes"]
-    elif isinstance(response, (list, tuple, set)):
-        iterable = response
-    else:
-        iterable = None
-
-    if iterable is None:
+
+    return set()
+
+
+def _from_names_method(response: object) -> Set[str] | None:
+    names_fn = getattr(response, "names", None)
+    if not callable(names_fn):
+        return None
+    return {str(item) for item in names_fn() if item}
+
+
+def _from_indexes_attr(response: object) -> Set[str] | None:
+    if not hasattr(response, "indexes"):
+        return None
+    return _names_from_items(getattr(response, "indexes"))
+
+
+def _from_dict(response: object) -> Set[str] | None:
+    if not isinstance(response, dict) or "indexes" not in response:
+        return None
+    return _names_from_items(response["indexes"])
+
+
+def _from_iterable(response: object) -> Set[str] | None:
+    if not isinstance(response, (list, tuple, set)):
+        return None
+    return _names_from_items(response)
+
+
+_EXTRACTORS: tuple[Callable[[object], Set[str] | None], ...] = (
+    _from_names_method,
+    _from_indexes_attr,
+    _from_dict,
+    _from_iterable,
+)
+
+
+def _names_from_items(items: Iterable[Any] | None) -> Set[str]:
+    names: Set[str] = set()
+    if items is None:
         return names
 
-    for item in iterable:
+    for item in items:
         if not item:
             continue
         if isinstance(item, str):
@@ -51,4 +72,3 @@ def extract_index_names(response: object) -> Set[str]:
                 names.add(str(dict_name))
 
     return names
-
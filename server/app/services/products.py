@@ -2,12 +2,14 @@ from __future__ import annotations
 
 import asyncio
 import inspect
+from functools import lru_cache
 from textwrap import dedent
 from typing import Awaitable, Callable, Protocol, Sequence
 
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
 
+from app.core.background_loop import run_sync
 from app.core.config import AppSettings, get_settings
 from app.core.langfuse import get_langchain_callbacks
 from app.core.exceptions import AppError
@@ -36,20 +38,25 @@ def build_product_embeddings(
     """
     Returns the embeddings implementation configured for product RAG.
     """
-    from langchain_community.embeddings.fake import FakeEmbeddings
-    from langchain_openai import OpenAIEmbeddings
+    return _embeddings_for(provider_override or settings.embeddings_provider, settings.openai_api_key)
 
-    provider = (provider_override or settings.embeddings_provider or "openai").lower()
+
+def _embeddings_for(provider: str | None, openai_api_key: str | None) -> Embeddings:
+    provider = (provider or "openai").lower()
 
     if provider == "openai":
-        if not settings.openai_api_key:
+        from langchain_openai import OpenAIEmbeddings
+
+        if not openai_api_key:
             raise ValueError("OPENAI_API_KEY is not configured for product embeddings.")
         # text-embedding-3-small outputs 1536-d vectors; Pinecone index must match.
         return OpenAIEmbeddings(
             model="text-embedding-3-small",
-            api_key=settings.openai_api_key,
+            api_key=openai_api_key,
         )
     if provider in {"fake", "local"}:
+        from langchain_community.embeddings.fake import FakeEmbeddings
+
         return FakeEmbeddings(size=1536)
 
     raise ValueError(f"Unsupported embeddings provider: {provider}")
@@ -61,37 +68,35 @@ class ProductSearchService:
         vector_store: ProductVectorStore,
         summary_fn: SummaryFn | None = None,
         summary_context_k: int = 8,
+        min_relevance_score: float | None = None,
+        embeddings: Embeddings | None = None,
     ) -> None:
         self._vector_store = vector_store
+        self._embeddings = embeddings
         self._summary_fn = summary_fn
         self._summary_context_k = max(1, summary_context_k)
+        self._min_relevance_score = min_relevance_score
 
     @classmethod
     def from_settings(cls, summary_fn: SummaryFn | None = None) -> "ProductSearchService":
         settings = get_settings()
-
-        try:
-            embeddings = build_product_embeddings(settings)
-        except ValueError as exc:
-            raise ProductSearchError(str(exc)) from exc
-
-        backend = (settings.product_vector_store_backend or "faiss").lower()
-
-        if backend == "faiss":
-            try:
-                vector_store = _load_faiss_vector_store(settings, embeddings)
-            except ProductSearchError:
-                raise
-            except Exception as exc:
-                raise ProductSearchError("Product vector store is not available.") from exc
-        elif backend == "pinecone":
-            vector_store = _load_pinecone_vector_store(settings, embeddings)
-        else:
-            raise ProductSearchError(f"Unsupported product vector store backend: {backend}")
+        vector_store = _shared_vector_store(
+            (settings.product_vector_store_backend or "faiss").lower(),
+            vector_store_path=settings.vector_store_path,
+            embeddings_provider=settings.embeddings_provider,
+            openai_api_key=settings.openai_api_key,
+            pinecone_api_key=settings.pinecone_api_key,
+            pinecone_index_name=settings.pinecone_index_name,
+        )
 
         summary_callable = summary_fn if summary_fn is not None else cls._create_summary_fn(settings)
 
-        return cls(vector_store=vector_store, summary_fn=summary_callable)
+        return cls(
+            vector_store=vector_store,
+            summary_fn=summary_callable,
+            min_relevance_score=settings.product_min_relevance_score,
+            embeddings=getattr(vector_store, "embeddings", None),
+        )
 
     async def search_async(self, query: str, *, k: int = 3) -> ProductSearchResponse:
         if not query.strip():
@@ -107,7 +112,15 @@ class ProductSearchService:
         except Exception as exc:  # pragma: no cover - protective guard
             raise ProductSearchError("Failed to query product index.") from exc
 
+        return await self._build_response_async(query, results, k=k)
+
+    async def _build_response_async(
+        self, query: str, results: Sequence[tuple[Document, float]], *, k: int
+    ) -> ProductSearchResponse:
         results = self._apply_result_filters(results)
+        if not results:
+            # Nothing worth summarising, so skip the (comparatively expensive) LLM call.
+            return ProductSearchResponse(query=query, topK=[], summary=None)
 
         hits = [self._document_to_hit(doc, score) for doc, score in results[:k]]
         summary = await self._summarize_async(query, [doc for doc, _ in results])
@@ -118,10 +131,52 @@ class ProductSearchService:
         try:
             asyncio.get_running_loop()
         except RuntimeError:
-            return asyncio.run(self.search_async(query, k=k))
+            return run_sync(self.search_async(query, k=k))
 
         raise RuntimeError("search() cannot be called from an active event loop; use search_async().")
 
+    async def search_many_async(self, queries: Sequence[str], *, k: int = 3) -> list[ProductSearchResponse]:
+        """
+        Searches several queries at once. With embeddings available the distinct queries are
+        embedded in one call and looked up in one batched index search; otherwise each falls
+        back to search_async(). Responses are returned in the order of ``queries``.
+        """
+        if any(not query.strip() for query in queries):
+            raise AppError("Query cannot be empty.", details={"field": "query"})
+
+        unique_queries = list(dict.fromkeys(queries))
+        if not unique_queries:
+            return []
+        if self._embeddings is None:
+            responses = await asyncio.gather(*(self.search_async(query, k=k) for query in unique_queries))
+        else:
+            effective_k = max(k, self._summary_context_k)
+            try:
+                vectors = await asyncio.to_thread(self._embeddings.embed_documents, unique_queries)
+                batched_results = await asyncio.to_thread(
+                    _similarity_search_by_vectors, self._vector_store, vectors, effective_k
+                )
+            except Exception as exc:  # pragma: no cover - protective guard
+                raise ProductSearchError("Failed to query product index.") from exc
+            # Summaries stay one LLM call per distinct query: each answer is query specific.
+            responses = await asyncio.gather(
+                *(
+                    self._build_response_async(query, results, k=k)
+                    for query, results in zip(unique_queries, batched_results)
+                )
+            )
+
+        by_query = dict(zip(unique_queries, responses))
+        return [by_query[query] for query in queries]
+
+    def search_many(self, queries: Sequence[str], *, k: int = 3) -> list[ProductSearchResponse]:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return run_sync(self.search_many_async(queries, k=k))
+
+        raise RuntimeError("search_many() cannot be called from an active event loop; use search_many_async().")
+
     def _document_to_hit(self, doc: Document, score: float) -> ProductHit:
         metadata = doc.metadata or {}
         title = metadata.get("productTitle") or metadata.get("title") or metadata.get("name") or "Unknown product"
@@ -134,11 +189,11 @@ class ProductSearchService:
         image_url = metadata.get("imageUrl")
         sku = metadata.get("sku")
         product_type = metadata.get("productType")
-        tags_raw = metadata.get("tags") or []
+        tags_raw = metadata.get("tags") or ()
         if isinstance(tags_raw, str):
-            tags = [tags_raw]
+            tags = (tags_raw,)
         else:
-            tags = list(tags_raw)
+            tags = tuple(tags_raw)
         snippet = doc.page_content.strip() if doc.page_content else None
         clipped_score = max(0.0, min(1.0, score))
 
@@ -245,18 +300,104 @@ class ProductSearchService:
         self, results: Sequence[tuple[Document, float]]
     ) -> Sequence[tuple[Document, float]]:
         """
-        Placeholder hook for future RAG guardrails (e.g., configurable score thresholds or
-        semantic specificity checks). Currently returns results unchanged.
+        RAG guardrails applied before hits and the summary are built. Drops results below the
+        configured relevance threshold; with no threshold, results are returned unchanged.
         """
-        return results
+        if self._min_relevance_score is None:
+            return results
+        return [(doc, score) for doc, score in results if score >= self._min_relevance_score]
+
+
+@lru_cache(maxsize=4)
+def _shared_vector_store(
+    backend: str,
+    *,
+    vector_store_path: str,
+    embeddings_provider: str,
+    openai_api_key: str | None,
+    pinecone_api_key: str | None,
+    pinecone_index_name: str | None,
+) -> ProductVectorStore:
+    """
+    Load the product index once per configuration; every setting the loaders read is part of
+    the cache key. FAISS.load_local unpickles the whole docstore, which is far too slow to
+    repeat on every request.
+
+    A running server keeps serving the index it loaded: restart it (or call
+    reset_product_vector_store() in-process) after re-running the ingest script.
+    """
+    try:
+        embeddings = _embeddings_for(embeddings_provider, openai_api_key)
+    except ValueError as exc:
+        raise ProductSearchError(str(exc)) from exc
+
+    if backend == "faiss":
+        try:
+            return _load_faiss_vector_store(vector_store_path, embeddings)
+        except ProductSearchError:
+            raise
+        except Exception as exc:
+            raise ProductSearchError("Product vector store is not available.") from exc
+    if backend == "pinecone":
+        return _load_pinecone_vector_store(pinecone_api_key, pinecone_index_name, embeddings)
+
+    raise ProductSearchError(f"Unsupported product vector store backend: {backend}")
+
+
+def _similarity_search_by_vectors(
+    vector_store: ProductVectorStore, vectors: Sequence[Sequence[float]], k: int
+) -> list[list[tuple[Document, float]]]:
+    """
+    Relevance-scored hits for pre-computed query vectors. A FAISS store answers the whole
+    batch with one (nq, d) index search; Pinecone only accepts one vector per query.
+    """
+    relevance_score_fn = vector_store._select_relevance_score_fn()
+    index = getattr(vector_store, "index", None)
+    if index is None or not hasattr(vector_store, "index_to_docstore_id"):
+        return [
+            [
+                (doc, relevance_score_fn(score))
+                for doc, score in vector_store.similarity_search_by_vector_with_score(vector, k=k)
+            ]
+            for vector in vectors
+        ]
+
+    import numpy as np
+
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if getattr(vector_store, "_normalize_L2", False):
+        import faiss
+
+        faiss.normalize_L2(matrix)
+    distances, indices = index.search(matrix, k)
+
+    batched: list[list[tuple[Document, float]]] = []
+    for row_distances, row_indices in zip(distances, indices):
+        results: list[tuple[Document, float]] = []
+        for distance, position in zip(row_distances, row_indices):
+            if position == -1:
+                # FAISS pads with -1 when the index holds fewer than k vectors.
+                continue
+            doc = vector_store.docstore.search(vector_store.index_to_docstore_id[position])
+            if isinstance(doc, Document):
+                results.append((doc, relevance_score_fn(float(distance))))
+        batched.append(results)
+    return batched
+
+
+def reset_product_vector_store() -> None:
+    """
+    Drop cached product indexes so the next request reloads them from storage.
+    """
+    _shared_vector_store.cache_clear()
 
 
-def _load_faiss_vector_store(settings: AppSettings, embeddings: Embeddings) -> ProductVectorStore:
+def _load_faiss_vector_store(vector_store_path: str, embeddings: Embeddings) -> ProductVectorStore:
     from langchain_community.vectorstores import FAISS
 
     try:
         return FAISS.load_local(
-            settings.vector_store_path,
+            vector_store_path,
             embeddings,
             allow_dangerous_deserialization=True,
         )
@@ -264,14 +405,16 @@ def _load_faiss_vector_store(settings: AppSettings, embeddings: Embeddings) -> P
         raise ProductSearchError("Product vector store is not available.") from exc
 
 
-def _load_pinecone_vector_store(settings: AppSettings, embeddings: Embeddings) -> ProductVectorStore:
+def _load_pinecone_vector_store(
+    pinecone_api_key: str | None, pinecone_index_name: str | None, embeddings: Embeddings
+) -> ProductVectorStore:
     from langchain_pinecone import PineconeVectorStore
     from pinecone import Pinecone
 
-    api_key = (settings.pinecone_api_key or "").strip()
+    api_key = (pinecone_api_key or "").strip()
     if not api_key:
         raise ProductSearchError("PINECONE_API_KEY is required when PRODUCT_VECTOR_STORE_BACKEND=pinecone.")
-    index_name = (settings.pinecone_index_name or "").strip()
+    index_name = (pinecone_index_name or "").strip()
     if not index_name:
         raise ProductSearchError("PINECONE_INDEX_NAME is required when PRODUCT_VECTOR_STORE_BACKEND=pinecone.")
 
@@ -1,22 +1,37 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
+import hashlib
 import json
 import logging
+import math
+import os
+import re
+import sys
+import tempfile
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Iterable, List, Optional
+from typing import TYPE_CHECKING, Any, Iterable, List, Optional
 from urllib.parse import urlparse
 
 import httpx
-from bs4 import BeautifulSoup
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_core.documents import Document
-from langchain_community.vectorstores import FAISS
-from pydantic import BaseModel, Field, HttpUrl, ValidationError, model_validator
+import orjson
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field, HttpUrl, ValidationError, field_validator, model_validator
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # pragma: no cover - optional dependency
+    LexborHTMLParser = None  # type: ignore[assignment]
 
 from app.core.config import AppSettings, get_settings
 from app.services.pinecone_utils import extract_index_names
-from app.services.products import build_product_embeddings
+
+if TYPE_CHECKING:
+    import numpy
+    from langchain_core.documents import Document
+
 logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
 logger = logging.getLogger("ingest_products")
 
@@ -25,6 +40,33 @@ DEFAULT_COLLECTION_URLS = [
     "https://shop.zuscoffee.com/collections/mugs",
 ]
 
+HTTP_TIMEOUT_SECONDS = 30.0
+HTTP_MAX_CONNECTIONS = 8
+HTTP_MAX_RETRIES = 3
+SHOPIFY_PAGE_LIMIT = 250
+SHOPIFY_PAGE_BATCH = 4
+# Placeholder Shopify uses for the title and option of single-variant products.
+SHOPIFY_DEFAULT_TITLE = "Default Title"
+DEFAULT_HTTP_CACHE_DIR = Path.home() / ".cache" / "ingest_products"
+CHUNK_SIZE = 512
+CHUNK_OVERLAP = 64
+EMBEDDING_BATCH_SIZE = 256
+FAISS_QUANTIZATION_CHOICES = ("none", "sq8", "pq", "ivfpq")
+# PQ codes: 8 bits per sub-quantizer, at most 96 sub-quantizers (96 bytes per 1536-d vector).
+PQ_BITS = 8
+PQ_MAX_SUBQUANTIZERS = 96
+# k-means wants roughly this many training points per IVF list; nprobe is saved with the index.
+IVF_MIN_POINTS_PER_LIST = 39
+IVF_NPROBE = 8
+PARALLEL_BUILD_MIN_RECORDS = 100
+PARALLEL_BUILD_BATCH_SIZE = 32
+PINECONE_UPSERT_BATCH_SIZE = 100
+PINECONE_UPSERT_WORKERS = 4
+# Metadata key PineconeVectorStore reads page content from at query time.
+PINECONE_TEXT_KEY = "text"
+
+_TAG_SEPARATOR_RE = re.compile(r"\s*,\s*")
+
 EMBEDDING_DIMENSIONS: dict[str, int] = {
     # Keep this aligned with build_product_embeddings in app.services.products.
     "openai": 1536,
@@ -34,6 +76,8 @@ EMBEDDING_DIMENSIONS: dict[str, int] = {
 
 
 class VariantRecord(BaseModel):
+    model_config = ConfigDict(coerce_numbers_to_str=True)
+
     id: str = Field(..., description="Variant identifier")
     title: str = Field(..., description="Variant display title")
     sku: Optional[str] = Field(default=None, description="Stock keeping unit")
@@ -41,30 +85,30 @@ class VariantRecord(BaseModel):
     compare_at_price: Optional[float] = Field(default=None, description="Original price before discount")
     available: bool = Field(default=True, description="Whether the variant is available for purchase")
     image_url: Optional[str] = Field(default=None, description="Image URL for the variant")
-    option_values: List[str] = Field(default_factory=list, description="Selected option values (e.g., color)")
+    option_values: List[str] = Field(
+        default_factory=list,
+        validation_alias=AliasChoices("option_values", "options"),
+        description="Selected option values (e.g., color)",
+    )
 
-    @model_validator(mode="before")
-    def normalise_values(cls, values: dict[str, Any]) -> dict[str, Any]:
-        price = values.get("price")
-        if price is not None:
-            try:
-                values["price"] = float(price)
-            except (TypeError, ValueError):
-                raise ValueError(f"Invalid price value {price!r}")
-        compare = values.get("compare_at_price")
-        if compare:
-            try:
-                values["compare_at_price"] = float(compare)
-            except (TypeError, ValueError):
-                values["compare_at_price"] = None
-        variant_id = values.get("id")
-        if variant_id is not None:
-            values["id"] = str(variant_id)
-        option_vals = values.get("option_values") or values.get("options") or []
-        if isinstance(option_vals, str):
-            option_vals = [option_vals]
-        values["option_values"] = list(option_vals)
-        return values
+    @field_validator("price", mode="before")
+    @classmethod
+    def normalise_price(cls, value: Any) -> float:
+        return _coerce_price(value)
+
+    @field_validator("compare_at_price", mode="before")
+    @classmethod
+    def normalise_compare_at_price(cls, value: Any) -> Optional[float]:
+        return _coerce_optional_price(value)
+
+    @field_validator("option_values", mode="before")
+    @classmethod
+    def normalise_option_values(cls, value: Any) -> Any:
+        if value is None:
+            return []
+        if isinstance(value, str):
+            return [value]
+        return value
 
 
 class ProductRecord(BaseModel):
@@ -76,14 +120,14 @@ class ProductRecord(BaseModel):
     product_type: str | None = None
     variants: List[VariantRecord] = Field(default_factory=list)
 
-    @model_validator(mode="before")
-    def normalise_tags(cls, values: dict[str, Any]) -> dict[str, Any]:
-        tags = values.get("tags")
-        if tags is None:
-            values["tags"] = []
-        elif isinstance(tags, str):
-            values["tags"] = [tag.strip() for tag in tags.split(",") if tag.strip()]
-        return values
+    @field_validator("tags", mode="before")
+    @classmethod
+    def normalise_tags(cls, value: Any) -> Any:
+        if value is None:
+            return []
+        if isinstance(value, str):
+            return _parse_tags(value)
+        return value
 
     @model_validator(mode="after")
     def ensure_variants(self) -> "ProductRecord":
@@ -92,9 +136,12 @@ class ProductRecord(BaseModel):
         return self
 
 
+def _parse_tags(tags_raw: str) -> list[str]:
+    return [tag for tag in _TAG_SEPARATOR_RE.split(tags_raw.strip()) if tag]
+
+
 def load_products_from_file(path: Path) -> List[ProductRecord]:
-    with path.open("r", encoding="utf-8") as f:
-        data = json.load(f)
+    data = orjson.loads(path.read_bytes())
     if not isinstance(data, list):
         raise ValueError("Seed file must contain a list of product objects.")
     records: list[ProductRecord] = []
@@ -106,24 +153,149 @@ def load_products_from_file(path: Path) -> List[ProductRecord]:
     return records
 
 
-def load_products_from_url(url: str) -> List[ProductRecord]:
+def load_products_from_url(url: str, *, cache_dir: Optional[Path] = None) -> List[ProductRecord]:
     """
     Load products from either a direct JSON feed or a Shopify collection URL.
     """
+
+    async def run() -> List[ProductRecord]:
+        async with _build_http_client(cache_dir=cache_dir) as client:
+            return await load_products_from_url_async(url, client=client)
+
+    return asyncio.run(run())
+
+
+async def load_products_from_url_async(url: str, *, client: httpx.AsyncClient) -> List[ProductRecord]:
     if "/collections/" in url and not url.endswith(".json"):
-        return _load_shopify_collection(url)
+        return await _load_shopify_collection(url, client=client)
 
     logger.info("Fetching product data from %s", url)
-    resp = httpx.get(url, timeout=30.0)
+    resp = await _get_with_backoff(client, url)
     content_type = resp.headers.get("content-type", "")
 
     if resp.status_code == 200 and "application/json" in content_type:
-        return _parse_product_json(resp.json(), base_url=url)
+        return _parse_product_json(orjson.loads(resp.content), base_url=url)
 
     resp.raise_for_status()
     raise ValueError(f"Unsupported response from {url}")
 
 
+async def load_products_from_urls(urls: Iterable[str], *, cache_dir: Optional[Path] = None) -> List[ProductRecord]:
+    """
+    Fetch several sources concurrently over one pooled client; failed sources are logged and skipped.
+    """
+    urls = list(urls)
+    async with _build_http_client(cache_dir=cache_dir) as client:
+        results = await asyncio.gather(
+            *(load_products_from_url_async(url, client=client) for url in urls),
+            return_exceptions=True,
+        )
+
+    aggregated: list[ProductRecord] = []
+    for url, result in zip(urls, results):
+        if isinstance(result, BaseException):
+            logger.error("Failed to load collection %s: %s", url, result)
+            continue
+        aggregated.extend(result)
+    return aggregated
+
+
+def _build_http_client(*, cache_dir: Optional[Path] = None) -> httpx.AsyncClient:
+    transport = _build_transport()
+    if cache_dir is not None:
+        transport = ConditionalGetCacheTransport(transport, cache_dir)
+    return httpx.AsyncClient(timeout=HTTP_TIMEOUT_SECONDS, transport=transport)
+
+
+def _build_transport() -> httpx.AsyncBaseTransport:
+    # One keep-alive pool per run; HTTP/2 multiplexes the page fan-out over a single TLS connection.
+    return httpx.AsyncHTTPTransport(
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+        ),
+    )
+
+
+class ConditionalGetCacheTransport(httpx.AsyncBaseTransport):
+    """
+    Stores GET bodies on disk keyed by URL and revalidates them with ETag/Last-Modified,
+    replaying the cached body when the server answers 304 Not Modified.
+    """
+
+    _CACHED_HEADERS = ("content-type", "etag", "last-modified")
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, base_path: Path) -> None:
+        self._transport = transport
+        self._base_path = base_path
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method != "GET":
+            return await self._transport.handle_async_request(request)
+
+        key = hashlib.sha256(str(request.url).encode("utf-8")).hexdigest()
+        meta_path = self._base_path / f"{key}.json"
+        body_path = self._base_path / f"{key}.body"
+        cached_headers = self._load_headers(meta_path, body_path)
+        if cached_headers:
+            if "etag" in cached_headers:
+                request.headers["If-None-Match"] = cached_headers["etag"]
+            if "last-modified" in cached_headers:
+                request.headers["If-Modified-Since"] = cached_headers["last-modified"]
+
+        response = await self._transport.handle_async_request(request)
+
+        if response.status_code == 304 and cached_headers:
+            await response.aclose()
+            logger.info("Using cached response for %s", request.url)
+            return httpx.Response(200, headers=cached_headers, content=body_path.read_bytes(), request=request)
+
+        if response.status_code == 200 and ("etag" in response.headers or "last-modified" in response.headers):
+            # Reading decodes any content-encoding, so only the headers that still apply are kept.
+            body = await response.aread()
+            headers = {name: response.headers[name] for name in self._CACHED_HEADERS if name in response.headers}
+            self._base_path.mkdir(parents=True, exist_ok=True)
+            body_path.write_bytes(body)
+            meta_path.write_text(json.dumps(headers), encoding="utf-8")
+            return httpx.Response(200, headers=headers, content=body, request=request)
+
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+    @staticmethod
+    def _load_headers(meta_path: Path, body_path: Path) -> dict[str, str] | None:
+        if not meta_path.exists() or not body_path.exists():
+            return None
+        try:
+            return json.loads(meta_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+
+async def _get_with_backoff(client: httpx.AsyncClient, url: str, **kwargs: Any) -> httpx.Response:
+    """
+    GET that honours Shopify's 429 responses, sleeping for Retry-After (or an exponential fallback).
+    """
+    for attempt in range(HTTP_MAX_RETRIES):
+        resp = await client.get(url, **kwargs)
+        if resp.status_code != 429:
+            return resp
+        delay = _retry_after_seconds(resp, default=float(2**attempt))
+        logger.warning("Rate limited by %s; retrying in %.1fs", url, delay)
+        await asyncio.sleep(delay)
+    return await client.get(url, **kwargs)
+
+
+def _retry_after_seconds(resp: httpx.Response, *, default: float) -> float:
+    try:
+        return max(float(resp.headers.get("retry-after", "")), 0.0)
+    except ValueError:
+        return default
+
+
 def _parse_product_json(data: Any, *, base_url: str) -> List[ProductRecord]:
     if isinstance(data, dict) and "products" in data and isinstance(data["products"], list):
         return [_convert_shopify_product(prod, base_url) for prod in data["products"]]
@@ -140,16 +312,38 @@ def _parse_product_json(data: Any, *, base_url: str) -> List[ProductRecord]:
     raise ValueError("Remote endpoint returned an unsupported JSON structure.")
 
 
-def _load_shopify_collection(url: str) -> List[ProductRecord]:
+async def _load_shopify_collection(url: str, *, client: httpx.AsyncClient) -> List[ProductRecord]:
     base = url.split("?")[0].rstrip("/")
     json_url = f"{base}/products.json"
     logger.info("Attempting Shopify collection JSON at %s", json_url)
 
-    resp = httpx.get(json_url, timeout=30.0)
+    products = await _fetch_shopify_page(client, json_url, page=1)
+    next_page = 2
+    exhausted = len(products) < SHOPIFY_PAGE_LIMIT
+    while not exhausted:
+        # Page count is unknown up front, so fetch a window of pages at a time until one comes back short.
+        pages = range(next_page, next_page + SHOPIFY_PAGE_BATCH)
+        batch = await asyncio.gather(*(_fetch_shopify_page(client, json_url, page=page) for page in pages))
+        for page_products in batch:
+            products.extend(page_products)
+            if len(page_products) < SHOPIFY_PAGE_LIMIT:
+                exhausted = True
+                break
+        next_page += SHOPIFY_PAGE_BATCH
+
+    return _parse_product_json({"products": products}, base_url=url)
+
+
+async def _fetch_shopify_page(client: httpx.AsyncClient, json_url: str, *, page: int) -> list[dict[str, Any]]:
+    resp = await _get_with_backoff(client, json_url, params={"limit": SHOPIFY_PAGE_LIMIT, "page": page})
     if resp.status_code != 200:
         raise ValueError(f"Unable to fetch Shopify collection JSON from {json_url}")
 
-    return _parse_product_json(resp.json(), base_url=url)
+    data = orjson.loads(resp.content)
+    products = data.get("products") if isinstance(data, dict) else None
+    if not isinstance(products, list):
+        raise ValueError("Remote endpoint returned an unsupported JSON structure.")
+    return products
 
 
 def _convert_shopify_product(product: dict[str, Any], base_url: str) -> ProductRecord:
@@ -158,7 +352,7 @@ def _convert_shopify_product(product: dict[str, Any], base_url: str) -> ProductR
     body_html = product.get("body_html") or ""
     description = _strip_html(body_html) or title
     tags_raw = product.get("tags", "")
-    tags = [tag.strip() for tag in tags_raw.split(",") if tag.strip()] if isinstance(tags_raw, str) else []
+    tags = _parse_tags(tags_raw) if isinstance(tags_raw, str) else []
 
     base_parts = urlparse(base_url)
     product_url = None
@@ -192,98 +386,163 @@ def _convert_shopify_product(product: dict[str, Any], base_url: str) -> ProductR
         option_values = []
         for key in ("option1", "option2", "option3"):
             val = variant.get(key)
-            if val and val != "Default Title":
+            if val and val != SHOPIFY_DEFAULT_TITLE:
                 option_values.append(val)
 
+        raw_title = variant.get("title")
+        if not raw_title or raw_title == SHOPIFY_DEFAULT_TITLE:
+            raw_title = option_values[0] if option_values else title
+
+        # Fields are coerced here, so construct skips re-running the validators on trusted Shopify data.
         variant_records.append(
-            VariantRecord(
+            VariantRecord.model_construct(
                 id=str(variant_id or handle or title),
-                title=(variant.get("title") or option_values[0] if option_values else title).strip() or title,
+                title=raw_title.strip() or title,
                 sku=variant.get("sku"),
-                price=variant.get("price") or product.get("price") or 0.0,
-                compare_at_price=variant.get("compare_at_price"),
+                price=_coerce_price(variant.get("price") or product.get("price") or 0.0),
+                compare_at_price=_coerce_optional_price(variant.get("compare_at_price")),
                 available=bool(variant.get("available", False)),
                 image_url=image_url,
                 option_values=option_values,
             )
         )
 
-    record = {
-        "slug": handle or title.lower().replace(" ", "-"),
-        "title": title or handle,
-        "description": description,
-        "tags": tags,
-        "url": product_url,
-        "product_type": product.get("product_type"),
-        "variants": variant_records,
-    }
-    return ProductRecord.model_validate(record)
+    slug = handle or title.lower().replace(" ", "-")
+    display_title = title or handle or ""
+    if not variant_records:
+        raise ValueError(f"Product {slug!r} must include at least one variant.")
+    if min(len(slug), len(display_title), len(description)) < 3:
+        raise ValueError(f"Product {slug!r} is missing a slug, title, or description.")
+
+    return ProductRecord.model_construct(
+        slug=slug,
+        title=display_title,
+        description=description,
+        tags=tags,
+        url=product_url,
+        product_type=product.get("product_type"),
+        variants=variant_records,
+    )
+
+
+def _coerce_price(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid price value {value!r}")
+
+
+def _coerce_optional_price(value: Any) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
 
 
 def _strip_html(value: str) -> str:
     if not value:
         return ""
+    if LexborHTMLParser is not None:
+        return LexborHTMLParser(value).text(separator=" ", strip=True)
+
+    from bs4 import BeautifulSoup
+
     soup = BeautifulSoup(value, "html.parser")
     return soup.get_text(separator=" ", strip=True)
 
 
 def build_documents(records: Iterable[ProductRecord]) -> List[Document]:
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from langchain_core.documents import Document
+
     documents: list[Document] = []
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
 
     for record in records:
         base_description = record.description
         tags_text = ", ".join(record.tags)
-        splitter = RecursiveCharacterTextSplitter(chunk_size=512, chunk_overlap=64)
+        # Every chunk of a record carries the same product fields; intern them and share one tag list
+        # so the FAISS docstore does not hold a copy per chunk.
+        title = sys.intern(record.title)
+        slug = sys.intern(record.slug)
+        product_type = sys.intern(record.product_type) if record.product_type else None
+        tags = [sys.intern(tag) for tag in record.tags]
+        url = str(record.url) if record.url else None
+
+        product_metadata: dict[str, Any] = {"productTitle": title, "productSlug": slug}
+        if url is not None:
+            product_metadata["productUrl"] = url
+        if product_type is not None:
+            product_metadata["productType"] = product_type
+        product_metadata["tags"] = tags
 
         for variant in record.variants:
-            variant_text_parts = [
-                f"Product: {record.title}",
-                f"Variant: {variant.title}",
-            ]
-            if record.product_type:
-                variant_text_parts.append(f"Type: {record.product_type}")
-            if tags_text:
-                variant_text_parts.append(f"Tags: {tags_text}")
-            variant_text_parts.append(f"Description: {base_description}")
-            variant_text_parts.append(f"Price: {variant.price}")
-            if variant.compare_at_price:
-                variant_text_parts.append(f"Compare at price: {variant.compare_at_price}")
-            variant_text_parts.append(f"Available: {'yes' if variant.available else 'no'}")
             option_text = ", ".join(variant.option_values)
-            if option_text:
-                variant_text_parts.append(f"Options: {option_text}")
+            full_text = (
+                f"Product: {record.title}\nVariant: {variant.title}"
+                + (f"\nType: {record.product_type}" if record.product_type else "")
+                + (f"\nTags: {tags_text}" if tags_text else "")
+                + f"\nDescription: {base_description}\nPrice: {variant.price}"
+                + (f"\nCompare at price: {variant.compare_at_price}" if variant.compare_at_price else "")
+                + f"\nAvailable: {'yes' if variant.available else 'no'}"
+                + (f"\nOptions: {option_text}" if option_text else "")
+            )
 
-            full_text = "\n".join(variant_text_parts)
-            chunks = splitter.split_text(full_text) or [full_text]
+            # Most variant blurbs fit in one chunk, so skip the splitter's separator cascade for them.
+            if len(full_text) <= CHUNK_SIZE:
+                chunks = [full_text]
+            else:
+                chunks = splitter.split_text(full_text) or [full_text]
+
+            variant_metadata = {
+                **product_metadata,
+                "variantId": variant.id,
+                "variantTitle": variant.title,
+                "available": variant.available,
+                "price": variant.price,
+            }
+            if variant.compare_at_price is not None:
+                variant_metadata["compareAtPrice"] = variant.compare_at_price
+            if variant.sku is not None:
+                variant_metadata["sku"] = variant.sku
+            if variant.image_url is not None:
+                variant_metadata["imageUrl"] = variant.image_url
 
             for chunk_index, chunk in enumerate(chunks):
-                metadata = {
-                    "productTitle": record.title,
-                    "productSlug": record.slug,
-                    "productUrl": str(record.url) if record.url else None,
-                    "productType": record.product_type,
-                    "tags": record.tags,
-                    "variantId": variant.id,
-                    "variantTitle": variant.title,
-                    "available": variant.available,
-                    "price": variant.price,
-                    "compareAtPrice": variant.compare_at_price,
-                    "sku": variant.sku,
-                    "imageUrl": variant.image_url,
-                    "chunkIndex": chunk_index,
-                }
-                metadata = {k: v for k, v in metadata.items() if v is not None}
-
                 documents.append(
                     Document(
                         page_content=chunk,
-                        metadata=metadata,
+                        metadata={**variant_metadata, "chunkIndex": chunk_index},
                     )
                 )
     return documents
 
 
+def build_documents_parallel(records: Iterable[ProductRecord], *, max_workers: Optional[int] = None) -> List[Document]:
+    """
+    Same output as build_documents, with batches of records formatted and split on worker processes.
+    Small catalogues are built inline since pool start-up would dominate.
+    """
+    records = list(records)
+    if len(records) <= PARALLEL_BUILD_MIN_RECORDS:
+        return build_documents(records)
+
+    batches = [
+        records[start : start + PARALLEL_BUILD_BATCH_SIZE]
+        for start in range(0, len(records), PARALLEL_BUILD_BATCH_SIZE)
+    ]
+    documents: list[Document] = []
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        for batch_documents in executor.map(build_documents, batches):
+            documents.extend(batch_documents)
+    return documents
+
+
 def get_embeddings(provider: str):
+    from app.services.products import build_product_embeddings
+
     settings = get_settings()
     normalized = (provider or (settings.embeddings_provider or "openai")).lower()
     try:
@@ -292,8 +551,18 @@ def get_embeddings(provider: str):
         raise ValueError(str(exc)) from exc
 
 
-def ingest_products(*, records: Iterable[ProductRecord], dest: Path, provider: str) -> Path:
-    documents = build_documents(records)
+def ingest_products(
+    *,
+    records: Iterable[ProductRecord] = (),
+    dest: Path,
+    provider: str,
+    parallel: bool = False,
+    quantize: str = "none",
+    documents: List[Document] | None = None,
+) -> Path:
+    # Callers that already built the documents (e.g. to inspect them) can pass them straight through.
+    if documents is None:
+        documents = build_documents_parallel(records) if parallel else build_documents(records)
     if not documents:
         raise ValueError("No documents were produced from the provided records.")
 
@@ -304,23 +573,118 @@ def ingest_products(*, records: Iterable[ProductRecord], dest: Path, provider: s
 
     if backend == "faiss":
         logger.info("Creating FAISS index with %d documents", len(documents))
-        vector_store = FAISS.from_documents(documents, embeddings)
         dest.mkdir(parents=True, exist_ok=True)
+        vector_store = _build_faiss_store(documents, embeddings, workdir=dest, quantize=quantize)
         vector_store.save_local(str(dest))
         logger.info("Saved FAISS index to %s", dest)
         return dest
 
     if backend == "pinecone":
-        return _ingest_into_pinecone(
+        location = _ingest_into_pinecone(
             documents=documents,
             embeddings=embeddings,
             settings=settings,
             provider=provider_name,
         )
+        return location
 
     raise ValueError(f"Unsupported product vector store backend: {backend}")
 
 
+def _build_faiss_store(documents: List[Document], embeddings, *, workdir: Path, quantize: str = "none"):
+    """
+    Builds the LangChain FAISS store without holding every embedding as Python floats:
+    vectors are streamed into a float32 memmap, then added to the index slice by slice.
+    """
+    import numpy as np
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp_dir:
+        vectors = _embed_to_memmap(embeddings, [doc.page_content for doc in documents], Path(tmp_dir) / "vectors.bin")
+        index = _create_faiss_index(vectors, quantize=quantize)
+        for start in range(0, len(vectors), EMBEDDING_BATCH_SIZE):
+            index.add(np.ascontiguousarray(vectors[start : start + EMBEDDING_BATCH_SIZE]))
+        del vectors
+
+    ids = [str(uuid.uuid4()) for _ in documents]
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=InMemoryDocstore(dict(zip(ids, documents))),
+        index_to_docstore_id=dict(enumerate(ids)),
+    )
+
+
+def _create_faiss_index(vectors: "numpy.ndarray", *, quantize: str):
+    """
+    Returns an empty (trained, when needed) index. Every variant keeps the L2 metric that
+    FAISS.from_documents uses, so FAISS.load_local and relevance scoring work unchanged.
+    """
+    import faiss
+    import numpy as np
+
+    count, dimension = vectors.shape
+    if quantize == "sq8":
+        index = faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_L2)
+    elif quantize == "pq":
+        if count < 2**PQ_BITS:
+            logger.warning("PQ needs at least %d vectors to train; using a flat index for %d.", 2**PQ_BITS, count)
+            return faiss.IndexFlatL2(dimension)
+        index = faiss.IndexPQ(dimension, _pq_subquantizers(dimension), PQ_BITS, faiss.METRIC_L2)
+    elif quantize == "ivfpq":
+        if count < 2**PQ_BITS:
+            logger.warning("IVF-PQ needs at least %d vectors to train; using a flat index for %d.", 2**PQ_BITS, count)
+            return faiss.IndexFlatL2(dimension)
+        nlist = max(1, min(math.isqrt(count), count // IVF_MIN_POINTS_PER_LIST))
+        index = faiss.index_factory(
+            dimension, f"IVF{nlist},PQ{_pq_subquantizers(dimension)}x{PQ_BITS}", faiss.METRIC_L2
+        )
+        # Polysemous codes only help polysemous search, which LangChain never enables.
+        index.do_polysemous_training = False
+    elif quantize == "none":
+        return faiss.IndexFlatL2(dimension)
+    else:
+        raise ValueError(f"Unsupported FAISS quantization: {quantize}")
+
+    logger.info("Training %s index on %d vectors", quantize, count)
+    index.train(np.ascontiguousarray(vectors))
+    if quantize == "ivfpq":
+        index.nprobe = min(IVF_NPROBE, index.nlist)
+    return index
+
+
+def _pq_subquantizers(dimension: int) -> int:
+    for candidate in range(min(PQ_MAX_SUBQUANTIZERS, dimension), 0, -1):
+        if dimension % candidate == 0:
+            return candidate
+    return 1
+
+
+def _embed_to_memmap(
+    embeddings,
+    texts: List[str],
+    path: Path,
+    *,
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+) -> "numpy.memmap":
+    """
+    Embed texts in bounded batches, writing each batch straight into an on-disk float32 matrix.
+    """
+    import numpy as np
+
+    vectors: Optional[np.memmap] = None
+    for start in range(0, len(texts), batch_size):
+        batch = np.asarray(embeddings.embed_documents(texts[start : start + batch_size]), dtype=np.float32)
+        if vectors is None:
+            vectors = np.memmap(path, dtype=np.float32, mode="w+", shape=(len(texts), batch.shape[1]))
+        vectors[start : start + len(batch)] = batch
+    if vectors is None:
+        raise ValueError("No texts were provided for embedding.")
+    vectors.flush()
+    return vectors
+
+
 def _ingest_into_pinecone(
     *,
     documents: List[Document],
@@ -328,20 +692,38 @@ def _ingest_into_pinecone(
     settings: AppSettings,
     provider: str,
 ) -> Path:
-    from langchain_pinecone import PineconeVectorStore
-
     dimension = _embedding_dimension(provider)
     index_name, client = _ensure_pinecone_index(settings, dimension=dimension)
     index = client.Index(index_name)
-    vector_store = PineconeVectorStore(index=index, embedding=embeddings)
-    vector_store.add_documents(documents)
+
+    # Upserts run on worker threads while the next batch is embedded on this one.
+    futures = []
+    with ThreadPoolExecutor(max_workers=PINECONE_UPSERT_WORKERS) as executor:
+        for start in range(0, len(documents), EMBEDDING_BATCH_SIZE):
+            batch = documents[start : start + EMBEDDING_BATCH_SIZE]
+            vectors = embeddings.embed_documents([doc.page_content for doc in batch])
+            records = [
+                (str(uuid.uuid4()), vector, {**doc.metadata, PINECONE_TEXT_KEY: doc.page_content})
+                for doc, vector in zip(batch, vectors)
+            ]
+            for offset in range(0, len(records), PINECONE_UPSERT_BATCH_SIZE):
+                chunk = records[offset : offset + PINECONE_UPSERT_BATCH_SIZE]
+                futures.append(executor.submit(index.upsert, vectors=chunk))
+        for future in futures:
+            future.result()
+
     logger.info("Upserted %d documents into Pinecone index %s", len(documents), index_name)
     return Path(index_name)
 
 
-def _ensure_pinecone_index(settings: AppSettings, *, dimension: int) -> tuple[str, "Pinecone"]:
-    from pinecone import Pinecone, ServerlessSpec
+def _pinecone_module():
+    # Imported on demand so FAISS-only runs never pay for the pinecone SDK import.
+    import pinecone
+
+    return pinecone
+
 
+def _ensure_pinecone_index(settings: AppSettings, *, dimension: int) -> tuple[str, Any]:
     api_key = (settings.pinecone_api_key or "").strip()
     if not api_key:
         raise ValueError("PINECONE_API_KEY is required when PRODUCT_VECTOR_STORE_BACKEND=pinecone.")
@@ -349,7 +731,8 @@ def _ensure_pinecone_index(settings: AppSettings, *, dimension: int) -> tuple[st
     if not index_name:
         raise ValueError("PINECONE_INDEX_NAME is required when PRODUCT_VECTOR_STORE_BACKEND=pinecone.")
 
-    client = Pinecone(api_key=api_key)
+    pinecone = _pinecone_module()
+    client = pinecone.Pinecone(api_key=api_key)
     names = extract_index_names(client.list_indexes())
     if index_name not in names:
         logger.info(
@@ -362,7 +745,7 @@ def _ensure_pinecone_index(settings: AppSettings, *, dimension: int) -> tuple[st
             name=index_name,
             dimension=dimension,
             metric="cosine",
-            spec=ServerlessSpec(cloud=settings.pinecone_cloud, region=settings.pinecone_region),
+            spec=pinecone.ServerlessSpec(cloud=settings.pinecone_cloud, region=settings.pinecone_region),
         )
     else:
         logger.info("Using existing Pinecone index %s", index_name)
@@ -391,6 +774,25 @@ def parse_args() -> argparse.Namespace:
     )
     parser.add_argument("--provider", type=str, default="openai", help="Embeddings provider: openai|local|fake.")
     parser.add_argument("--fetch-url", type=str, default=None, help="Optional HTTPS endpoint returning product JSON list.")
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help=f"Bypass the HTTP response cache at {DEFAULT_HTTP_CACHE_DIR}.",
+    )
+    parser.add_argument(
+        "--quantize",
+        choices=FAISS_QUANTIZATION_CHOICES,
+        default="none",
+        help=(
+            "Compress FAISS vectors: none (flat float32), sq8 (8-bit scalar), pq (product quantization), "
+            "or ivfpq (inverted lists over PQ codes, for large catalogues)."
+        ),
+    )
+    parser.add_argument(
+        "--parallel",
+        action="store_true",
+        help=f"Build documents on a process pool (used when more than {PARALLEL_BUILD_MIN_RECORDS} products).",
+    )
     return parser.parse_args()
 
 
@@ -410,28 +812,26 @@ def _dedupe_records(records: Iterable[ProductRecord]) -> List[ProductRecord]:
             seen.add(key)
             unique_variants.append(variant)
 
-        if unique_variants:
+        if len(unique_variants) == len(record.variants):
+            unique_records.append(record)
+        elif unique_variants:
             unique_records.append(record.model_copy(update={"variants": unique_variants}))
 
     return unique_records
 
 
 def _gather_records(args: argparse.Namespace) -> List[ProductRecord]:
+    cache_dir = None if args.no_cache else DEFAULT_HTTP_CACHE_DIR
     if args.fetch_url:
         logger.info("Using explicit fetch URL: %s", args.fetch_url)
-        return load_products_from_url(args.fetch_url)
+        return load_products_from_url(args.fetch_url, cache_dir=cache_dir)
 
     if args.source:
         logger.info("Loading products from seed file: %s", args.source)
         return load_products_from_file(args.source)
 
     logger.info("Fetching default collections: %s", ", ".join(DEFAULT_COLLECTION_URLS))
-    aggregated: list[ProductRecord] = []
-    for url in DEFAULT_COLLECTION_URLS:
-        try:
-            aggregated.extend(load_products_from_url(url))
-        except Exception as exc:  # pragma: no cover - defensive logging
-            logger.error("Failed to load collection %s: %s", url, exc)
+    aggregated = asyncio.run(load_products_from_urls(DEFAULT_COLLECTION_URLS, cache_dir=cache_dir))
     return _dedupe_records(aggregated)
 
 
@@ -440,7 +840,13 @@ def main() -> None:
     records = _gather_records(args)
     if not records:
         raise ValueError("No products were loaded; aborting ingestion.")
-    ingest_products(records=records, dest=args.dest, provider=args.provider)
+    ingest_products(
+        records=records,
+        dest=args.dest,
+        provider=args.provider,
+        parallel=args.parallel,
+        quantize=args.quantize,
+    )
 
 
 if __name__ == "__main__":
@@ -3,26 +3,29 @@ from __future__ import annotations
 import argparse
 import csv
 import html
-import json
 import logging
 import re
+import sqlite3
 import unicodedata
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime
+from itertools import islice
 import os
 from pathlib import Path
-from typing import Any, Iterable, List
+from typing import Any, Iterable, Iterator, List
 from urllib.parse import urljoin, urlparse
 
 import httpx
+import orjson
 from bs4 import BeautifulSoup
 from pydantic import BaseModel, Field, ValidationError, model_validator
-from sqlalchemy import create_engine, select
-from sqlalchemy.engine import make_url
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
-from app.core.config import AppSettings
+from app.core.config import AppSettings, get_settings
 from app.db.base import Base
 from app.db.models import Outlet
 
@@ -33,6 +36,18 @@ DEFAULT_ENDPOINT = "https://zuscoffee.com/category/store/kuala-lumpur-selangor/"
 DEFAULT_ENDPOINTS = [DEFAULT_ENDPOINT]
 DEFAULT_SQLITE_DB_URL = "sqlite:///./data/sqlite/outlets.db"
 
+HTTP_TIMEOUT_SECONDS = 30.0
+HTTP_MAX_CONNECTIONS = 4
+WP_POSTS_PER_PAGE = 100
+
+UPSERT_COLUMNS = ("name", "city", "state", "postal_code", "address", "open_time", "close_time", "services")
+# Rows per INSERT ... ON CONFLICT statement; each row binds external_id plus UPSERT_COLUMNS. SQLite
+# allows 32766 bound parameters per statement since 3.32 but only 999 before it (Postgres: 65535).
+UPSERT_BATCH_SIZE = 500 if sqlite3.sqlite_version_info >= (3, 32) else 999 // (len(UPSERT_COLUMNS) + 1)
+
+# Database URLs whose tables have already been created during this process.
+_SCHEMA_READY: set[str] = set()
+
 CSV_FIELDNAMES = [
     "name",
     "address",
@@ -60,6 +75,8 @@ class OutletRecord(BaseModel):
     model_config = {
         "populate_by_name": True,
         "extra": "ignore",
+        # Records are write-once after parsing; freezing guards the upsert path against mutation.
+        "frozen": True,
     }
 
     @model_validator(mode="before")
@@ -70,8 +87,8 @@ class OutletRecord(BaseModel):
             services_raw = services_raw.strip()
             if services_raw:
                 try:
-                    services_raw = json.loads(services_raw)
-                except json.JSONDecodeError as exc:
+                    services_raw = orjson.loads(services_raw)
+                except orjson.JSONDecodeError as exc:
                     raise ValueError(f"servicesJson is not valid JSON: {services_raw}") from exc
         if not isinstance(services_raw, list):
             raise ValueError("servicesJson must be a JSON array of service names.")
@@ -103,16 +120,43 @@ class OutletRecord(BaseModel):
     @model_validator(mode="after")
     def _validate_times(self) -> "OutletRecord":
         for field_name in ("open_time", "close_time"):
-            value = getattr(self, field_name)
-            if value is None:
-                continue
-            try:
-                datetime.strptime(value, "%H:%M")
-            except ValueError as exc:
-                raise ValueError(f"{field_name} must be in HH:MM 24h format, got {value!r}") from exc
+            _check_time_format(field_name, getattr(self, field_name))
         return self
 
 
+def _check_time_format(field_name: str, value: str | None) -> None:
+    if value is None:
+        return
+    try:
+        datetime.strptime(value, "%H:%M")
+    except ValueError as exc:
+        raise ValueError(f"{field_name} must be in HH:MM 24h format, got {value!r}") from exc
+
+
+def _record_from_normalised(normalised: dict[str, Any]) -> OutletRecord:
+    """
+    Builds an OutletRecord from _normalise_outlet_payload output without re-running the validators;
+    only the invariants the normaliser does not already guarantee are checked here.
+    """
+    name = normalised["name"]
+    address = normalised["address"]
+    if len(name) < 3 or len(address) < 3:
+        raise ValueError(f"Outlet {name!r} has a name or address shorter than 3 characters.")
+    _check_time_format("open_time", normalised["openTime"])
+    _check_time_format("close_time", normalised["closeTime"])
+    return OutletRecord.model_construct(
+        name=name,
+        address=address,
+        open_time=normalised["openTime"],
+        close_time=normalised["closeTime"],
+        services=normalised["services"],
+        external_id=normalised["externalId"],
+        city=normalised["city"],
+        state=normalised["state"],
+        postal_code=normalised["postalCode"],
+    )
+
+
 @dataclass
 class SeedResult:
     inserted: int = 0
@@ -149,13 +193,43 @@ CITY_ALIASES = {
     "wilayah persekutuan labuan": "Labuan",
 }
 
+# "Malaysia" shows up as a trailing address segment but is never a state.
+_STATE_LOOKUP: dict[str, str | None] = {**STATE_ALIASES, "malaysia": None}
+
+_SLUG_RE = re.compile(r"[^a-zA-Z0-9]+")
+_WHITESPACE_RE = re.compile(r"\s+")
+_SEGMENT_SPLIT_RE = re.compile(r"[,\n]")
+_DASH_RE = re.compile(r"[–—]")
+_ECS_PARAMS_RE = re.compile(r"var\s+ecs_ajax_params\s*=\s*(\{.*?\});", re.DOTALL)
+# Matches cleaned times such as "9:30", "0930", "9pm" or "930pm" (spaces removed, "." -> ":").
+_TIME_RE = re.compile(r"^(\d{1,2})(?::(\d{1,2})|(\d{2}))?(am|pm)?$")
+_JSON_SCRIPT_SELECTOR = 'script[type="application/ld+json"], script[type="application/json"]'
+_TAG_RE = re.compile(r"<[^>]+>")
+_SCRIPT_OR_STYLE_RE = re.compile(r"<(?:script|style)\b", re.IGNORECASE)
+SIMPLE_HTML_MAX_LENGTH = 256
+
+_NAME_KEYS = ("name", "storeName", "outlet", "outletName")
+_HOURS_KEYS = ("hours", "operatingHours", "openingHours")
+_OPEN_TIME_PATHS = tuple((key, "open") for key in _HOURS_KEYS)
+_CLOSE_TIME_PATHS = tuple((key, "close") for key in _HOURS_KEYS)
+
+try:
+    import lxml  # noqa: F401
+
+    HTML_PARSER = "lxml"
+except ImportError:  # pragma: no cover - optional dependency
+    HTML_PARSER = "html.parser"
+
 
 def _strip_html_text(value: Any) -> str:
     if value is None:
         return ""
     if isinstance(value, str):
         if "<" in value and ">" in value:
-            soup = BeautifulSoup(value, "html.parser")
+            if len(value) < SIMPLE_HTML_MAX_LENGTH and not _SCRIPT_OR_STYLE_RE.search(value):
+                # Short address/title fragments only need tags dropped and entities decoded.
+                return _WHITESPACE_RE.sub(" ", html.unescape(_TAG_RE.sub(" ", value))).strip()
+            soup = BeautifulSoup(value, HTML_PARSER)
             return soup.get_text(" ", strip=True)
         return value.strip()
     return str(value).strip()
@@ -166,72 +240,68 @@ def _slugify(value: str) -> str:
         return "outlet"
     normalized = unicodedata.normalize("NFKD", value)
     ascii_only = normalized.encode("ascii", "ignore").decode("ascii")
-    cleaned = re.sub(r"[^a-zA-Z0-9]+", "-", ascii_only).strip("-").lower()
+    cleaned = _SLUG_RE.sub("-", ascii_only).strip("-").lower()
     return cleaned or "outlet"
 
 
 def _normalise_state(value: str | None) -> str | None:
-    if not value:
-        return None
-    cleaned = re.sub(r"\s+", " ", value).strip()
-    if not cleaned:
-        return None
-    key = cleaned.lower()
-    if key in STATE_ALIASES:
-        return STATE_ALIASES[key]
-    if key == "malaysia":
-        return None
-    return cleaned.title()
+    return _normalise_place(value, _STATE_LOOKUP)
 
 
 def _normalise_city(value: str | None) -> str | None:
+    return _normalise_place(value, CITY_ALIASES)
+
+
+def _normalise_place(value: str | None, lookup: dict[str, str | None]) -> str | None:
     if not value:
         return None
-    cleaned = re.sub(r"\s+", " ", value).strip()
+    cleaned = " ".join(value.split())
     if not cleaned:
         return None
     key = cleaned.lower()
-    if key in CITY_ALIASES:
-        return CITY_ALIASES[key]
+    if key in lookup:
+        return lookup[key]
     return cleaned.title()
 
 
+def _find_postal(segment: str) -> int:
+    """
+    Returns the start of the right-most standalone 5-digit run in ``segment``, or -1.
+    """
+    end = len(segment)
+    for start in range(end - 5, -1, -1):
+        if (
+            segment[start : start + 5].isdigit()
+            and (start == 0 or not segment[start - 1].isdigit())
+            and (start + 5 == end or not segment[start + 5].isdigit())
+        ):
+            return start
+    return -1
+
+
 def _extract_city_state_postal(
     address: str, *, city_hint: str | None, state_hint: str | None
 ) -> tuple[str | None, str | None, str | None]:
-    segments = [seg.strip() for seg in re.split(r"[,\n]", address) if seg.strip()]
-    postal_code = None
-    postal_idx = None
-    match_info: re.Match[str] | None = None
-    for idx in range(len(segments) - 1, -1, -1):
-        match = re.search(r"(\d{5})", segments[idx])
-        if match:
-            postal_code = match.group(1)
-            postal_idx = idx
-            match_info = match
-            break
-
+    segments = [seg.strip() for seg in _SEGMENT_SPLIT_RE.split(address) if seg.strip()]
     city = _normalise_city(city_hint)
     state = _normalise_state(state_hint)
+    postal_code = None
 
-    if postal_idx is not None and match_info is not None:
-        segment = segments[postal_idx]
-        before = segment[: match_info.start()].strip(" ,")
-        after = segment[match_info.end() :].strip(" ,")
-
-        candidates = [after, before]
-        for candidate in candidates:
-            if candidate:
-                city_candidate = _normalise_city(candidate)
-                if city_candidate:
-                    city = city_candidate
-                    break
-
-        for seg in segments[postal_idx + 1 :]:
+    # The postal code sits near the end of Malaysian addresses, so scan segments backwards once.
+    for idx in range(len(segments) - 1, -1, -1):
+        segment = segments[idx]
+        start = _find_postal(segment)
+        if start < 0:
+            continue
+        postal_code = segment[start : start + 5]
+        before, after = segment[:start], segment[start + 5 :]
+        city = _normalise_city(after.strip(" ,") or before.strip(" ,")) or city
+        for seg in segments[idx + 1 :]:
             state_candidate = _normalise_state(seg)
             if state_candidate:
                 state = state_candidate
                 break
+        break
 
     if not state and city:
         state = _normalise_state(city)
@@ -260,36 +330,29 @@ def _standardize_time(value: Any) -> str | None:
     for needle, repl in replacements.items():
         lower = lower.replace(needle, repl)
     lower = lower.replace(" ", "")
-    candidates = [
-        "%H:%M",
-        "%H%M",
-        "%I:%M%p",
-        "%I%p",
-        "%I%M%p",
-        "%I.%M%p",
-    ]
-    for fmt in candidates:
-        try:
-            dt = datetime.strptime(lower.upper(), fmt)
-            return dt.strftime("%H:%M")
-        except ValueError:
-            continue
-    # Handle cases like "9:00" after stripping spaces
-    if len(lower) == 4 and lower.isdigit():
-        return f"{lower[:2]}:{lower[2:]}"
-    if len(lower) == 5 and lower[2] == ":":
-        try:
-            datetime.strptime(lower, "%H:%M")
-            return lower
-        except ValueError:
+    match = _TIME_RE.match(lower)
+    if match is None:
+        return None
+    hour_raw, colon_minute, packed_minute, meridiem = match.groups()
+    hour = int(hour_raw)
+    minute_raw = colon_minute or packed_minute
+    minute = int(minute_raw) if minute_raw else 0
+    if meridiem:
+        if not 1 <= hour <= 12:
             return None
-    return None
+        hour = hour % 12 + (12 if meridiem == "pm" else 0)
+    elif minute_raw is None:
+        # A bare hour without am/pm is too ambiguous to store.
+        return None
+    if hour > 23 or minute > 59:
+        return None
+    return f"{hour:02d}:{minute:02d}"
 
 
 def _parse_hours_range(value: Any) -> tuple[str | None, str | None]:
     if not isinstance(value, str):
         return None, None
-    expanded = value.replace("–", "-").replace("—", "-")
+    expanded = _DASH_RE.sub("-", value)
     separators = [" to ", "-", "–", "—", "–", "—"]
     for sep in separators:
         if sep in expanded:
@@ -309,30 +372,52 @@ def _coerce_services_list(value: Any) -> list[str]:
         if not stripped:
             return []
         try:
-            parsed = json.loads(stripped)
+            parsed = orjson.loads(stripped)
             if isinstance(parsed, list):
                 return [str(item).strip() for item in parsed if str(item).strip()]
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             pass
         return [part.strip() for part in stripped.replace("|", ",").split(",") if part.strip()]
     return []
 
 
-def _normalise_outlet_payload(raw: dict[str, Any]) -> dict[str, Any]:
-    def extract(key: str, default: Any = None) -> Any:
-        value: Any = raw
-        for part in key.split("."):
-            if isinstance(value, dict):
-                value = value.get(part, default)
-            else:
-                value = default
+def _get_path(raw: dict[str, Any], path: tuple[str, ...]) -> Any:
+    value: Any = raw
+    for part in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _first_path_value(raw: dict[str, Any], paths: tuple[tuple[str, ...], ...]) -> Any:
+    for path in paths:
+        value = _get_path(raw, path)
+        if value:
+            return value
+    return None
+
+
+def _first_name_value(title_value: Any, raw: dict[str, Any]) -> str:
+    value = title_value
+    if not value:
+        for key in _NAME_KEYS:
+            value = raw.get(key)
+            if value:
                 break
-        return value
+        else:
+            return ""
+    if isinstance(value, str):
+        # Entities only appear in HTML-sourced titles; skip the unescape scan otherwise.
+        return (html.unescape(value) if "&" in value else value).strip()
+    return str(value).strip()
 
-    title_value = extract("title")
+
+def _normalise_outlet_payload(raw: dict[str, Any]) -> dict[str, Any]:
+    title_value = raw.get("title")
     if isinstance(title_value, dict):
         title_value = title_value.get("rendered") or title_value.get("raw")
-    name = html.unescape(str(title_value or raw.get("name") or raw.get("storeName") or raw.get("outlet") or raw.get("outletName") or "")).strip()
+    name = _first_name_value(title_value, raw)
     if not name:
         raise ValueError("Outlet missing name.")
 
@@ -354,13 +439,13 @@ def _normalise_outlet_payload(raw: dict[str, Any]) -> dict[str, Any]:
     if isinstance(address_value, dict):
         address_value = address_value.get("rendered") or address_value.get("text")
     if not address_value:
-        content_value = extract("content")
+        content_value = raw.get("content")
         if isinstance(content_value, dict):
             address_value = content_value.get("rendered")
         else:
             address_value = content_value
     if not address_value:
-        excerpt_value = extract("excerpt")
+        excerpt_value = raw.get("excerpt")
         if isinstance(excerpt_value, dict):
             address_value = excerpt_value.get("rendered")
         else:
@@ -377,9 +462,9 @@ def _normalise_outlet_payload(raw: dict[str, Any]) -> dict[str, Any]:
     city_hint = _strip_html_text(city_hint_raw) or None
     state_hint = _strip_html_text(state_hint_raw) or None
 
-    open_time_value = extract("hours.open") or extract("operatingHours.open") or extract("openingHours.open") or raw.get("openTime") or raw.get("open_time") or raw.get("open")
-    close_time_value = extract("hours.close") or extract("operatingHours.close") or extract("openingHours.close") or raw.get("closeTime") or raw.get("close_time") or raw.get("close")
-    hours_text = extract("hours") or extract("operatingHours") or extract("openingHours") or raw.get("hoursText") or raw.get("businessHours")
+    open_time_value = _first_path_value(raw, _OPEN_TIME_PATHS) or raw.get("openTime") or raw.get("open_time") or raw.get("open")
+    close_time_value = _first_path_value(raw, _CLOSE_TIME_PATHS) or raw.get("closeTime") or raw.get("close_time") or raw.get("close")
+    hours_text = raw.get("hours") or raw.get("operatingHours") or raw.get("openingHours") or raw.get("hoursText") or raw.get("businessHours")
     if isinstance(hours_text, dict):
         hours_text = hours_text.get("range") or hours_text.get("text")
 
@@ -412,8 +497,8 @@ def _normalise_outlet_payload(raw: dict[str, Any]) -> dict[str, Any]:
     }
 
 
-def _default_db_url() -> str:
-    settings = AppSettings()
+def _default_db_url(settings: AppSettings | None = None) -> str:
+    settings = settings or get_settings()
     backend = (settings.outlets_db_backend or "sqlite").strip().lower()
     postgres_url = (settings.outlets_postgres_url or "").strip()
     sqlite_url = (settings.outlets_sqlite_url or DEFAULT_SQLITE_DB_URL).strip()
@@ -427,63 +512,96 @@ def _default_db_url() -> str:
 
 
 def load_outlets_from_csv(path: Path) -> List[OutletRecord]:
+    records = list(iter_outlets_from_csv(path))
+    if not records:
+        raise ValueError("CSV file did not contain any outlet records.")
+    return records
+
+
+def iter_outlets_from_csv(path: Path) -> Iterator[OutletRecord]:
+    """
+    Yields validated outlet rows one at a time so large CSVs can be seeded without loading them fully.
+    """
     if not path.exists():
         raise FileNotFoundError(f"CSV file not found at {path}")
 
-    records: list[OutletRecord] = []
     with path.open("r", encoding="utf-8", newline="") as handle:
-        reader = csv.DictReader(handle)
-        if reader.fieldnames is None:
+        # csv.reader yields plain lists from C; zipping with the header avoids DictReader's per-row Python overhead.
+        reader = csv.reader(handle)
+        fieldnames = next(reader, None)
+        if fieldnames is None:
             raise ValueError("CSV file is missing headers.")
-        missing = [field for field in CSV_FIELDNAMES if field not in reader.fieldnames]
+        missing = [field for field in CSV_FIELDNAMES if field not in fieldnames]
         if missing:
             raise ValueError(f"CSV file is missing required columns: {', '.join(missing)}")
 
-        for row in reader:
-            if not any(row.values()):
+        for values in reader:
+            if not any(values):
                 continue
+            row = dict(zip(fieldnames, values))
             for optional_key in ("city", "state", "postalCode"):
                 row.setdefault(optional_key, None)
             try:
-                record = OutletRecord.model_validate(row)
+                yield OutletRecord.model_validate(row)
             except ValidationError as exc:
                 raise ValueError(f"Invalid outlet row {row}: {exc}") from exc
-            records.append(record)
 
-    if not records:
-        raise ValueError("CSV file did not contain any outlet records.")
 
-    return records
+def _build_http_client() -> httpx.Client:
+    return httpx.Client(timeout=HTTP_TIMEOUT_SECONDS, transport=_build_transport())
+
+
+def _build_transport() -> httpx.BaseTransport:
+    # The WP pagination threads share one client, so the pool is sized to the thread count and
+    # each worker keeps its connection alive from one posts page to the next.
+    return httpx.HTTPTransport(
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+        ),
+    )
 
 
-def _fetch_wp_category_posts(endpoint_url: str, category_id: int) -> list[dict[str, Any]]:
+def _fetch_wp_category_posts(
+    endpoint_url: str, category_id: int, *, client: httpx.Client
+) -> list[dict[str, Any]]:
     parsed = urlparse(endpoint_url)
     base = f"{parsed.scheme}://{parsed.netloc}"
     rest_url = urljoin(base, "/wp-json/wp/v2/posts")
-    results: list[dict[str, Any]] = []
-    page = 1
-    while True:
-        params = {
-            "categories": category_id,
-            "per_page": 100,
-            "page": page,
-            "_fields": "id,slug,title.rendered,content.rendered,excerpt.rendered",
-        }
-        resp = httpx.get(rest_url, params=params, timeout=30.0)
-        if resp.status_code == 400 and "rest_post_invalid_page_number" in resp.text:
-            break
-        resp.raise_for_status()
-        chunk = resp.json()
-        if not isinstance(chunk, list) or not chunk:
-            break
-        results.extend(chunk)
-        total_pages = int(resp.headers.get("X-WP-TotalPages", "1"))
-        if page >= total_pages:
-            break
-        page += 1
+
+    first_page, total_pages = _fetch_wp_posts_page(client, rest_url, category_id, 1)
+    results = list(first_page)
+    if not first_page or total_pages <= 1:
+        return results
+
+    # X-WP-TotalPages is known after page 1, so the remaining pages are requested together.
+    pages = range(2, total_pages + 1)
+    with ThreadPoolExecutor(max_workers=min(HTTP_MAX_CONNECTIONS, len(pages))) as executor:
+        for chunk, _ in executor.map(lambda page: _fetch_wp_posts_page(client, rest_url, category_id, page), pages):
+            results.extend(chunk)
     return results
 
 
+def _fetch_wp_posts_page(
+    client: httpx.Client, rest_url: str, category_id: int, page: int
+) -> tuple[list[dict[str, Any]], int]:
+    params = {
+        "categories": category_id,
+        "per_page": WP_POSTS_PER_PAGE,
+        "page": page,
+        "_fields": "id,slug,title.rendered,content.rendered,excerpt.rendered",
+    }
+    resp = client.get(rest_url, params=params)
+    if resp.status_code == 400 and "rest_post_invalid_page_number" in resp.text:
+        return [], page - 1
+    resp.raise_for_status()
+    chunk = orjson.loads(resp.content)
+    if not isinstance(chunk, list):
+        return [], page
+    return chunk, int(resp.headers.get("X-WP-TotalPages", "1"))
+
+
 def _parse_outlets_json(payload: Any) -> List[OutletRecord]:
     candidates = payload
     if isinstance(payload, dict):
@@ -500,8 +618,7 @@ def _parse_outlets_json(payload: Any) -> List[OutletRecord]:
         if not isinstance(item, dict):
             continue
         try:
-            normalised = _normalise_outlet_payload(item)
-            records.append(OutletRecord.model_validate(normalised))
+            records.append(_record_from_normalised(_normalise_outlet_payload(item)))
         except ValueError as exc:
             logger.debug("Skipping outlet due to validation error: %s", exc)
             continue
@@ -510,30 +627,31 @@ def _parse_outlets_json(payload: Any) -> List[OutletRecord]:
     return records
 
 
-def _parse_outlets_html(html: str, endpoint_url: str) -> List[OutletRecord]:
-    match = re.search(r"var\s+ecs_ajax_params\s*=\s*(\{.*?\});", html, re.DOTALL)
+def _parse_outlets_html(html: str, endpoint_url: str, *, client: httpx.Client) -> List[OutletRecord]:
+    match = _ECS_PARAMS_RE.search(html)
     if match:
         try:
-            config = json.loads(match.group(1))
+            config = orjson.loads(match.group(1))
             posts_conf_raw = config.get("posts")
             if posts_conf_raw:
-                posts_conf = json.loads(posts_conf_raw)
+                posts_conf = orjson.loads(posts_conf_raw)
                 category_id = posts_conf.get("cat")
                 if category_id is not None:
-                    wp_posts = _fetch_wp_category_posts(endpoint_url, int(category_id))
+                    wp_posts = _fetch_wp_category_posts(endpoint_url, int(category_id), client=client)
                     if wp_posts:
                         return _parse_outlets_json(wp_posts)
-        except json.JSONDecodeError as exc:
+        except orjson.JSONDecodeError as exc:
             logger.debug("Failed to parse ecs_ajax_params: %s", exc)
 
-    soup = BeautifulSoup(html, "html.parser")
-    for script_tag in soup.find_all("script"):
+    soup = BeautifulSoup(html, HTML_PARSER)
+    # Only typed JSON scripts carry structured data; analytics/JS tags are never parsed.
+    for script_tag in soup.select(_JSON_SCRIPT_SELECTOR):
         script_content = (script_tag.string or script_tag.text or "").strip()
-        if not script_content:
+        if script_content[:1] not in ("{", "["):
             continue
         try:
-            payload = json.loads(script_content)
-        except json.JSONDecodeError:
+            payload = orjson.loads(script_content)
+        except orjson.JSONDecodeError:
             continue
         try:
             return _parse_outlets_json(payload)
@@ -547,8 +665,7 @@ def _parse_outlets_html(html: str, endpoint_url: str) -> List[OutletRecord]:
         address = content_node.get_text(" ", strip=True) if content_node else ""
         payload = {"name": name, "address": address}
         try:
-            normalised = _normalise_outlet_payload(payload)
-            records.append(OutletRecord.model_validate(normalised))
+            records.append(_record_from_normalised(_normalise_outlet_payload(payload)))
         except ValueError as exc:
             logger.debug("Skipping outlet from HTML article: %s", exc)
             continue
@@ -559,20 +676,24 @@ def _parse_outlets_html(html: str, endpoint_url: str) -> List[OutletRecord]:
     raise ValueError("Endpoint HTML did not contain parsable outlet data.")
 
 
-def load_outlets_from_endpoint(url: str) -> List[OutletRecord]:
+def load_outlets_from_endpoint(url: str, *, client: httpx.Client | None = None) -> List[OutletRecord]:
+    if client is None:
+        with _build_http_client() as owned_client:
+            return load_outlets_from_endpoint(url, client=owned_client)
+
     logger.info("Fetching outlet data from %s", url)
-    resp = httpx.get(url, timeout=30.0)
+    resp = client.get(url)
     if resp.status_code >= 400:
         raise ValueError(f"Endpoint {url} returned status {resp.status_code}")
     content_type = (resp.headers.get("content-type") or "").split(";")[0].strip().lower()
     text = resp.text
     if "application/json" in content_type or (text and text.lstrip().startswith(("{", "["))):
         try:
-            payload = resp.json()
-        except json.JSONDecodeError as exc:
+            payload = orjson.loads(resp.content)
+        except orjson.JSONDecodeError as exc:
             raise ValueError("Endpoint did not return valid JSON payload.") from exc
         return _parse_outlets_json(payload)
-    return _parse_outlets_html(text, url)
+    return _parse_outlets_html(text, url, client=client)
 
 
 def _prepare_engine(db_url: str):
@@ -584,62 +705,136 @@ def _prepare_engine(db_url: str):
         db_path.parent.mkdir(parents=True, exist_ok=True)
         url = url.set(database=str(db_path))
     engine = create_engine(url, future=True)
+    if url.get_backend_name() == "sqlite":
+        event.listen(engine, "connect", _tune_sqlite_for_bulk_load)
     return engine
 
 
-def seed_outlets(*, records: Iterable[OutletRecord], db_url: str) -> SeedResult:
-    records = list(records)
-    if not records:
-        raise ValueError("No outlet records were provided.")
-
-    engine = _prepare_engine(db_url)
+def _tune_sqlite_for_bulk_load(dbapi_connection, _connection_record) -> None:
+    # This is the database the API serves from, so the on-disk rollback journal stays: a killed
+    # seed must roll back cleanly. NORMAL only skips the extra fsyncs, not crash recovery.
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA cache_size=-65536")
+    finally:
+        cursor.close()
+
+
+def _ensure_schema(engine) -> None:
+    # create_all reflects every table before issuing DDL; once per database URL is enough.
+    # In-memory SQLite URLs name a fresh database per engine, so those are never remembered.
+    key = engine.url.render_as_string(hide_password=False)
+    if key in _SCHEMA_READY:
+        return
     Base.metadata.create_all(engine)
+    if engine.url.database not in (None, "", ":memory:"):
+        _SCHEMA_READY.add(key)
+
+
+def seed_outlets(
+    *,
+    records: Iterable[OutletRecord],
+    db_url: str | None = None,
+    engine: Engine | None = None,
+    session: Session | None = None,
+) -> SeedResult:
+    """
+    Upserts ``records`` into the outlets table. Pass exactly one of ``db_url``, ``engine`` or
+    ``session``; an injected session must already have the schema and owns the transaction.
+    """
+    if sum(target is not None for target in (db_url, engine, session)) != 1:
+        raise ValueError("Provide exactly one of db_url, engine or session.")
+
+    records_iter = iter(records)
+    first_batch = list(islice(records_iter, UPSERT_BATCH_SIZE))
+    if not first_batch:
+        raise ValueError("No outlet records were provided.")
 
     result = SeedResult()
+    if session is not None:
+        _upsert_all(session, first_batch, records_iter, result)
+        session.flush()
+        return result
+
+    if engine is None:
+        engine = _prepare_engine(db_url)
+    _ensure_schema(engine)
+
     try:
-        with Session(engine) as session:
-            for record in records:
-                stmt = select(Outlet).where(Outlet.external_id == record.external_id)
-                outlet = session.execute(stmt).scalar_one_or_none()
-                if outlet is None:
-                    outlet = Outlet(
-                        external_id=record.external_id,
-                        name=record.name,
-                        city=record.city,
-                        state=record.state,
-                        postal_code=record.postal_code,
-                        address=record.address,
-                        open_time=record.open_time,
-                        close_time=record.close_time,
-                        services=record.services,
-                    )
-                    session.add(outlet)
-                    result.inserted += 1
-                else:
-                    outlet.name = record.name
-                    outlet.city = record.city
-                    outlet.state = record.state
-                    outlet.postal_code = record.postal_code
-                    outlet.address = record.address
-                    outlet.open_time = record.open_time
-                    outlet.close_time = record.close_time
-                    outlet.services = record.services
-                    result.updated += 1
-            session.commit()
+        with Session(engine) as session, session.begin():
+            # Everything still commits as a single transaction.
+            _upsert_all(session, first_batch, records_iter, result)
     except SQLAlchemyError as exc:
         logger.error("Failed to seed outlets database: %s", exc)
         raise
 
     logger.info(
         "Seeded outlets database at %s (inserted=%d, updated=%d)",
-        db_url,
+        engine.url,
         result.inserted,
         result.updated,
     )
     return result
 
 
-def _gather_records(args: argparse.Namespace) -> List[OutletRecord]:
+def _upsert_all(
+    session: Session, first_batch: list[OutletRecord], records_iter: Iterator[OutletRecord], result: SeedResult
+) -> None:
+    # Only one batch is buffered at a time.
+    batch = first_batch
+    while batch:
+        _upsert_batch(session, batch, result)
+        batch = list(islice(records_iter, UPSERT_BATCH_SIZE))
+
+
+def _upsert_batch(session: Session, batch: list[OutletRecord], result: SeedResult) -> None:
+    """
+    Writes one batch with a single INSERT ... ON CONFLICT (external_id) DO UPDATE statement.
+    """
+    external_ids = {record.external_id for record in batch}
+    seen = set(session.scalars(select(Outlet.external_id).where(Outlet.external_id.in_(external_ids))))
+
+    rows: dict[str, dict[str, Any]] = {}
+    for record in batch:
+        if record.external_id in seen:
+            result.updated += 1
+        else:
+            result.inserted += 1
+            seen.add(record.external_id)
+        # Postgres rejects touching the same row twice in one statement, so the last duplicate wins.
+        rows[record.external_id] = {
+            "external_id": record.external_id,
+            **{column: getattr(record, column) for column in UPSERT_COLUMNS},
+        }
+
+    insert = _dialect_insert(session.get_bind().dialect.name)
+    stmt = insert(Outlet).values(list(rows.values()))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Outlet.external_id],
+        set_={column: stmt.excluded[column] for column in UPSERT_COLUMNS},
+    )
+    session.execute(stmt)
+
+
+def _dialect_insert(dialect_name: str):
+    if dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+
+        return insert
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+
+        return insert
+    raise ValueError(f"Unsupported outlets database dialect: {dialect_name}")
+
+
+def _gather_records(args: argparse.Namespace) -> Iterable[OutletRecord]:
+    """
+    Returns endpoint records, or a lazy CSV iterator that seed_outlets consumes batch by batch;
+    an empty CSV surfaces there as an empty first batch.
+    """
     errors: list[Exception] = []
     endpoint_candidates: list[str] = []
     if not getattr(args, "skip_endpoint", False):
@@ -658,7 +853,7 @@ def _gather_records(args: argparse.Namespace) -> List[OutletRecord]:
                 raise
 
     if getattr(args, "csv", None):
-        return load_outlets_from_csv(Path(args.csv))
+        return iter_outlets_from_csv(Path(args.csv))
 
     if errors:
         raise errors[0]
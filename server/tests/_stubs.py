@@ -0,0 +1,74 @@
+"""
+Service stubs shared by the API and chat integration tests.
+"""
+
+from __future__ import annotations
+
+from app.models.outlets import OutletsQueryResponse
+from app.models.products import ProductHit, ProductSearchResponse
+from app.services.calculator import CalculatorResult
+from app.services.products import ProductSearchError
+
+
+class StubCalculatorService:
+    def __init__(self, result: int | float = 15) -> None:
+        self.result = result
+
+    def evaluate(self, expression: str) -> CalculatorResult:
+        return CalculatorResult(expression=expression, result=self.result)
+
+
+class StubProductService:
+    def __init__(self, response: ProductSearchResponse | None = None, *, should_fail: bool = False) -> None:
+        self.response = response
+        self.should_fail = should_fail
+        self.received: list[tuple[str, int]] = []
+
+    def search(self, query: str, k: int = 3) -> ProductSearchResponse:
+        self.received.append((query, k))
+        if self.should_fail:
+            raise ProductSearchError("Index offline.")
+        if self.response is not None:
+            return self.response
+        return ProductSearchResponse(
+            query=query,
+            topK=[
+                ProductHit(
+                    title="Steel Bottle",
+                    variantTitle="Matte Black",
+                    variantId="steel",
+                    score=0.9,
+                    url="https://example.com/steel",
+                    price=79.0,
+                    available=True,
+                    snippet="Steel bottle keeps drinks cold.",
+                )
+            ],
+            summary="Popular bottle.",
+        )
+
+    async def search_async(self, query: str, k: int = 3) -> ProductSearchResponse:
+        return self.search(query, k=k)
+
+
+class StubOutletsService:
+    def __init__(self, response: OutletsQueryResponse | None = None, error: Exception | None = None) -> None:
+        self.response = response
+        self.error = error
+        self.calls: list[str] = []
+
+    def query(self, user_query: str) -> OutletsQueryResponse:
+        self.calls.append(user_query)
+        if self.error:
+            raise self.error
+        if self.response is not None:
+            return self.response
+        return OutletsQueryResponse(
+            query=user_query,
+            sql="SELECT * FROM outlets",
+            params={},
+            rows=[{"name": "ZUS Coffee SS 2", "open_time": "09:00", "close_time": "21:00"}],
+        )
+
+    async def query_async(self, user_query: str) -> OutletsQueryResponse:
+        return self.query(user_query)
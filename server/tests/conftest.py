@@ -1,10 +1,44 @@
 import sys
 from pathlib import Path
 
+import pytest
+
 ROOT = Path(__file__).resolve().parents[1]
 
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
 
+@pytest.fixture(scope="session")
+def engine():
+    """
+    One in-memory SQLite database holding the outlets table, shared by every test module in the run.
+    """
+    from sqlalchemy import create_engine
+    from sqlalchemy.pool import StaticPool
+
+    from app.db.models import Outlet
+
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+        future=True,
+    )
+    Outlet.__table__.create(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture()
+def db_session(engine):
+    """
+    A session on the shared engine whose writes are rolled back when the test ends.
+    """
+    from sqlalchemy.orm import Session
 
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        with Session(bind=connection, join_transaction_mode="create_savepoint") as session:
+            yield session
+        transaction.rollback()
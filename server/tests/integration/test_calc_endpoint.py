@@ -1,16 +1,18 @@
+from typing import Iterator
+
+import pytest
 from fastapi.testclient import TestClient
 
 from app.main import create_app
 
 
-def create_test_client() -> TestClient:
-    app = create_app()
-    return TestClient(app)
-
+@pytest.fixture(scope="module")
+def client() -> Iterator[TestClient]:
+    with TestClient(create_app()) as test_client:
+        yield test_client
 
-def test_calc_endpoint_returns_result_for_valid_expression() -> None:
-    client = create_test_client()
 
+def test_calc_endpoint_returns_result_for_valid_expression(client: TestClient) -> None:
     response = client.get("/calc", params={"query": "3*(4+5)"})
 
     assert response.status_code == 200
@@ -21,9 +23,7 @@ def test_calc_endpoint_returns_result_for_valid_expression() -> None:
     assert response.headers["X-Request-ID"]
 
 
-def test_calc_endpoint_returns_error_for_invalid_expression() -> None:
-    client = create_test_client()
-
+def test_calc_endpoint_returns_error_for_invalid_expression(client: TestClient) -> None:
     response = client.get("/calc", params={"query": "abc"})
 
     assert response.status_code == 400
@@ -33,9 +33,7 @@ def test_calc_endpoint_returns_error_for_invalid_expression() -> None:
     assert payload["error"]["traceId"] == response.headers["X-Request-ID"]
 
 
-def test_calc_endpoint_requires_query_param() -> None:
-    client = create_test_client()
-
+def test_calc_endpoint_requires_query_param(client: TestClient) -> None:
     response = client.get("/calc")
 
     assert response.status_code == 422
@@ -1,11 +1,12 @@
 from __future__ import annotations
 
+import uuid
+
 import pytest
 from fastapi.testclient import TestClient
 
-from app.agents.llm import clear_fake_responses, queue_fake_response
-from app.agents.memory import memory_store
-from app.core.config import get_settings
+from app.agents.llm import fake_responses
+from app.core.config import AppSettings
 from app.main import create_app
 from app.models.calculator import CalculatorResult
 
@@ -19,13 +20,22 @@ class StubCalculatorHttpService:
         return CalculatorResult(expression=expression, result=25)
 
 
+@pytest.fixture(scope="module", autouse=True)
+def _http_calc_settings():
+    # The chat route reads settings per request, so hand it a prebuilt instance instead of re-parsing the env.
+    settings = AppSettings(
+        _env_file=None,
+        calc_tool_mode="http",
+        calc_http_base_url="http://calc.internal",
+        planner_llm_provider="fake",
+    )
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr("app.api.routes.chat.get_settings", lambda: settings)
+        yield settings
+
+
 @pytest.fixture()
 def client(monkeypatch):
-    monkeypatch.setenv("CALC_TOOL_MODE", "http")
-    monkeypatch.setenv("CALC_HTTP_BASE_URL", "http://calc.internal")
-    monkeypatch.setenv("PLANNER_LLM_PROVIDER", "fake")
-    get_settings.cache_clear()
-
     stub_service = StubCalculatorHttpService()
     monkeypatch.setattr(
         "app.services.calculator_http.CalculatorHttpService.from_settings",
@@ -37,27 +47,23 @@ def client(monkeypatch):
     with TestClient(app) as test_client:
         yield test_client, stub_service
 
-    clear_fake_responses()
-    memory_store.clear("http-calc-session")
-    get_settings.cache_clear()
-
 
 def test_chat_uses_http_calculator(client):
     test_client, stub_service = client
-    clear_fake_responses()
-    queue_fake_response({"intent": "calc"})
-    queue_fake_response({"calcExpression": "5+10"})
-    queue_fake_response({"decision": "call_calc"})
-    queue_fake_response({"message": "The result is 15."})
-
-    payload = {
-        "sessionId": "http-calc-session",
-        "messages": [{"role": "user", "content": "Calculate 5+10"}],
-    }
-
-    response = test_client.post("/chat", json=payload)
-
-    assert response.status_code == 200
-    assert stub_service.calls == ["5+10"]
+    with fake_responses(
+        {"intent": "calc"},
+        {"calcExpression": "5+10"},
+        {"decision": "call_calc"},
+        {"message": "The result is 15."},
+    ):
+        payload = {
+            "sessionId": f"test-{uuid.uuid4().hex}",
+            "messages": [{"role": "user", "content": "Calculate 5+10"}],
+        }
+
+        response = test_client.post("/chat", json=payload)
+
+        assert response.status_code == 200
+        assert stub_service.calls == ["5+10"]
 
 
@@ -1,12 +1,18 @@
+from typing import Iterator
+
+import pytest
 from fastapi.testclient import TestClient
 
 from app.main import create_app
 
 
-def test_cors_allows_configured_origin() -> None:
-    app = create_app()
-    client = TestClient(app)
+@pytest.fixture(scope="module")
+def client() -> Iterator[TestClient]:
+    with TestClient(create_app()) as test_client:
+        yield test_client
+
 
+def test_cors_allows_configured_origin(client: TestClient) -> None:
     response = client.options(
         "/health",
         headers={
@@ -1,43 +1,47 @@
+from typing import Callable, Iterator
+
+import pytest
+from fastapi import FastAPI
 from fastapi.testclient import TestClient
 
 from app.api.routes.outlets import get_outlets_service
 from app.main import create_app
 from app.models.outlets import OutletsQueryResponse
 from app.services.outlets import OutletsExecutionError, OutletsQueryError
+from tests._stubs import StubOutletsService
+
+
+SS2_HOURS_RESPONSE = OutletsQueryResponse(
+    query="opening hours ss2",
+    sql="SELECT open_time FROM outlets WHERE area = 'SS 2'",
+    params={},
+    rows=[{"open_time": "09:00"}],
+)
+
 
+@pytest.fixture(scope="module")
+def app() -> FastAPI:
+    return create_app()
 
-class StubOutletsService:
-    def __init__(self, response: OutletsQueryResponse | None = None, error: Exception | None = None):
-        self.response = response
-        self.error = error
-        self.calls = []
 
-    def query(self, user_query: str) -> OutletsQueryResponse:
-        self.calls.append(user_query)
-        if self.error:
-            raise self.error
-        assert self.response is not None
-        return self.response
+@pytest.fixture(scope="module")
+def client(app: FastAPI) -> Iterator[TestClient]:
+    with TestClient(app) as test_client:
+        yield test_client
 
-    async def query_async(self, user_query: str) -> OutletsQueryResponse:
-        return self.query(user_query)
 
+@pytest.fixture()
+def use_service(app: FastAPI) -> Iterator[Callable[[StubOutletsService], None]]:
+    def install(service: StubOutletsService) -> None:
+        app.dependency_overrides[get_outlets_service] = lambda: service
 
-def create_client(service: StubOutletsService) -> TestClient:
-    app = create_app()
-    app.dependency_overrides[get_outlets_service] = lambda: service
-    return TestClient(app)
+    yield install
+    app.dependency_overrides.clear()
 
 
-def test_outlets_endpoint_returns_rows():
-    response = OutletsQueryResponse(
-        query="opening hours ss2",
-        sql="SELECT open_time FROM outlets WHERE area = 'SS 2'",
-        params={},
-        rows=[{"open_time": "09:00"}],
-    )
-    service = StubOutletsService(response=response)
-    client = create_client(service)
+def test_outlets_endpoint_returns_rows(client: TestClient, use_service):
+    service = StubOutletsService(response=SS2_HOURS_RESPONSE)
+    use_service(service)
 
     res = client.get("/outlets", params={"query": "opening hours ss2"})
 
@@ -47,9 +51,9 @@ def test_outlets_endpoint_returns_rows():
     assert res.headers["X-Request-ID"]
 
 
-def test_outlets_endpoint_handles_validation_error():
+def test_outlets_endpoint_handles_validation_error(client: TestClient, use_service):
     service = StubOutletsService(error=OutletsQueryError("missing info"))
-    client = create_client(service)
+    use_service(service)
 
     res = client.get("/outlets", params={"query": "bad"})
 
@@ -58,9 +62,9 @@ def test_outlets_endpoint_handles_validation_error():
     assert res.json()["error"]["traceId"] == res.headers["X-Request-ID"]
 
 
-def test_outlets_endpoint_handles_execution_error():
+def test_outlets_endpoint_handles_execution_error(client: TestClient, use_service):
     service = StubOutletsService(error=OutletsExecutionError("db down"))
-    client = create_client(service)
+    use_service(service)
 
     res = client.get("/outlets", params={"query": "anything"})
 
@@ -1,57 +1,60 @@
+from typing import Callable, Iterator
+
+import pytest
+from fastapi import FastAPI
 from fastapi.testclient import TestClient
 
 from app.api.routes.products import get_product_search_service
 from app.main import create_app
 from app.models.products import ProductHit, ProductSearchResponse
-from app.services.products import ProductSearchError
-
-
-class StubProductService:
-    def __init__(self, response: ProductSearchResponse | None = None, *, should_fail: bool = False):
-        self.response = response
-        self.should_fail = should_fail
-        self.received = []
-
-    def search(self, query: str, k: int = 3) -> ProductSearchResponse:
-        self.received.append((query, k))
-        if self.should_fail:
-            raise ProductSearchError("Index offline.")
-        assert self.response is not None
-        return self.response
-
-    async def search_async(self, query: str, k: int = 3) -> ProductSearchResponse:
-        return self.search(query, k=k)
-
-
-def create_client(service: StubProductService) -> TestClient:
-    app = create_app()
-    app.dependency_overrides[get_product_search_service] = lambda: service
-    return TestClient(app)
-
-
-def test_products_endpoint_returns_hits():
-    response = ProductSearchResponse(
-        query="steel bottle",
-        topK=[
-            ProductHit(
-                title="Steel Bottle 500ml",
-                variantTitle="Matte Black",
-                score=0.9,
-                url="https://example.com/steel",
-                price=79.0,
-                compareAtPrice=99.0,
-                available=True,
-                imageUrl="https://example.com/image.jpg",
-                sku="SKU-1",
-                productType="Tumbler",
-                tags=["tumbler"],
-                snippet="Steel bottle",
-            ),
-        ],
-        summary="Summary",
-    )
-    service = StubProductService(response=response)
-    client = create_client(service)
+from tests._stubs import StubProductService
+
+
+STEEL_BOTTLE_RESPONSE = ProductSearchResponse(
+    query="steel bottle",
+    topK=[
+        ProductHit(
+            title="Steel Bottle 500ml",
+            variantTitle="Matte Black",
+            score=0.9,
+            url="https://example.com/steel",
+            price=79.0,
+            compareAtPrice=99.0,
+            available=True,
+            imageUrl="https://example.com/image.jpg",
+            sku="SKU-1",
+            productType="Tumbler",
+            tags=["tumbler"],
+            snippet="Steel bottle",
+        ),
+    ],
+    summary="Summary",
+)
+
+
+@pytest.fixture(scope="module")
+def app() -> FastAPI:
+    return create_app()
+
+
+@pytest.fixture(scope="module")
+def client(app: FastAPI) -> Iterator[TestClient]:
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture()
+def use_service(app: FastAPI) -> Iterator[Callable[[StubProductService], None]]:
+    def install(service: StubProductService) -> None:
+        app.dependency_overrides[get_product_search_service] = lambda: service
+
+    yield install
+    app.dependency_overrides.clear()
+
+
+def test_products_endpoint_returns_hits(client: TestClient, use_service):
+    service = StubProductService(response=STEEL_BOTTLE_RESPONSE)
+    use_service(service)
 
     res = client.get("/products", params={"query": "steel bottle", "k": 1})
 
@@ -64,9 +67,9 @@ def test_products_endpoint_returns_hits():
     assert res.headers["X-Request-ID"]
 
 
-def test_products_endpoint_handles_service_failure():
+def test_products_endpoint_handles_service_failure(client: TestClient, use_service):
     service = StubProductService(should_fail=True)
-    client = create_client(service)
+    use_service(service)
 
     res = client.get("/products", params={"query": "steel bottle"})
 
@@ -2,71 +2,62 @@ from __future__ import annotations
 
 import httpx
 import pytest
-import respx
 from httpx import Response
 
 from app.core.config import AppSettings
 from app.services.calculator import CalculatorError
-from app.services.calculator_http import CalculatorHttpService, CalculatorHttpServiceError
+from app.services.calculator_http import CalculatorHttpService, CalculatorHttpServiceError, close_shared_services
 
 
-@respx.mock
-def test_evaluate_returns_result(respx_mock):
-    service = CalculatorHttpService(base_url="http://calculator.local", timeout=1.5)
-    respx_mock.get("http://calculator.local/calc").mock(
-        return_value=Response(200, json={"expression": "1+2", "result": 3})
-    )
+def make_service(handler, **kwargs) -> CalculatorHttpService:
+    return CalculatorHttpService(base_url="http://calculator.local", transport=httpx.MockTransport(handler), **kwargs)
+
+
+def test_evaluate_returns_result():
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> Response:
+        requests.append(request)
+        return Response(200, json={"expression": "1+2", "result": 3})
+
+    service = make_service(handler, timeout=1.5)
 
     result = service.evaluate("1+2")
 
     assert result.result == 3
+    assert requests[0].url.path == "/calc"
+    assert requests[0].url.params["query"] == "1+2"
 
 
-@respx.mock
-def test_evaluate_raises_on_http_error(respx_mock):
-    service = CalculatorHttpService(base_url="http://calculator.local")
-    respx_mock.get("http://calculator.local/calc").mock(return_value=Response(500, json={"error": {"message": "fail"}}))
+def test_evaluate_raises_on_http_error():
+    service = make_service(lambda request: Response(500, json={"error": {"message": "fail"}}))
 
-    with pytest.raises(CalculatorHttpServiceError):
+    with pytest.raises(CalculatorHttpServiceError, match="fail"):
         service.evaluate("5+5")
 
 
-@respx.mock
-def test_evaluate_rejects_empty_expression(respx_mock):
-    service = CalculatorHttpService(base_url="http://calculator.local")
+def test_evaluate_rejects_empty_expression():
+    requests: list[httpx.Request] = []
+    service = make_service(lambda request: requests.append(request) or Response(200))
+
     with pytest.raises(CalculatorError):
         service.evaluate("   ")
-    assert not respx_mock.calls
-
+    assert not requests
 
-def test_evaluate_handles_network_error(monkeypatch):
-    service = CalculatorHttpService(base_url="http://calculator.local")
 
-    def fail_request(*args, **kwargs):
-        raise httpx.ConnectError("unreachable")
+def test_evaluate_handles_network_error():
+    def handler(request: httpx.Request) -> Response:
+        raise httpx.ConnectError("unreachable", request=request)
 
-    monkeypatch.setattr(httpx, "Client", lambda *args, **kwargs: DummyClient(fail_request))
+    service = make_service(handler)
 
     with pytest.raises(CalculatorHttpServiceError):
         service.evaluate("2+2")
 
 
-class DummyClient:
-    def __init__(self, callback):
-        self._callback = callback
-
-    def __enter__(self):
-        return self
-
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        return False
-
-    def get(self, *args, **kwargs):
-        return self._callback(*args, **kwargs)
-
-
 def test_from_settings_requires_base_url(monkeypatch):
-    monkeypatch.setattr("app.services.calculator_http.get_settings", lambda: AppSettings(calc_http_base_url=None))
+    settings = AppSettings(calc_http_base_url=None)
+    monkeypatch.setattr("app.services.calculator_http.get_settings", lambda: settings)
 
     with pytest.raises(CalculatorHttpServiceError):
         CalculatorHttpService.from_settings()
@@ -82,3 +73,44 @@ def test_from_settings_uses_timeout(monkeypatch):
     assert service.timeout == 7.5
 
 
+def test_evaluate_reuses_client_across_calls(monkeypatch):
+    clients = []
+
+    class CountingClient(httpx.Client):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            clients.append(self)
+
+    monkeypatch.setattr("app.services.calculator_http.httpx.Client", CountingClient)
+    requests = []
+    service = make_service(
+        lambda request: requests.append(request) or Response(200, json={"expression": "1+2", "result": 3})
+    )
+
+    service.evaluate("1+2")
+    service.evaluate("1+2")
+
+    assert len(clients) == 1
+    assert len(requests) == 2
+    service.close()
+    assert clients[0].is_closed
+
+
+def test_from_settings_reuses_service_for_same_configuration(monkeypatch):
+    settings = AppSettings(calc_http_base_url="http://calculator.shared/", calc_http_timeout_sec=3.0)
+    monkeypatch.setattr("app.services.calculator_http.get_settings", lambda: settings)
+
+    assert CalculatorHttpService.from_settings() is CalculatorHttpService.from_settings()
+    close_shared_services()
+
+
+def test_close_shared_services_closes_clients_and_forgets_them(monkeypatch):
+    settings = AppSettings(calc_http_base_url="http://calculator.shared", calc_http_timeout_sec=3.0)
+    monkeypatch.setattr("app.services.calculator_http.get_settings", lambda: settings)
+    service = CalculatorHttpService.from_settings()
+
+    close_shared_services()
+
+    assert service._client.is_closed
+    assert CalculatorHttpService.from_settings() is not service
+    close_shared_services()
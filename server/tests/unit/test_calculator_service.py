@@ -3,7 +3,7 @@ import pytest
 from app.services.calculator import CalculatorError, CalculatorService
 
 
-@pytest.fixture()
+@pytest.fixture(scope="module")
 def service() -> CalculatorService:
     return CalculatorService()
 
@@ -36,3 +36,10 @@ def test_resolved_cors_origins_deduplicates(monkeypatch) -> None:
     origins = settings.resolved_cors_origins
     assert origins.count(render_origin) == 1
 
+
+def test_resolved_cors_origins_defaults_include_local_frontend(monkeypatch) -> None:
+    clear_env(monkeypatch)
+
+    settings = AppSettings(_env_file=None)
+
+    assert settings.resolved_cors_origins[:2] == ["http://localhost:5173", "http://127.0.0.1:5173"]
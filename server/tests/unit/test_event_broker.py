@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+from app.agents.events import EventBroker
+
+
+def test_publish_evicts_least_recently_used_idle_channel() -> None:
+    broker = EventBroker(max_channels=2)
+
+    broker.publish("first", {"type": "node_start"})
+    broker.publish("second", {"type": "node_start"})
+    broker.publish("first", {"type": "node_end"})
+    broker.publish("third", {"type": "node_start"})
+
+    assert list(broker._channels) == ["first", "third"]
+    assert len(broker._channels["first"].events) == 2
+
+
+def test_events_of_tracks_backlog_through_overflow_and_consumption() -> None:
+    broker = EventBroker(max_backlog=3)
+
+    for index, event_type in enumerate(["node_start", "llm_call", "llm_call", "node_end"]):
+        broker.publish("session", {"type": event_type, "index": index})
+    channel = broker._channels["session"]
+
+    assert [event["index"] for event in channel.events_of("llm_call")] == [1, 2]
+    assert channel.events_of("node_start") == ()
+
+    assert channel.popleft()["index"] == 1
+    assert [event["index"] for event in channel.events_of("llm_call")] == [2]
+
+    assert broker.clear("session") == 2
+    assert channel.events_of("node_end") == ()
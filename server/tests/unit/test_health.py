@@ -1,12 +1,18 @@
+from typing import Iterator
+
+import pytest
 from fastapi.testclient import TestClient
 
 from app.main import create_app
 
 
-def test_health_returns_ok() -> None:
-    app = create_app()
-    client = TestClient(app)
+@pytest.fixture(scope="module")
+def client() -> Iterator[TestClient]:
+    with TestClient(create_app()) as test_client:
+        yield test_client
+
 
+def test_health_returns_ok(client: TestClient) -> None:
     response = client.get("/health")
 
     assert response.status_code == 200
@@ -1,8 +1,9 @@
-import json
 import sys
 import types
 from pathlib import Path
 
+import httpx
+import orjson
 import pytest
 
 from app.core.config import AppSettings
@@ -10,104 +11,126 @@ from server.scripts import ingest_products as script
 
 
 def write_seed(path: Path, records: list[dict]) -> None:
-    path.write_text(json.dumps(records), encoding="utf-8")
+    path.write_bytes(orjson.dumps(records))
 
 
-@pytest.mark.slow
-def test_ingest_products_creates_faiss_index(tmp_path, monkeypatch):
-    source = tmp_path / "seed.json"
-    write_seed(
-        source,
-        [
-            {
-                "slug": "sample",
-                "title": "Sample Bottle",
-                "description": "Keeps drinks hot.",
-                "specs": {"capacity_ml": 500},
-                "tags": ["bottle"],
-                "url": "https://example.com/bottle",
-                "variants": [
-                    {
-                        "id": "sample-bottle-default",
-                        "title": "Default",
-                        "sku": "SAMPLE-1",
-                        "price": 42.0,
-                        "compare_at_price": None,
-                        "available": True,
-                        "image_url": "https://example.com/image.jpg",
-                        "option_values": ["Standard"],
-                    }
-                ],
-            }
-        ],
-    )
+class FakeEmbeddings:
+    def __init__(self) -> None:
+        self.batches: list[list[str]] = []
 
-    records = script.load_products_from_file(source)
-    dest = tmp_path / "index"
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        return [[float(len(text))] for text in texts]
 
-    saved = {}
 
-    class DummyVectorStore:
-        def __init__(self, documents, embeddings):
-            self.documents = documents
-            self.embeddings = embeddings
+class DummyListResponse:
+    def __init__(self, names=None):
+        self._names = names or []
 
-        def save_local(self, path: str) -> None:
-            saved["path"] = path
-            path_obj = Path(path)
-            path_obj.mkdir(parents=True, exist_ok=True)
-            (path_obj / "index.faiss").write_text("stub", encoding="utf-8")
-            (path_obj / "index.pkl").write_text("stub", encoding="utf-8")
+    def names(self):
+        return list(self._names)
 
-    def fake_from_documents(documents, embeddings):
-        saved["documents"] = documents
-        saved["embeddings"] = embeddings
-        return DummyVectorStore(documents, embeddings)
 
-    monkeypatch.setattr(
-        script,
-        "FAISS",
-        type("FakeFAISS", (), {"from_documents": staticmethod(fake_from_documents)}),
-    )
-    monkeypatch.setattr(script, "get_embeddings", lambda provider: object())
+class DummyIndex:
+    def __init__(self):
+        self.upserts: list[list[tuple]] = []
 
-    script.ingest_products(records=records, dest=dest, provider="fake")
+    def upsert(self, vectors):
+        self.upserts.append(list(vectors))
 
-    assert (dest / "index.faiss").exists()
-    assert (dest / "index.pkl").exists()
-    assert saved["path"] == str(dest)
-    assert saved["documents"][0].metadata["variantId"] == "sample-bottle-default"
 
-    documents = script.build_documents(records)
+class DummyServerlessSpec:
+    def __init__(self, cloud, region):
+        self.cloud = cloud
+        self.region = region
+
+
+class DummyPineconeClient:
+    def __init__(self, api_key):
+        self.api_key = api_key
+        self.names: list[str] = []
+        self.created: list[dict[str, object]] = []
+        self.opened: list[str] = []
+        self.index = DummyIndex()
+
+    def list_indexes(self):
+        return DummyListResponse(self.names)
+
+    def create_index(self, name, dimension, metric, spec):
+        self.created.append(
+            {
+                "name": name,
+                "dimension": dimension,
+                "metric": metric,
+                "spec": spec,
+            }
+        )
+        self.names.append(name)
+
+    def Index(self, name):
+        self.opened.append(name)
+        return self.index
+
+
+SAMPLE_BOTTLE = {
+    "slug": "sample",
+    "title": "Sample Bottle",
+    "description": "Keeps drinks hot.",
+    "specs": {"capacity_ml": 500},
+    "tags": ["bottle"],
+    "url": "https://example.com/bottle",
+    "variants": [
+        {
+            "id": "sample-bottle-default",
+            "title": "Default",
+            "sku": "SAMPLE-1",
+            "price": 42.0,
+            "compare_at_price": None,
+            "available": True,
+            "image_url": "https://example.com/image.jpg",
+            "option_values": ["Standard"],
+        }
+    ],
+}
+
+
+@pytest.fixture(scope="module")
+def sample_records(tmp_path_factory):
+    # Written and parsed once; the ingest tests only read the resulting records.
+    source = tmp_path_factory.mktemp("seed") / "seed.json"
+    write_seed(source, [SAMPLE_BOTTLE])
+    return script.load_products_from_file(source)
+
+
+@pytest.mark.slow
+@pytest.mark.xdist_group("ingest")
+def test_ingest_products_creates_faiss_index(tmp_path, monkeypatch, sample_records):
+    documents = script.build_documents(sample_records)
     assert len(documents) >= 1
     doc = documents[0]
     assert "Sample Bottle" in doc.page_content
     assert doc.metadata["variantId"] == "sample-bottle-default"
     assert doc.metadata["price"] == 42.0
 
+    dest = tmp_path / "index"
+    monkeypatch.setattr(script, "get_embeddings", lambda provider: FakeEmbeddings())
 
-def test_ingest_products_uses_pinecone_when_configured(tmp_path, monkeypatch):
-    source = tmp_path / "seed.json"
-    write_seed(
-        source,
-        [
-            {
-                "slug": "sample",
-                "title": "Sample Bottle",
-                "description": "Keeps drinks hot.",
-                "tags": ["bottle"],
-                "variants": [
-                    {
-                        "id": "sample-bottle-default",
-                        "title": "Default",
-                        "price": 42.0,
-                        "available": True,
-                    }
-                ],
-            }
-        ],
-    )
+    script.ingest_products(documents=documents, dest=dest, provider="fake")
+
+    assert (dest / "index.faiss").exists()
+    assert (dest / "index.pkl").exists()
+    assert sorted(path.name for path in dest.iterdir()) == ["index.faiss", "index.pkl"]
 
+    from langchain_community.vectorstores import FAISS
+
+    loaded = FAISS.load_local(str(dest), FakeEmbeddings(), allow_dangerous_deserialization=True)
+    assert loaded.index.ntotal == 1
+    stored = next(iter(loaded.docstore._dict.values()))
+    assert stored.metadata["variantId"] == "sample-bottle-default"
+
+
+@pytest.mark.xdist_group("ingest")
+def test_ingest_products_uses_pinecone_when_configured(tmp_path, monkeypatch, sample_records):
     settings = AppSettings(
         product_vector_store_backend="pinecone",
         pinecone_api_key="test",
@@ -116,84 +139,33 @@ def test_ingest_products_uses_pinecone_when_configured(tmp_path, monkeypatch):
         pinecone_region="us-east-1",
     )
     monkeypatch.setattr(script, "get_settings", lambda: settings)
-    monkeypatch.setattr(script, "get_embeddings", lambda provider: object())
-
-    records = script.load_products_from_file(source)
-
-    saved: dict[str, object] = {}
-
-    class DummyListResponse:
-        def __init__(self, names=None):
-            self._names = names or []
-
-        def names(self):
-            return list(self._names)
-
-    class DummyIndex:
-        pass
-
-    class DummyPineconeClient:
-        def __init__(self, api_key):
-            self.api_key = api_key
-            self.names: list[str] = []
-            self.created: list[dict[str, object]] = []
-            self.index = DummyIndex()
-
-        def list_indexes(self):
-            return DummyListResponse(self.names)
-
-        def create_index(self, name, dimension, metric, spec):
-            self.created.append(
-                {
-                    "name": name,
-                    "dimension": dimension,
-                    "metric": metric,
-                    "spec": spec,
-                }
-            )
-            self.names.append(name)
-
-        def Index(self, name):
-            saved["index_name"] = name
-            return self.index
-
-    class DummyServerlessSpec:
-        def __init__(self, cloud, region):
-            saved["spec"] = {"cloud": cloud, "region": region}
+    monkeypatch.setattr(script, "get_embeddings", lambda provider: FakeEmbeddings())
 
     clients: list[DummyPineconeClient] = []
 
     def fake_pinecone(api_key):
         client = DummyPineconeClient(api_key)
         clients.append(client)
-        saved["client"] = client
         return client
 
     fake_pinecone_module = types.SimpleNamespace(Pinecone=fake_pinecone, ServerlessSpec=DummyServerlessSpec)
-    monkeypatch.setitem(sys.modules, "pinecone", fake_pinecone_module)
+    monkeypatch.setattr(script, "_pinecone_module", lambda: fake_pinecone_module)
 
-    class DummyVectorStore:
-        def __init__(self, index, embedding):
-            saved["index"] = index
-            saved["embedding"] = embedding
-
-        def add_documents(self, documents):
-            saved["documents"] = list(documents)
-
-    fake_langchain_pinecone = types.SimpleNamespace(PineconeVectorStore=DummyVectorStore)
-    monkeypatch.setitem(sys.modules, "langchain_pinecone", fake_langchain_pinecone)
-
-    result = script.ingest_products(records=records, dest=tmp_path / "ignored", provider="openai")
+    result = script.ingest_products(records=sample_records, dest=tmp_path / "ignored", provider="openai")
 
+    client = clients[0]
     assert result == Path(settings.pinecone_index_name)
-    assert saved["index_name"] == settings.pinecone_index_name
-    assert saved["documents"][0].metadata["variantId"] == "sample-bottle-default"
+    assert client.opened == [settings.pinecone_index_name]
+    upserted = [vector for batch in client.index.upserts for vector in batch]
+    _, values, metadata = upserted[0]
+    assert metadata["variantId"] == "sample-bottle-default"
+    assert values == [float(len(metadata["text"]))]
 
-    client = clients[0]
     assert client.api_key == settings.pinecone_api_key
     assert client.created[0]["name"] == settings.pinecone_index_name
     assert client.created[0]["dimension"] == 1536
-    assert saved["spec"] == {"cloud": settings.pinecone_cloud, "region": settings.pinecone_region}
+    spec = client.created[0]["spec"]
+    assert (spec.cloud, spec.region) == (settings.pinecone_cloud, settings.pinecone_region)
 
 
 def test_load_products_from_file_invalid(tmp_path):
@@ -204,119 +176,355 @@ def test_load_products_from_file_invalid(tmp_path):
         script.load_products_from_file(source)
 
 
-def test_load_products_from_url(monkeypatch):
-    called = {}
-
-    class DummyResponse:
-        def __init__(self, payload, status_code=200, headers=None):
-            self._payload = payload
-            self.status_code = status_code
-            self.headers = headers or {"content-type": "application/json"}
-
-        def json(self):
-            return self._payload
-
-    def fake_get(url, timeout):
-        called["url"] = url
-        return DummyResponse(
-            [
-                {
-                    "slug": "remote",
-                    "title": "Remote Tumbler",
-                    "description": "Pulls from remote JSON.",
-                    "tags": ["remote"],
-                    "variants": [
-                        {
-                            "id": "remote-variant",
-                            "title": "Remote Blue",
-                            "price": 59.0,
-                            "available": True,
-                        }
-                    ],
-                }
-            ]
+def use_mock_transport(monkeypatch, handler) -> None:
+    monkeypatch.setattr(script, "_build_transport", lambda: httpx.MockTransport(handler))
+
+
+def shopify_product_payload(handle: str, variant_id: int) -> dict:
+    return {
+        "handle": handle,
+        "title": handle.replace("-", " ").title(),
+        "body_html": "<p>Great cup</p>",
+        "tags": "cup,drinkware",
+        "product_type": "Tumbler",
+        "vendor": "ZUS",
+        "variants": [
+            {
+                "id": variant_id,
+                "title": "Misty Blue",
+                "sku": f"SKU-{variant_id}",
+                "price": "79.00",
+                "compare_at_price": "99.00",
+                "available": True,
+                "featured_image": {"src": "https://example.com/blue.jpg"},
+                "option1": "Blue",
+            }
+        ],
+        "images": [
+            {
+                "src": "https://example.com/blue.jpg",
+                "variant_ids": [variant_id],
+            }
+        ],
+    }
+
+
+REMOTE_PRODUCTS = [
+    {
+        "slug": "remote",
+        "title": "Remote Tumbler",
+        "description": "Pulls from remote JSON.",
+        "tags": ["remote"],
+        "variants": [
+            {
+                "id": "remote-variant",
+                "title": "Remote Blue",
+                "price": 59.0,
+                "available": True,
+            }
+        ],
+    }
+]
+
+# Bodies are serialized once at import; the handler only looks them up.
+URL_RESPONSES = {
+    "https://zuscoffee.example/mock": orjson.dumps(REMOTE_PRODUCTS),
+    "https://shop.zuscoffee.com/collections/all-tumbler/products.json?limit=250&page=1": orjson.dumps(
+        {"products": [shopify_product_payload("shopify-cup", 123)]}
+    ),
+}
+
+
+@pytest.mark.parametrize(
+    ("url", "expected_request", "expected_slug", "expected_tag", "expected_variant"),
+    [
+        (
+            "https://zuscoffee.example/mock",
+            "https://zuscoffee.example/mock",
+            "remote",
+            "remote",
+            {"title": "Remote Blue", "price": 59.0},
+        ),
+        (
+            "https://shop.zuscoffee.com/collections/all-tumbler",
+            "https://shop.zuscoffee.com/collections/all-tumbler/products.json?limit=250&page=1",
+            "shopify-cup",
+            "cup",
+            {
+                "title": "Misty Blue",
+                "available": True,
+                "compare_at_price": 99.0,
+                "image_url": "https://example.com/blue.jpg",
+            },
+        ),
+    ],
+)
+def test_load_products_from_url(monkeypatch, url, expected_request, expected_slug, expected_tag, expected_variant):
+    requested = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested.append(str(request.url))
+        return httpx.Response(
+            200,
+            content=URL_RESPONSES[str(request.url)],
+            headers={"content-type": "application/json"},
         )
 
-    monkeypatch.setattr(script.httpx, "get", fake_get)
+    use_mock_transport(monkeypatch, handler)
 
-    records = script.load_products_from_url("https://zuscoffee.example/mock")
+    records = script.load_products_from_url(url)
 
-    assert called["url"] == "https://zuscoffee.example/mock"
-    assert records[0].slug == "remote"
-    assert records[0].variants[0].title == "Remote Blue"
+    assert requested == [expected_request]
+    assert len(records) == 1
+    assert records[0].slug == expected_slug
+    assert expected_tag in records[0].tags
+    variant = records[0].variants[0]
+    for field, expected in expected_variant.items():
+        assert getattr(variant, field) == expected
+
+
+def test_load_shopify_collection_paginates_until_short_page(monkeypatch):
+    monkeypatch.setattr(script, "SHOPIFY_PAGE_LIMIT", 2)
+    monkeypatch.setattr(script, "SHOPIFY_PAGE_BATCH", 2)
+    pages = {
+        1: [shopify_product_payload("cup-1", 1), shopify_product_payload("cup-2", 2)],
+        2: [shopify_product_payload("cup-3", 3), shopify_product_payload("cup-4", 4)],
+        3: [shopify_product_payload("cup-5", 5)],
+    }
+    requested_pages = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.params["limit"] == "2"
+        page = int(request.url.params["page"])
+        requested_pages.append(page)
+        return httpx.Response(200, json={"products": pages.get(page, [])})
+
+    use_mock_transport(monkeypatch, handler)
 
+    records = script.load_products_from_url("https://shop.zuscoffee.com/collections/all-tumbler")
+
+    assert [record.slug for record in records] == ["cup-1", "cup-2", "cup-3", "cup-4", "cup-5"]
+    assert sorted(requested_pages) == [1, 2, 3]
 
-def test_load_products_from_shopify_collection(monkeypatch):
-    requested = []
 
-    class DummyResponse:
-        def __init__(self, *, status_code=200, json_data=None, text="", headers=None):
-            self.status_code = status_code
-            self._json = json_data
-            self.text = text
-            self.headers = headers or {}
-
-        def json(self):
-            return self._json
-
-    def fake_get(url, timeout):
-        requested.append(url)
-        if url.endswith("/collections/all-tumbler"):
-            return DummyResponse(
-                status_code=200,
-                text="<html></html>",
-                headers={"content-type": "text/html"},
-            )
-        if url.endswith("/collections/all-tumbler/products.json"):
-            return DummyResponse(
-                status_code=200,
-                json_data={
-                    "products": [
-                        {
-                            "handle": "shopify-cup",
-                            "title": "Shopify Cup",
-                            "body_html": "<p>Great cup</p>",
-                            "tags": "cup,drinkware",
-                            "product_type": "Tumbler",
-                            "vendor": "ZUS",
-                            "variants": [
-                                {
-                                    "id": 123,
-                                    "title": "Misty Blue",
-                                    "sku": "SKU-123",
-                                    "price": "79.00",
-                                    "compare_at_price": "99.00",
-                                    "available": True,
-                                    "featured_image": {"src": "https://example.com/blue.jpg"},
-                                    "option1": "Blue",
-                                }
-                            ],
-                            "images": [
-                                {
-                                    "src": "https://example.com/blue.jpg",
-                                    "variant_ids": [123],
-                                }
-                            ],
-                        }
-                    ]
-                },
-                headers={"content-type": "application/json"},
-            )
-        raise AssertionError(f"Unexpected URL {url}")
-
-    monkeypatch.setattr(script.httpx, "get", fake_get)
+def test_load_shopify_collection_retries_after_rate_limit(monkeypatch):
+    attempts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        attempts.append(request.url.params["page"])
+        if len(attempts) == 1:
+            return httpx.Response(429, headers={"Retry-After": "0"})
+        return httpx.Response(200, json={"products": [shopify_product_payload("cup", 1)]})
+
+    use_mock_transport(monkeypatch, handler)
 
     records = script.load_products_from_url("https://shop.zuscoffee.com/collections/all-tumbler")
 
-    assert len(records) == 1
-    record = records[0]
-    assert record.slug == "shopify-cup"
-    assert record.variants[0].available is True
-    assert record.variants[0].compare_at_price == 99.0
-    assert record.variants[0].image_url == "https://example.com/blue.jpg"
-    assert "cup" in record.tags
-    assert requested == [
-        "https://shop.zuscoffee.com/collections/all-tumbler/products.json",
+    assert [record.slug for record in records] == ["cup"]
+    assert attempts == ["1", "1"]
+
+
+def test_load_products_from_url_replays_cached_body_on_not_modified(monkeypatch, tmp_path):
+    seen_etags = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen_etags.append(request.headers.get("if-none-match"))
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(
+            200,
+            json={"products": [shopify_product_payload("cached-cup", 7)]},
+            headers={"ETag": '"v1"'},
+        )
+
+    use_mock_transport(monkeypatch, handler)
+    url = "https://shop.zuscoffee.com/collections/all-tumbler"
+
+    first = script.load_products_from_url(url, cache_dir=tmp_path)
+    second = script.load_products_from_url(url, cache_dir=tmp_path)
+
+    assert seen_etags == [None, '"v1"']
+    assert [record.slug for record in first] == [record.slug for record in second] == ["cached-cup"]
+
+
+def test_gather_records_fetches_default_collections_and_skips_failures(monkeypatch):
+    monkeypatch.setattr(
+        script,
+        "DEFAULT_COLLECTION_URLS",
+        [
+            "https://shop.zuscoffee.com/collections/all-tumbler",
+            "https://shop.zuscoffee.com/collections/broken",
+            "https://shop.zuscoffee.com/collections/mugs",
+        ],
+    )
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if path == "/collections/all-tumbler/products.json":
+            return httpx.Response(200, json={"products": [shopify_product_payload("tumbler", 1)]})
+        if path == "/collections/mugs/products.json":
+            return httpx.Response(200, json={"products": [shopify_product_payload("mug", 2)]})
+        return httpx.Response(500)
+
+    use_mock_transport(monkeypatch, handler)
+    args = types.SimpleNamespace(fetch_url=None, source=None, no_cache=True)
+
+    records = script._gather_records(args)
+
+    assert [record.slug for record in records] == ["tumbler", "mug"]
+
+
+@pytest.mark.parametrize(
+    "overrides",
+    [
+        {"variants": []},
+        {"variants": [{"id": 9, "title": "Blue", "price": "not-a-price"}]},
+    ],
+)
+def test_convert_shopify_product_rejects_invalid_payloads(overrides):
+    payload = {**shopify_product_payload("broken-cup", 9), **overrides}
+
+    with pytest.raises(ValueError):
+        script._convert_shopify_product(payload, "https://shop.zuscoffee.com/collections/all-tumbler")
+
+
+@pytest.mark.parametrize("use_selectolax", [True, False])
+def test_strip_html_flattens_markup(monkeypatch, use_selectolax):
+    if not use_selectolax:
+        monkeypatch.setattr(script, "LexborHTMLParser", None)
+    elif script.LexborHTMLParser is None:
+        pytest.skip("selectolax is not installed")
+
+    text = script._strip_html("<p>Great <b>cup</b> &amp; lid</p><ul><li>Blue</li><li>Red</li></ul>")
+
+    assert text == "Great cup & lid Blue Red"
+
+
+@pytest.mark.parametrize(
+    ("description", "expect_split"),
+    [("Keeps drinks hot.", False), ("Keeps drinks hot. " * 60, True)],
+    ids=["short", "long"],
+)
+def test_build_documents_only_splits_long_variant_text(description, expect_split):
+    record = script.ProductRecord.model_validate(
+        {
+            "slug": "sample",
+            "title": "Sample Bottle",
+            "description": description,
+            "variants": [{"id": "sample-default", "title": "Default", "price": 42.0}],
+        }
+    )
+
+    documents = script.build_documents([record])
+
+    assert (len(documents) > 1) is expect_split
+    assert [doc.metadata["chunkIndex"] for doc in documents] == list(range(len(documents)))
+    assert all(len(doc.page_content) <= script.CHUNK_SIZE for doc in documents)
+    assert all(None not in doc.metadata.values() for doc in documents)
+    assert "sku" not in documents[0].metadata
+
+
+def test_embed_to_memmap_preserves_order_across_batches(tmp_path):
+    embeddings = FakeEmbeddings()
+    texts = ["a", "bb", "ccc", "dddd", "eeeee"]
+
+    vectors = script._embed_to_memmap(embeddings, texts, tmp_path / "vectors.bin", batch_size=2)
+
+    assert vectors.tolist() == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+    assert embeddings.batches == [["a", "bb"], ["ccc", "dddd"], ["eeeee"]]
+
+
+@pytest.mark.parametrize(
+    ("quantize", "count", "expected_type"),
+    [
+        ("none", 10, "IndexFlatL2"),
+        ("sq8", 10, "IndexScalarQuantizer"),
+        ("pq", 10, "IndexFlatL2"),
+        ("pq", 300, "IndexPQ"),
+        ("ivfpq", 10, "IndexFlatL2"),
+        ("ivfpq", 600, "IndexIVFPQ"),
+    ],
+)
+def test_create_faiss_index_supports_quantization(quantize, count, expected_type):
+    import numpy as np
+
+    vectors = np.random.default_rng(0).random((count, 16), dtype=np.float32)
+
+    index = script._create_faiss_index(vectors, quantize=quantize)
+    index.add(vectors)
+
+    assert type(index).__name__ == expected_type
+    assert index.ntotal == count
+
+
+def test_create_faiss_index_rejects_unknown_quantization():
+    import numpy as np
+
+    with pytest.raises(ValueError):
+        script._create_faiss_index(np.zeros((1, 4), dtype=np.float32), quantize="int4")
+
+
+@pytest.mark.parametrize(
+    ("raw", "expected"),
+    [(" cup , drinkware,,  travel mug ", ["cup", "drinkware", "travel mug"]), ("", []), (" , ", [])],
+)
+def test_parse_tags_splits_and_strips(raw, expected):
+    assert script._parse_tags(raw) == expected
+
+
+@pytest.mark.parametrize(
+    ("variant_fields", "expected_title"),
+    [
+        ({"title": "Large", "option1": None}, "Large"),
+        ({"title": "Default Title", "option1": "Default Title"}, "Shopify Cup"),
+        ({"title": None, "option1": "Blue"}, "Blue"),
+    ],
+)
+def test_convert_shopify_product_variant_title_fallbacks(variant_fields, expected_title):
+    payload = shopify_product_payload("shopify-cup", 5)
+    payload["variants"][0].update(variant_fields)
+
+    record = script._convert_shopify_product(payload, "https://shop.zuscoffee.com/")
+
+    assert record.variants[0].title == expected_title
+
+
+def test_dedupe_records_keeps_untouched_records_and_drops_repeat_variants():
+    first = script._convert_shopify_product(shopify_product_payload("cup", 1), "https://shop.zuscoffee.com/")
+    repeat = script._convert_shopify_product(shopify_product_payload("cup", 1), "https://shop.zuscoffee.com/")
+    other = script._convert_shopify_product(shopify_product_payload("mug", 2), "https://shop.zuscoffee.com/")
+
+    records = script._dedupe_records([first, repeat, other])
+
+    assert records[0] is first
+    assert records[1] is other
+    assert len(records) == 2
+
+
+def test_variant_record_normalises_raw_values():
+    variant = script.VariantRecord.model_validate(
+        {"id": 123, "title": "Blue", "price": "79.00", "compare_at_price": "", "options": "Blue"}
+    )
+
+    assert variant.id == "123"
+    assert variant.price == 79.0
+    assert variant.compare_at_price is None
+    assert variant.option_values == ["Blue"]
+
+
+def test_build_documents_parallel_matches_serial_build(monkeypatch):
+    monkeypatch.setattr(script, "PARALLEL_BUILD_MIN_RECORDS", 0)
+    monkeypatch.setattr(script, "PARALLEL_BUILD_BATCH_SIZE", 2)
+    records = [
+        script._convert_shopify_product(shopify_product_payload(f"cup-{index}", index), "https://shop.zuscoffee.com/")
+        for index in range(5)
+    ]
+
+    parallel = script.build_documents_parallel(records, max_workers=2)
+    serial = script.build_documents(records)
+
+    assert [(doc.page_content, doc.metadata) for doc in parallel] == [
+        (doc.page_content, doc.metadata) for doc in serial
     ]
 
 
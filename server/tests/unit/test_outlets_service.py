@@ -14,22 +14,19 @@ from app.services.outlets import (
     OutletsText2SQLService,
     default_sql_generator,
     _build_sql_prompt,
+    _get_sql_chain,
+    _normalize_generated_sql,
     _prepare_text2sql_question,
 )
 
-
-@pytest.fixture(scope="module")
-def engine():
-    engine = create_engine("sqlite+pysqlite:///:memory:", future=True)
-    Base.metadata.create_all(engine)
-    yield engine
-    engine.dispose()
+# The seeded rows live in the session-wide in-memory engine, so these tests share one xdist worker.
+pytestmark = pytest.mark.xdist_group("sqlite-outlets")
 
 
-@pytest.fixture()
-def session(engine) -> Session:
+@pytest.fixture(scope="module")
+def _seeded_outlets(engine):
+    # Seed once per module; each test runs inside a transaction that is rolled back afterwards.
     with Session(engine) as session:
-        session.query(Outlet).delete()
         session.add_all(
             [
                 Outlet(
@@ -57,7 +54,22 @@ def session(engine) -> Session:
             ]
         )
         session.commit()
-        yield session
+    yield
+    with Session(engine) as session:
+        session.query(Outlet).delete()
+        session.commit()
+
+
+@pytest.fixture(autouse=True)
+def _reset_sql_chain_cache():
+    _get_sql_chain.cache_clear()
+    yield
+    _get_sql_chain.cache_clear()
+
+
+@pytest.fixture()
+def session(_seeded_outlets, db_session) -> Session:
+    return db_session
 
 
 def test_query_returns_rows(session: Session) -> None:
@@ -87,11 +99,10 @@ def test_query_rejects_empty(session: Session) -> None:
         "SELECT * FROM outlets -- comment",
     ],
 )
-def test_query_rejects_unsafe_sql(session: Session, sql: str) -> None:
-    service = OutletsText2SQLService(session=session, sql_generator=lambda _: (sql, {}))
-
+def test_validate_sql_rejects_unsafe_sql(sql: str) -> None:
+    # Validation is independent of the session, so the unsafe cases skip the seeded database.
     with pytest.raises(OutletsQueryError):
-        service.query("unsafe")
+        OutletsText2SQLService._validate_sql(sql)
 
 
 def test_query_rejects_non_select_sql(session: Session) -> None:
@@ -136,7 +147,8 @@ def test_query_strips_trailing_semicolon(session: Session) -> None:
 
 
 def test_default_sql_generator_requires_api_key(monkeypatch, session: Session) -> None:
-    monkeypatch.setattr("app.services.outlets.get_settings", lambda: AppSettings(openai_api_key=None))
+    settings = AppSettings(openai_api_key=None)
+    monkeypatch.setattr("app.services.outlets.get_settings", lambda: settings)
 
     with pytest.raises(OutletsExecutionError):
         default_sql_generator(session)
@@ -162,7 +174,8 @@ def test_default_sql_generator_uses_api_key(monkeypatch, session: Session) -> No
     monkeypatch.setattr("langchain_openai.ChatOpenAI", DummyChatOpenAI)
     monkeypatch.setattr("langchain_community.utilities.SQLDatabase", lambda _: object())
     monkeypatch.setattr("langchain.chains.create_sql_query_chain", fake_create_sql_query_chain)
-    monkeypatch.setattr("app.services.outlets.get_settings", lambda: AppSettings(openai_api_key="test-key"))
+    settings = AppSettings(openai_api_key="test-key")
+    monkeypatch.setattr("app.services.outlets.get_settings", lambda: settings)
 
     generator = default_sql_generator(session)
     sql, params = generator("List outlets in PJ")
@@ -175,11 +188,32 @@ def test_default_sql_generator_uses_api_key(monkeypatch, session: Session) -> No
     assert params == {}
 
 
+def test_default_sql_generator_reuses_chain_for_same_engine(monkeypatch, session: Session) -> None:
+    built: list[object] = []
+
+    class DummyChain:
+        def invoke(self, _: dict[str, str]) -> str:
+            return "SELECT name FROM outlets"
+
+    def fake_create_sql_query_chain(llm, db, **kwargs):
+        built.append(db)
+        return DummyChain()
+
+    monkeypatch.setattr("langchain_openai.ChatOpenAI", lambda **kwargs: object())
+    monkeypatch.setattr("langchain_community.utilities.SQLDatabase", lambda _: object())
+    monkeypatch.setattr("langchain.chains.create_sql_query_chain", fake_create_sql_query_chain)
+    settings = AppSettings(openai_api_key="test-key")
+    monkeypatch.setattr("app.services.outlets.get_settings", lambda: settings)
+
+    default_sql_generator(session)("List outlets")
+    default_sql_generator(session)("List outlets again")
+
+    assert len(built) == 1
+
+
 def test_default_sql_generator_fake_provider(monkeypatch, session: Session) -> None:
-    monkeypatch.setattr(
-        "app.services.outlets.get_settings",
-        lambda: AppSettings(text2sql_provider="fake"),
-    )
+    settings = AppSettings(text2sql_provider="fake")
+    monkeypatch.setattr("app.services.outlets.get_settings", lambda: settings)
 
     generator = default_sql_generator(session)
     sql, params = generator("Find SS2 outlets")
@@ -190,21 +224,21 @@ def test_default_sql_generator_fake_provider(monkeypatch, session: Session) -> N
 
 
 def test_default_sql_generator_fake_handles_aliases(monkeypatch, session: Session) -> None:
-    monkeypatch.setattr(
-        "app.services.outlets.get_settings",
-        lambda: AppSettings(text2sql_provider="fake"),
-    )
+    settings = AppSettings(text2sql_provider="fake")
+    monkeypatch.setattr("app.services.outlets.get_settings", lambda: settings)
 
     generator = default_sql_generator(session)
     sql, params = generator("Any outlets near PJ?")
 
     assert "select" in sql.lower()
-    assert params["name_param_0"] == "%petaling jaya%"
-    assert params["city_param_1"] == "%petaling jaya%"
+    assert params["name_petaling_jaya"] == "%petaling jaya%"
+    assert params["city_petaling_jaya"] == "%petaling jaya%"
+    assert "LOWER(name) LIKE :name_petaling_jaya OR LOWER(city) LIKE :city_petaling_jaya" in sql
 
 
 def test_default_sql_generator_local_provider(monkeypatch, session: Session) -> None:
-    monkeypatch.setattr("app.services.outlets.get_settings", lambda: AppSettings(text2sql_provider="local"))
+    settings = AppSettings(text2sql_provider="local")
+    monkeypatch.setattr("app.services.outlets.get_settings", lambda: settings)
 
     captured_kwargs: dict[str, object] = {}
 
@@ -237,7 +271,7 @@ def test_default_sql_generator_local_provider(monkeypatch, session: Session) ->
 
     assert sql.startswith("SELECT")
     assert params == {}
-    assert captured_kwargs["model"] == AppSettings().text2sql_model
+    assert captured_kwargs["model"] == settings.text2sql_model
     prompt = captured_kwargs["prompt"]
     assert prompt is not None
     assert set(prompt.input_variables) == {"input", "table_info", "top_k"}
@@ -265,10 +299,8 @@ def test_text2sql_service_works_with_postgres_backend(monkeypatch) -> None:
     session_module._engine = None
     session_module._SessionLocal = None
 
-    monkeypatch.setattr(
-        "app.services.outlets.get_settings",
-        lambda: AppSettings(text2sql_provider="fake"),
-    )
+    settings = AppSettings(text2sql_provider="fake")
+    monkeypatch.setattr("app.services.outlets.get_settings", lambda: settings)
 
     session_factory = session_module.get_session_factory()
     engine = captured["engine"]
@@ -323,3 +355,18 @@ def test_prepare_text2sql_question_adds_schema_hint() -> None:
     assert "near petaling jaya" not in prepared.lower()
     assert "in petaling jaya" in prepared.lower()
 
+
+@pytest.mark.parametrize(
+    ("output", "expected"),
+    [
+        ("", ""),
+        ("SELECT name FROM outlets", "SELECT name FROM outlets"),
+        ("```sql\nSELECT name FROM outlets\n```\nExplanation", "SELECT name FROM outlets"),
+        ("```\nselect name FROM outlets", "select name FROM outlets"),
+        ("Here you go: SELECT name FROM outlets LIMIT 10", "SELECT name FROM outlets LIMIT 10"),
+        ("selected_columns then SELECT name FROM outlets", "SELECT name FROM outlets"),
+        ("no query here", "no query here"),
+    ],
+)
+def test_normalize_generated_sql_extracts_select(output: str, expected: str) -> None:
+    assert _normalize_generated_sql(output) == expected
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.pinecone_utils import extract_index_names
+
+
+class DummyListResponse:
+    def __init__(self, names):
+        self._names = names
+
+    def names(self):
+        return list(self._names)
+
+
+@pytest.mark.parametrize(
+    ("response", "expected"),
+    [
+        (None, set()),
+        (DummyListResponse(["zus-products", ""]), {"zus-products"}),
+        (SimpleNamespace(indexes=[SimpleNamespace(name="from-attr")]), {"from-attr"}),
+        ({"indexes": [{"name": "from-dict"}, {"name": None}]}, {"from-dict"}),
+        (["plain", SimpleNamespace(name="obj"), {"name": "mapping"}, None], {"plain", "obj", "mapping"}),
+        (SimpleNamespace(names=["not-callable"]), set()),
+        ("unsupported", set()),
+    ],
+)
+def test_extract_index_names_handles_response_shapes(response, expected) -> None:
+    assert extract_index_names(response) == expected
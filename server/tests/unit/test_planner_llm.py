@@ -1,9 +1,18 @@
 from __future__ import annotations
 
-import pytest
-from pydantic import BaseModel
+import asyncio
 
-from app.agents.llm import clear_fake_responses, get_planner_llm, queue_fake_response
+import pytest
+from pydantic import BaseModel, ValidationError
+
+from app.agents.llm import (
+    PlannerLlmError,
+    clear_fake_responses,
+    fake_responses,
+    get_planner_llm,
+    queue_fake_response,
+    queue_fake_responses,
+)
 from app.core.config import AppSettings
 
 
@@ -11,6 +20,15 @@ class ExampleSchema(BaseModel):
     value: str
 
 
+FAKE_SETTINGS = AppSettings(planner_llm_provider="fake")
+
+
+@pytest.fixture(scope="module")
+def fake_llm_factory():
+    # Each test still calls the factory, so every test gets its own response cache.
+    return get_planner_llm(FAKE_SETTINGS)
+
+
 def setup_function() -> None:
     clear_fake_responses()
 
@@ -28,12 +46,10 @@ def test_app_settings_defaults_include_planner_fields() -> None:
     assert settings.text2sql_timeout_sec > 0
 
 
-def test_fake_llm_returns_enqueued_response() -> None:
-    settings = AppSettings(planner_llm_provider="fake")
-    factory = get_planner_llm(settings)
-    queue_fake_response({"value": "first"})
+def test_fake_llm_returns_enqueued_response(fake_llm_factory) -> None:
+    queue_fake_response(ExampleSchema(value="first"))
 
-    llm = factory()
+    llm = fake_llm_factory()
     result = llm.invoke_structured(
         ExampleSchema,
         prompt="fake prompt",
@@ -44,12 +60,10 @@ def test_fake_llm_returns_enqueued_response() -> None:
     assert result.value == "first"
 
 
-def test_fake_llm_caches_results_by_prompt_id_and_vars() -> None:
-    settings = AppSettings(planner_llm_provider="fake")
-    factory = get_planner_llm(settings)
-    queue_fake_response({"value": "cached"})
+def test_fake_llm_caches_results_by_prompt_id_and_vars(fake_llm_factory) -> None:
+    queue_fake_response(ExampleSchema(value="cached"))
 
-    llm = factory()
+    llm = fake_llm_factory()
     first = llm.invoke_structured(
         ExampleSchema,
         prompt="cache me",
@@ -67,13 +81,11 @@ def test_fake_llm_caches_results_by_prompt_id_and_vars() -> None:
     assert second.value == "cached"
 
 
-def test_fake_llm_cache_scoped_by_prompt_id() -> None:
-    settings = AppSettings(planner_llm_provider="fake")
-    factory = get_planner_llm(settings)
-    queue_fake_response({"value": "intent"})
-    queue_fake_response({"value": "slots"})
+def test_fake_llm_cache_scoped_by_prompt_id(fake_llm_factory) -> None:
+    queue_fake_response(ExampleSchema(value="intent"))
+    queue_fake_response(ExampleSchema(value="slots"))
 
-    llm = factory()
+    llm = fake_llm_factory()
     first = llm.invoke_structured(
         ExampleSchema,
         prompt="prompt one",
@@ -92,18 +104,42 @@ def test_fake_llm_cache_scoped_by_prompt_id() -> None:
 
 
 @pytest.mark.asyncio
-async def test_fake_llm_async_invocation_returns_enqueued_response() -> None:
-    settings = AppSettings(planner_llm_provider="fake")
-    factory = get_planner_llm(settings)
-    queue_fake_response({"value": "async-first"})
-
-    llm = factory()
-    result = await llm.invoke_structured_async(
-        ExampleSchema,
-        prompt="async prompt",
-        variables={"foo": "bar"},
-        prompt_id="intent",
+async def test_fake_llm_async_invocations_return_enqueued_responses(fake_llm_factory) -> None:
+    prompt_ids = ("intent", "slots", "decide")
+    queue_fake_responses(ExampleSchema(value=f"async-{prompt_id}") for prompt_id in prompt_ids)
+
+    llm = fake_llm_factory()
+    results = await asyncio.gather(
+        *(
+            llm.invoke_structured_async(
+                ExampleSchema,
+                prompt="async prompt",
+                variables={"foo": "bar"},
+                prompt_id=prompt_id,
+            )
+            for prompt_id in prompt_ids
+        )
     )
 
-    assert result.value == "async-first"
+    assert [result.value for result in results] == ["async-intent", "async-slots", "async-decide"]
+
+
+def test_fake_llm_validates_dict_payloads_against_schema(fake_llm_factory) -> None:
+    queue_fake_response({"value": 42})
+
+    llm = fake_llm_factory()
+
+    with pytest.raises(ValidationError):
+        llm.invoke_structured(ExampleSchema, prompt="p", variables={}, prompt_id="intent")
+
+
+def test_fake_responses_context_queues_in_order_and_discards_leftovers(fake_llm_factory) -> None:
+    llm = fake_llm_factory()
+
+    with fake_responses({"value": "one"}, {"value": "two"}, {"value": "unused"}):
+        first = llm.invoke_structured(ExampleSchema, prompt="a", variables={}, prompt_id="intent")
+        second = llm.invoke_structured(ExampleSchema, prompt="b", variables={}, prompt_id="slots")
 
+    assert (first.value, second.value) == ("one", "two")
+    with pytest.raises(PlannerLlmError):
+        llm.invoke_structured(ExampleSchema, prompt="c", variables={}, prompt_id="decide")
@@ -1,8 +1,15 @@
 from __future__ import annotations
 
-from app.agents.events import event_broker
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any
+
+from app.agents.events import EventBroker
 from app.agents.llm import PlannerLlmError
-from app.agents.planner import Intent, buildOutletsQueryFromContext, create_planner
+from app.agents.planner import Intent, _compose_outlets_query, buildOutletsQueryFromContext, create_planner
+from app.agents.prompts import DECISION_PROMPT, FOLLOW_UP_PROMPT, SYNTHESIS_PROMPT
 from app.agents.schemas import DecisionResult, FollowUpResult, IntentResult, SlotResult, SynthesisResult
 from app.agents.state import ChatState, ToolState
 from app.models.chat import ChatMessage, ChatRequest, ToolStatus
@@ -14,21 +21,25 @@ from app.services.products import ProductSearchError
 
 
 class StubPlannerLlm:
-    def __init__(self) -> None:
-        self.responses: dict[type, list[dict[str, object]]] = {}
+    def __init__(self, *, validate: bool = False) -> None:
+        # Queued payloads are test-controlled, so validation is opt-in.
+        self.validate = validate
+        self.responses: defaultdict[type, deque[dict[str, object]]] = defaultdict(deque)
         self.calls: list[str] = []
         self.last_prompt_by_id: dict[str, str] = {}
 
     def queue_response(self, schema: type, payload: dict[str, object]) -> None:
-        self.responses.setdefault(schema, []).append(payload)
+        self.responses[schema].append(payload)
 
     def invoke_structured(self, schema, *, prompt, variables, prompt_id):
         self.calls.append(prompt_id)
         self.last_prompt_by_id[prompt_id] = prompt
         queue = self.responses.get(schema)
         if queue:
-            payload = queue.pop(0)
-            return schema.model_validate(payload)
+            payload = queue.popleft()
+            if self.validate:
+                return schema.model_validate(payload)
+            return schema.model_construct(**payload)
         raise PlannerLlmError(f"No stub response for schema={schema.__name__}")
 
     async def invoke_structured_async(self, schema, *, prompt, variables, prompt_id):
@@ -46,11 +57,14 @@ class StubCalculatorService:
 
 
 class StubProductService:
-    def __init__(self) -> None:
+    def __init__(self, error: Exception | None = None) -> None:
+        self.error = error
         self.queries: list[str] = []
 
     def search(self, query: str, k: int = 3) -> ProductSearchResponse:
         self.queries.append(query)
+        if self.error:
+            raise self.error
         return ProductSearchResponse(
             query=query,
             topK=[
@@ -73,12 +87,15 @@ class StubProductService:
 
 
 class StubOutletsService:
-    def __init__(self) -> None:
+    def __init__(self, error: Exception | None = None) -> None:
+        self.error = error
         self.queries: list[str] = []
 
     def query(self, user_query: str) -> OutletsQueryResponse:
         self.queries.append(user_query)
-        return OutletsQueryResponse(
+        if self.error:
+            raise self.error
+        return OutletsQueryResponse.model_construct(
             query=user_query,
             sql="SELECT * FROM outlets",
             params={},
@@ -91,6 +108,44 @@ class StubOutletsService:
         return self.query(user_query)
 
 
+@dataclass
+class PlannerBindings:
+    calculator: StubCalculatorService
+    product_service: StubProductService
+    outlets_service: StubOutletsService
+    llm: StubPlannerLlm
+    broker: EventBroker
+
+
+# The compiled planner is shared across tests; each make_planner() call rebinds the stubs it talks to.
+_bindings: ContextVar[PlannerBindings] = ContextVar("planner_bindings")
+
+
+class BoundLlm:
+    def invoke_structured(self, schema, **kwargs: Any):
+        return _bindings.get().llm.invoke_structured(schema, **kwargs)
+
+    async def invoke_structured_async(self, schema, **kwargs: Any):
+        return await _bindings.get().llm.invoke_structured_async(schema, **kwargs)
+
+
+class BoundBroker:
+    def publish(self, session_id: str, event: dict[str, Any]) -> None:
+        _bindings.get().broker.publish(session_id, event)
+
+
+@lru_cache(maxsize=None)
+def shared_planner(max_llm_calls: int):
+    return create_planner(
+        calculator_factory=lambda: _bindings.get().calculator,
+        products_factory=lambda: _bindings.get().product_service,
+        outlets_factory=lambda: _bindings.get().outlets_service,
+        llm_factory=BoundLlm,
+        max_llm_calls=max_llm_calls,
+        broker=BoundBroker(),
+    )
+
+
 def make_planner(
     *,
     calculator: StubCalculatorService | None = None,
@@ -98,26 +153,28 @@ def make_planner(
     outlets_service: StubOutletsService | None = None,
     llm: StubPlannerLlm | None = None,
     max_llm_calls: int = 4,
+    broker: EventBroker | None = None,
 ):
     calculator = calculator or StubCalculatorService()
     product_service = product_service or StubProductService()
     outlets_service = outlets_service or StubOutletsService()
     llm = llm or StubPlannerLlm()
 
-    planner = create_planner(
-        calculator_factory=lambda: calculator,
-        products_factory=lambda: product_service,
-        outlets_factory=lambda: outlets_service,
-        llm_factory=lambda: llm,
-        max_llm_calls=max_llm_calls,
-    )
-    return planner, calculator, product_service, outlets_service, llm
+    _bindings.set(PlannerBindings(calculator, product_service, outlets_service, llm, broker or EventBroker()))
+    return shared_planner(max_llm_calls), calculator, product_service, outlets_service, llm
+
+
+@lru_cache(maxsize=None)
+def user_message(content: str) -> ChatMessage:
+    # ChatMessage is frozen, so identical prompts can share one instance across tests.
+    # Inputs are hard-coded here; request validation is covered by the API tests.
+    return ChatMessage.model_construct(role="user", content=content)
 
 
 def make_request(session_id: str, content: str) -> ChatRequest:
-    return ChatRequest(
+    return ChatRequest.model_construct(
         sessionId=session_id,
-        messages=[ChatMessage(role="user", content=content)],
+        messages=[user_message(content)],
     )
 
 
@@ -199,7 +256,7 @@ def test_planner_follow_up_falls_back_when_llm_errors():
 
     assert product_service.queries == []
     assert response.response.content == "Which drinkware item or style are you looking for?"
-    assert llm.calls.count("planner.follow_up.v1") == 1
+    assert llm.calls.count(FOLLOW_UP_PROMPT.prompt_id) == 1
 
 
 def test_planner_follow_up_skipped_when_budget_exhausted():
@@ -213,7 +270,7 @@ def test_planner_follow_up_skipped_when_budget_exhausted():
 
     assert product_service.queries == []
     assert response.response.content == "Which drinkware item or style are you looking for?"
-    assert llm.calls.count("planner.follow_up.v1") == 0
+    assert llm.calls.count(FOLLOW_UP_PROMPT.prompt_id) == 0
 
 
 def test_planner_allows_constrained_product_request():
@@ -336,8 +393,8 @@ def test_decide_action_prefers_llm_result():
     assert response.actions[-1].status == ToolStatus.success
     assert response.response.content == "Sure thing! If you need help with math, just share the full expression."
     assert calculator.expressions == []
-    assert llm.calls[-2] == "planner.decision.v1"
-    assert llm.calls[-1] == "planner.synthesis.v1"
+    assert llm.calls[-2] == DECISION_PROMPT.prompt_id
+    assert llm.calls[-1] == SYNTHESIS_PROMPT.prompt_id
 
 
 def test_smalltalk_fallback_mentions_capabilities():
@@ -357,9 +414,22 @@ def test_smalltalk_fallback_mentions_capabilities():
     assert "outlet" in content
 
 
+def test_validated_stub_responses_apply_schema_normalisation():
+    llm = StubPlannerLlm(validate=True)
+    llm.queue_response(IntentResult, {"intent": "products"})
+    llm.queue_response(SlotResult, {"productQuery": "  tumbler  "})
+    llm.queue_response(DecisionResult, {"decision": "call_products"})
+    llm.queue_response(SynthesisResult, {"message": "Here are a few tumbler picks."})
+    planner, _, product_service, _, _ = make_planner(llm=llm)
+
+    planner.run(make_request("session-validated-stub", "Looking for tumblers"))
+
+    assert product_service.queries == ["tumbler"]
+
+
 def test_llm_call_events_include_budget_snapshot():
     session_id = "session-llm-events"
-    event_broker._channels.pop(session_id, None)
+    broker = EventBroker()
     llm = StubPlannerLlm()
     llm.queue_response(IntentResult, {"intent": "products"})
     llm.queue_response(SlotResult, {"productQuery": "tumbler"})
@@ -368,56 +438,46 @@ def test_llm_call_events_include_budget_snapshot():
         SynthesisResult,
         {"message": "Here are a few tumbler picks.", "followUp": "Want to see prices?"},
     )
-    planner, _, product_service, _, _ = make_planner(llm=llm, max_llm_calls=4)
+    planner, _, product_service, _, _ = make_planner(llm=llm, max_llm_calls=4, broker=broker)
     request = make_request(session_id, "Looking for tumblers")
 
     planner.run(request)
 
-    channel = event_broker._channels[session_id]
-    llm_events = [event for event in channel.events if event["type"] == "llm_call"]
+    channel = broker._channels[session_id]
+    llm_events = channel.events_of("llm_call")
 
-    assert [event["node"] for event in llm_events] == [
-        "classify_intent",
-        "extract_slots",
-        "decide_action",
-        "synthesize",
+    assert [(event["node"], event["data"]["status"], event["data"]["callsUsed"]) for event in llm_events] == [
+        ("classify_intent", "success", 1),
+        ("extract_slots", "success", 2),
+        ("decide_action", "success", 3),
+        ("synthesize", "success", 4),
     ]
-    assert [event["data"]["status"] for event in llm_events] == ["success", "success", "success", "success"]
-    assert [event["data"]["callsUsed"] for event in llm_events] == [1, 2, 3, 4]
     assert llm_events[-1]["data"]["remainingCalls"] == 0
     assert product_service.queries == ["tumbler"]
-    event_broker._channels.pop(session_id, None)
 
 
 def test_llm_call_skipped_when_budget_exhausted():
     session_id = "session-llm-budget"
-    event_broker._channels.pop(session_id, None)
+    broker = EventBroker()
     llm = StubPlannerLlm()
     llm.queue_response(IntentResult, {"intent": "products"})
     llm.queue_response(SlotResult, {"productQuery": "tumbler"})
-    planner, _, product_service, _, _ = make_planner(llm=llm, max_llm_calls=2)
+    planner, _, product_service, _, _ = make_planner(llm=llm, max_llm_calls=2, broker=broker)
     request = make_request(session_id, "Looking for tumblers")
 
     planner.run(request)
 
-    channel = event_broker._channels[session_id]
-    llm_events = [event for event in channel.events if event["type"] == "llm_call"]
+    channel = broker._channels[session_id]
+    llm_events = channel.events_of("llm_call")
 
-    assert [event["node"] for event in llm_events] == [
-        "classify_intent",
-        "extract_slots",
-        "decide_action",
-        "ask_follow_up",
-    ]
-    assert [event["data"]["status"] for event in llm_events] == [
-        "success",
-        "success",
-        "skipped",
-        "skipped",
+    assert [(event["node"], event["data"]["status"]) for event in llm_events] == [
+        ("classify_intent", "success"),
+        ("extract_slots", "success"),
+        ("decide_action", "skipped"),
+        ("ask_follow_up", "skipped"),
     ]
     assert llm_events[-1]["data"]["reason"] == "budget_exhausted"
     assert product_service.queries == []
-    event_broker._channels.pop(session_id, None)
 
 
 def test_build_outlets_query_from_context_includes_previous_rows():
@@ -453,6 +513,28 @@ def test_build_outlets_query_from_context_includes_previous_rows():
     assert enriched.endswith("Follow-up question: what are their opening hours?")
 
 
+def test_build_outlets_query_cached():
+    chat_state = ChatState(
+        sessionId="session-outlets-cached",
+        messages=[
+            ChatMessage(role="user", content="any outlets near Subang?"),
+            ChatMessage(role="assistant", content="Here are the Subang outlets."),
+            ChatMessage(role="user", content="which open earliest?"),
+        ],
+        tools=ToolState(
+            lastTool="outlets",
+            lastResult={"query": "any outlets near Subang?", "rows": [{"name": "ZUS Coffee SS 15"}]},
+        ),
+    )
+    _compose_outlets_query.cache_clear()
+
+    first = buildOutletsQueryFromContext(chat_state)
+    second = buildOutletsQueryFromContext(chat_state)
+
+    assert first == second
+    assert _compose_outlets_query.cache_info().hits == 1
+
+
 def test_build_outlets_query_from_context_without_prior_result_returns_latest():
     chat_state = ChatState(
         sessionId="session-outlets-single",
@@ -491,16 +573,8 @@ def test_build_outlets_query_sanitizes_enriched_previous_query():
     assert "any outlets near Bangsar?" in enriched
 
 
-class FailingProductService(StubProductService):
-    def search(self, query: str, k: int = 3) -> ProductSearchResponse:  # type: ignore[override]
-        raise ProductSearchError("Index offline.")
-
-    async def search_async(self, query: str, k: int = 3) -> ProductSearchResponse:  # type: ignore[override]
-        raise ProductSearchError("Index offline.")
-
-
 def test_planner_surfaces_product_error():
-    failing_product_service = FailingProductService()
+    failing_product_service = StubProductService(error=ProductSearchError("Index offline."))
     planner, _, _, _, llm = make_planner(product_service=failing_product_service)
     llm.queue_response(IntentResult, {"intent": "products"})
     llm.queue_response(SlotResult, {"productQuery": "tumbler"})
@@ -519,16 +593,8 @@ def test_planner_surfaces_product_error():
     assert "unavailable" in response.response.content.lower()
 
 
-class FailingOutletsService(StubOutletsService):
-    def query(self, user_query: str) -> OutletsQueryResponse:  # type: ignore[override]
-        raise OutletsExecutionError("Database offline.")
-
-    async def query_async(self, user_query: str) -> OutletsQueryResponse:  # type: ignore[override]
-        raise OutletsExecutionError("Database offline.")
-
-
 def test_planner_surfaces_outlet_execution_error():
-    failing_outlets_service = FailingOutletsService()
+    failing_outlets_service = StubOutletsService(error=OutletsExecutionError("Database offline."))
     planner, _, _, _, llm = make_planner(outlets_service=failing_outlets_service)
     llm.queue_response(IntentResult, {"intent": "outlets"})
     llm.queue_response(SlotResult, {"outletArea": "SS2"})
@@ -549,7 +615,7 @@ def test_planner_surfaces_outlet_execution_error():
 
 def test_tool_summary_redacts_outlet_sql_from_llm_prompt():
     session_id = "session-outlets-redact-sql"
-    event_broker._channels.pop(session_id, None)
+    broker = EventBroker()
 
     llm = StubPlannerLlm()
     llm.queue_response(IntentResult, {"intent": "outlets"})
@@ -563,7 +629,7 @@ def test_tool_summary_redacts_outlet_sql_from_llm_prompt():
     class StubOutletsServiceWithSql(StubOutletsService):
         def query(self, user_query: str) -> OutletsQueryResponse:  # type: ignore[override]
             self.queries.append(user_query)
-            return OutletsQueryResponse(
+            return OutletsQueryResponse.model_construct(
                 query=user_query,
                 sql="SELECT * FROM outlets; -- internal",
                 params={"secret": "value"},
@@ -576,7 +642,7 @@ def test_tool_summary_redacts_outlet_sql_from_llm_prompt():
             return self.query(user_query)
 
     outlets_service = StubOutletsServiceWithSql()
-    planner, _, _, _, _ = make_planner(outlets_service=outlets_service, llm=llm)
+    planner, _, _, _, _ = make_planner(outlets_service=outlets_service, llm=llm, broker=broker)
     request = make_request(session_id, "What are the hours for SS2 outlet?")
 
     response = planner.run(request)
@@ -586,6 +652,6 @@ def test_tool_summary_redacts_outlet_sql_from_llm_prompt():
     assert "open" in response.response.content.lower()
 
     # The synthesis prompt should not expose raw SQL or params back to the LLM.
-    synthesis_prompt = llm.last_prompt_by_id.get("planner.synthesis.v1", "")
+    synthesis_prompt = llm.last_prompt_by_id.get(SYNTHESIS_PROMPT.prompt_id, "")
     assert "select * from outlets" not in synthesis_prompt.lower()
     assert "secret" not in synthesis_prompt.lower()
@@ -3,10 +3,11 @@ import types
 
 import pytest
 from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
 
 from app.core.config import AppSettings
 from app.core.exceptions import AppError
-from app.services.products import ProductSearchError, ProductSearchService
+from app.services.products import ProductSearchError, ProductSearchService, reset_product_vector_store
 
 
 class StubVectorStore:
@@ -21,6 +22,13 @@ class StubVectorStore:
         return self._results[:k]
 
 
+@pytest.fixture(autouse=True)
+def _clear_vector_store_cache():
+    reset_product_vector_store()
+    yield
+    reset_product_vector_store()
+
+
 def test_search_returns_hits_and_summary():
     docs = [
         (
@@ -72,7 +80,7 @@ def test_search_returns_hits_and_summary():
     assert response.topK[0].price == 79.0
     assert response.topK[0].compareAtPrice == 99.0
     assert response.topK[0].available is True
-    assert response.topK[0].tags == ["tumbler", "stainless"]
+    assert response.topK[0].tags == ("tumbler", "stainless")
     assert response.topK[0].score == pytest.approx(0.92)
     assert response.summary == "Top results include insulated stainless steel options."
 
@@ -92,200 +100,207 @@ def test_search_truncates_snippet_and_clamps_score():
     assert len(hit.snippet) <= 400
 
 
-def test_search_rejects_empty_query():
-    store = StubVectorStore(results=[])
-    service = ProductSearchService(vector_store=store)
+@pytest.mark.parametrize(
+    "results",
+    [
+        [],
+        [(Document(page_content="Unrelated accessory", metadata={"productTitle": "Straw"}), 0.1)],
+    ],
+)
+def test_search_skips_summary_when_results_are_not_relevant(results):
+    store = StubVectorStore(results=results)
 
-    with pytest.raises(AppError):
-        service.search("")
+    def summary_fn(query: str, documents):
+        raise AssertionError("Summary should not run for irrelevant results")
 
+    service = ProductSearchService(vector_store=store, summary_fn=summary_fn, min_relevance_score=0.2)
 
-def test_from_settings_missing_index(monkeypatch, tmp_path):
-    settings = AppSettings(vector_store_path=str(tmp_path / "missing"), openai_api_key="test-key")
-    monkeypatch.setattr("app.services.products.get_settings", lambda: settings)
+    response = service.search("espresso machine")
 
-    class DummyEmbeddings:
-        def __init__(self, *args, **kwargs):
-            pass
+    assert response.topK == []
+    assert response.summary is None
 
-    monkeypatch.setattr("langchain_openai.OpenAIEmbeddings", DummyEmbeddings)
 
-    def fake_load_local(*args, **kwargs):
-        raise FileNotFoundError("missing index")
+def test_search_keeps_low_scoring_hits_without_threshold():
+    document = Document(page_content="Unrelated accessory", metadata={"productTitle": "Straw"})
+    store = StubVectorStore(results=[(document, 0.1)])
+    service = ProductSearchService(vector_store=store)
 
-    monkeypatch.setattr("langchain_community.vectorstores.FAISS.load_local", fake_load_local)
+    response = service.search("espresso machine")
 
-    with pytest.raises(ProductSearchError):
-        ProductSearchService.from_settings()
+    assert [hit.title for hit in response.topK] == ["Straw"]
 
 
-def test_from_settings_runtime_error_wrapped(monkeypatch, tmp_path):
-    settings = AppSettings(vector_store_path=str(tmp_path / "missing"), openai_api_key="test-key")
-    monkeypatch.setattr("app.services.products.get_settings", lambda: settings)
+def test_search_returns_hits_from_faiss_store_with_fake_embeddings():
+    from langchain_community.embeddings.fake import FakeEmbeddings
+    from langchain_community.vectorstores import FAISS
 
-    class DummyEmbeddings:
-        def __init__(self, *args, **kwargs):
-            pass
+    # Fake embeddings are not unit length, so L2 relevance scores come out negative.
+    store = FAISS.from_documents(
+        [
+            Document(page_content="Insulated steel tumbler", metadata={"productTitle": "Steel Tumbler"}),
+            Document(page_content="Frosted glass cup", metadata={"productTitle": "Glass Cup"}),
+        ],
+        FakeEmbeddings(size=16),
+    )
+    service = ProductSearchService(vector_store=store, summary_context_k=2)
 
-    monkeypatch.setattr("langchain_openai.OpenAIEmbeddings", DummyEmbeddings)
+    response = service.search("tumbler", k=2)
 
-    def fake_load_local(*args, **kwargs):
-        raise RuntimeError("faiss read failure")
+    assert {hit.title for hit in response.topK} == {"Steel Tumbler", "Glass Cup"}
+    assert all(0.0 <= hit.score <= 1.0 for hit in response.topK)
 
-    monkeypatch.setattr("langchain_community.vectorstores.FAISS.load_local", fake_load_local)
 
-    with pytest.raises(ProductSearchError) as excinfo:
-        ProductSearchService.from_settings()
-    assert "Product vector store is not available." in str(excinfo.value)
+@pytest.mark.parametrize("query", ["", "   "])
+def test_search_rejects_empty_query(query):
+    store = StubVectorStore(results=[])
+    service = ProductSearchService(vector_store=store)
 
+    with pytest.raises(AppError):
+        service.search(query)
+    assert store.last_query is None
 
-def test_from_settings_uses_pinecone_when_configured(monkeypatch):
-    settings = AppSettings(
-        product_vector_store_backend="pinecone",
-        pinecone_api_key="pc-key",
-        pinecone_index_name="zus-products",
-        openai_api_key="openai-key",
-    )
-    monkeypatch.setattr("app.services.products.get_settings", lambda: settings)
 
-    class DummyEmbeddings:
+class DummyEmbeddings:
+    def __init__(self, *args, **kwargs):
         pass
 
-    monkeypatch.setattr("langchain_openai.OpenAIEmbeddings", lambda *args, **kwargs: DummyEmbeddings())
 
-    class DummyListResponse:
-        def names(self):
-            return ["zus-products"]
-
-    class DummyPineconeClient:
-        def __init__(self, api_key):
-            self.api_key = api_key
-            self.index = object()
-            self.last_index = None
+@pytest.mark.parametrize("error", [FileNotFoundError("missing index"), RuntimeError("faiss read failure")])
+def test_from_settings_wraps_faiss_load_errors(monkeypatch, tmp_path, error):
+    settings = AppSettings(vector_store_path=str(tmp_path / "missing"), openai_api_key="test-key")
+    monkeypatch.setattr("app.services.products.get_settings", lambda: settings)
+    monkeypatch.setattr("langchain_openai.OpenAIEmbeddings", DummyEmbeddings)
 
-        def list_indexes(self):
-            return DummyListResponse()
+    def fake_load_local(*args, **kwargs):
+        raise error
 
-        def Index(self, name):
-            self.last_index = name
-            return self.index
+    monkeypatch.setattr("langchain_community.vectorstores.FAISS.load_local", fake_load_local)
 
-    clients: list[DummyPineconeClient] = []
+    with pytest.raises(ProductSearchError) as excinfo:
+        ProductSearchService.from_settings()
+    assert "Product vector store is not available." in str(excinfo.value)
 
-    def fake_pinecone(api_key):
-        client = DummyPineconeClient(api_key)
-        clients.append(client)
-        return client
 
-    fake_pinecone_module = types.SimpleNamespace(Pinecone=fake_pinecone)
-    monkeypatch.setitem(sys.modules, "pinecone", fake_pinecone_module)
+def test_from_settings_loads_faiss_index_once(monkeypatch, tmp_path):
+    settings = AppSettings(vector_store_path=str(tmp_path / "index"), embeddings_provider="fake")
+    monkeypatch.setattr("app.services.products.get_settings", lambda: settings)
 
-    class DummyVectorStore:
-        def __init__(self, index, embedding):
-            self.index = index
-            self.embedding = embedding
+    loads: list[str] = []
 
-        def similarity_search_with_relevance_scores(self, query: str, k: int):
-            return []
+    def fake_load_local(path, *args, **kwargs):
+        loads.append(path)
+        return StubVectorStore(results=[])
 
-    fake_langchain_pinecone = types.SimpleNamespace(PineconeVectorStore=DummyVectorStore)
-    monkeypatch.setitem(sys.modules, "langchain_pinecone", fake_langchain_pinecone)
+    monkeypatch.setattr("langchain_community.vectorstores.FAISS.load_local", fake_load_local)
 
-    service = ProductSearchService.from_settings()
+    first = ProductSearchService.from_settings()
+    second = ProductSearchService.from_settings()
 
-    assert isinstance(service._vector_store, DummyVectorStore)
-    assert clients[0].last_index == settings.pinecone_index_name
+    assert loads == [settings.vector_store_path]
+    assert first._vector_store is second._vector_store
 
 
-def test_from_settings_pinecone_missing_index(monkeypatch):
-    settings = AppSettings(
-        product_vector_store_backend="pinecone",
-        pinecone_api_key="pc-key",
-        pinecone_index_name="missing-index",
-        openai_api_key="openai-key",
-    )
+def test_from_settings_reloads_index_when_settings_or_reset_change(monkeypatch, tmp_path):
+    settings = AppSettings(vector_store_path=str(tmp_path / "index"), embeddings_provider="openai", openai_api_key="one")
     monkeypatch.setattr("app.services.products.get_settings", lambda: settings)
+    monkeypatch.setattr("langchain_openai.OpenAIEmbeddings", DummyEmbeddings)
 
-    class DummyEmbeddings:
-        pass
+    loads: list[str] = []
 
-    monkeypatch.setattr("langchain_openai.OpenAIEmbeddings", lambda *args, **kwargs: DummyEmbeddings())
+    def fake_load_local(path, *args, **kwargs):
+        loads.append(path)
+        return StubVectorStore(results=[])
 
-    class DummyListResponse:
-        def names(self):
-            return []
+    monkeypatch.setattr("langchain_community.vectorstores.FAISS.load_local", fake_load_local)
 
-    class DummyPineconeClient:
-        def __init__(self, api_key):
-            self.api_key = api_key
+    ProductSearchService.from_settings()
+    settings.openai_api_key = "two"
+    ProductSearchService.from_settings()
+    reset_product_vector_store()
+    ProductSearchService.from_settings()
 
-        def list_indexes(self):
-            return DummyListResponse()
+    assert len(loads) == 3
 
-    def fake_pinecone(api_key):
-        return DummyPineconeClient(api_key)
 
-    fake_pinecone_module = types.SimpleNamespace(Pinecone=fake_pinecone)
-    monkeypatch.setitem(sys.modules, "pinecone", fake_pinecone_module)
+class DummyListResponse:
+    def __init__(self, names: list[str]):
+        self._names = names
 
-    class DummyVectorStore:
-        def __init__(self, *args, **kwargs):
-            raise AssertionError("Should not instantiate vector store when index is missing")
+    def names(self):
+        return list(self._names)
 
-    fake_langchain_pinecone = types.SimpleNamespace(PineconeVectorStore=DummyVectorStore)
-    monkeypatch.setitem(sys.modules, "langchain_pinecone", fake_langchain_pinecone)
 
-    with pytest.raises(ProductSearchError) as excinfo:
-        ProductSearchService.from_settings()
-    assert "Product vector store is not available." in str(excinfo.value)
+class DummyPineconeClient:
+    def __init__(self, api_key, existing_indexes: list[str]):
+        self.api_key = api_key
+        self.existing_indexes = existing_indexes
+        self.index = object()
+        self.last_index = None
 
+    def list_indexes(self):
+        return DummyListResponse(self.existing_indexes)
 
-def test_from_settings_pinecone_missing_api_key(monkeypatch):
-    settings = AppSettings(
-        product_vector_store_backend="pinecone",
-        pinecone_api_key=None,
-        pinecone_index_name="zus-products",
-        openai_api_key="openai-key",
-    )
-    monkeypatch.setattr("app.services.products.get_settings", lambda: settings)
+    def Index(self, name):
+        self.last_index = name
+        return self.index
 
-    class DummyEmbeddings:
-        pass
 
-    monkeypatch.setattr("langchain_openai.OpenAIEmbeddings", lambda *args, **kwargs: DummyEmbeddings())
+class DummyPineconeVectorStore:
+    def __init__(self, index, embedding):
+        self.index = index
+        self.embedding = embedding
 
-    fake_pinecone_module = types.SimpleNamespace(Pinecone=lambda api_key: None)
-    fake_langchain_pinecone = types.SimpleNamespace(PineconeVectorStore=lambda *args, **kwargs: None)
-    monkeypatch.setitem(sys.modules, "pinecone", fake_pinecone_module)
-    monkeypatch.setitem(sys.modules, "langchain_pinecone", fake_langchain_pinecone)
+    def similarity_search_with_relevance_scores(self, query: str, k: int):
+        return []
 
-    with pytest.raises(ProductSearchError) as excinfo:
-        ProductSearchService.from_settings()
-    assert "PINECONE_API_KEY" in str(excinfo.value)
 
+@pytest.fixture
+def pinecone_env(monkeypatch):
+    env = types.SimpleNamespace(existing_indexes=[], clients=[])
+
+    def fake_pinecone(api_key):
+        client = DummyPineconeClient(api_key, env.existing_indexes)
+        env.clients.append(client)
+        return client
 
-def test_from_settings_pinecone_missing_index_name(monkeypatch):
+    monkeypatch.setitem(sys.modules, "pinecone", types.SimpleNamespace(Pinecone=fake_pinecone))
+    monkeypatch.setitem(
+        sys.modules, "langchain_pinecone", types.SimpleNamespace(PineconeVectorStore=DummyPineconeVectorStore)
+    )
+    monkeypatch.setattr("langchain_openai.OpenAIEmbeddings", DummyEmbeddings)
+    return env
+
+
+@pytest.mark.parametrize(
+    ("api_key", "index_name", "existing_indexes", "expected_error"),
+    [
+        ("pc-key", "zus-products", ["zus-products"], None),
+        ("pc-key", "missing-index", [], "Product vector store is not available."),
+        (None, "zus-products", ["zus-products"], "PINECONE_API_KEY"),
+        ("pc-key", None, ["zus-products"], "PINECONE_INDEX_NAME"),
+    ],
+)
+def test_from_settings_pinecone(monkeypatch, pinecone_env, api_key, index_name, existing_indexes, expected_error):
     settings = AppSettings(
         product_vector_store_backend="pinecone",
-        pinecone_api_key="pc-key",
-        pinecone_index_name=None,
+        pinecone_api_key=api_key,
+        pinecone_index_name=index_name,
         openai_api_key="openai-key",
     )
     monkeypatch.setattr("app.services.products.get_settings", lambda: settings)
+    pinecone_env.existing_indexes.extend(existing_indexes)
 
-    class DummyEmbeddings:
-        pass
-
-    monkeypatch.setattr("langchain_openai.OpenAIEmbeddings", lambda *args, **kwargs: DummyEmbeddings())
+    if expected_error is not None:
+        with pytest.raises(ProductSearchError) as excinfo:
+            ProductSearchService.from_settings()
+        assert expected_error in str(excinfo.value)
+        return
 
-    fake_pinecone_module = types.SimpleNamespace(Pinecone=lambda api_key: None)
-    fake_langchain_pinecone = types.SimpleNamespace(PineconeVectorStore=lambda *args, **kwargs: None)
-    monkeypatch.setitem(sys.modules, "pinecone", fake_pinecone_module)
-    monkeypatch.setitem(sys.modules, "langchain_pinecone", fake_langchain_pinecone)
+    service = ProductSearchService.from_settings()
 
-    with pytest.raises(ProductSearchError) as excinfo:
-        ProductSearchService.from_settings()
-    assert "PINECONE_INDEX_NAME" in str(excinfo.value)
+    assert isinstance(service._vector_store, DummyPineconeVectorStore)
+    assert pinecone_env.clients[0].last_index == index_name
 
 
 def test_search_includes_summary_when_summary_fn_provided():
@@ -320,3 +335,51 @@ def test_search_expands_vector_k_for_summary_context():
     assert store.last_k == 5
     assert len(response.topK) == 2
 
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self, size: int):
+        self._inner = DeterministicFakeEmbedding(size=size)
+        self.document_batches: list[list[str]] = []
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.document_batches.append(list(texts))
+        return self._inner.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._inner.embed_query(text)
+
+
+class CountingIndex:
+    def __init__(self, index):
+        self._index = index
+        self.batch_shapes: list[tuple[int, ...]] = []
+
+    def search(self, vectors, k):
+        self.batch_shapes.append(vectors.shape)
+        return self._index.search(vectors, k)
+
+
+def test_search_many_embeds_and_searches_once_for_all_queries():
+    from langchain_community.vectorstores import FAISS
+
+    embeddings = CountingEmbeddings(size=16)
+    store = FAISS.from_documents(
+        [
+            Document(page_content=f"Variant {idx}", metadata={"productTitle": f"Title {idx}"})
+            for idx in range(6)
+        ],
+        embeddings,
+    )
+    index = CountingIndex(store.index)
+    store.index = index
+    service = ProductSearchService(vector_store=store, summary_context_k=3, embeddings=embeddings)
+    single = service.search("bottle", k=2)
+    index.batch_shapes.clear()
+    embeddings.document_batches.clear()
+
+    responses = service.search_many(["tumbler", "bottle", "mug", "tumbler"], k=2)
+
+    assert embeddings.document_batches == [["tumbler", "bottle", "mug"]]
+    assert index.batch_shapes == [(3, 16)]
+    assert [response.query for response in responses] == ["tumbler", "bottle", "mug", "tumbler"]
+    assert responses[1].topK == single.topK
@@ -2,10 +2,10 @@ from __future__ import annotations
 
 from app.agents.prompts import SYNTHESIS_PROMPT
 
+SYNTHESIS_TEXT = SYNTHESIS_PROMPT.raw.lower()
 
-def test_synthesis_prompt_mentions_core_capabilities():
-    raw_text = SYNTHESIS_PROMPT.raw.lower()
-    assert "calculator" in raw_text
-    assert "drinkware" in raw_text or "product" in raw_text
-    assert "outlet" in raw_text
 
+def test_synthesis_prompt_mentions_core_capabilities():
+    assert "calculator" in SYNTHESIS_TEXT
+    assert "drinkware" in SYNTHESIS_TEXT or "product" in SYNTHESIS_TEXT
+    assert "outlet" in SYNTHESIS_TEXT
@@ -1,11 +1,16 @@
 import csv
+import io
 import json
+from operator import itemgetter
 from pathlib import Path
 from types import SimpleNamespace
 
+import httpx
 import pytest
-from sqlalchemy import create_engine, select
+from pydantic import ValidationError
+from sqlalchemy import create_engine, func, select
 from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
 
 from app.db.models import Outlet
 from server.scripts import seed_outlets as script
@@ -22,41 +27,45 @@ FIELDNAMES = [
     "state",
     "postalCode",
 ]
+ROW_VALUES = itemgetter(*FIELDNAMES)
 
 
-class DummyResponse:
-    def __init__(self, *, status_code=200, json_data=None, text="", headers=None):
-        self.status_code = status_code
-        self._json = json_data
-        self.text = text
-        self.headers = headers or {}
+@pytest.fixture
+def memory_engine():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+        future=True,
+    )
+    yield engine
+    engine.dispose()
+
 
-    def json(self):
-        if self._json is None:
-            raise ValueError("No JSON payload available")
-        return self._json
+def use_mock_transport(monkeypatch, handler) -> None:
+    monkeypatch.setattr(script, "_build_transport", lambda: httpx.MockTransport(handler))
 
 
-def override_settings(monkeypatch, **overrides):
+def db_settings(**overrides) -> SimpleNamespace:
     defaults = {
         "outlets_db_backend": "sqlite",
         "outlets_sqlite_url": script.DEFAULT_SQLITE_DB_URL,
         "outlets_postgres_url": None,
     }
     defaults.update(overrides)
+    return SimpleNamespace(**defaults)
 
-    def _stub():
-        return SimpleNamespace(**defaults)
 
-    monkeypatch.setattr(script, "AppSettings", _stub)
+def csv_bytes(rows: list[dict[str, str]]) -> bytes:
+    buffer = io.StringIO(newline="")
+    writer = csv.writer(buffer)
+    writer.writerow(FIELDNAMES)
+    writer.writerows(map(ROW_VALUES, rows))
+    return buffer.getvalue().encode("utf-8")
 
 
 def write_csv(path: Path, rows: list[dict[str, str]]) -> None:
-    with path.open("w", encoding="utf-8", newline="") as handle:
-        writer = csv.DictWriter(handle, fieldnames=FIELDNAMES)
-        writer.writeheader()
-        for row in rows:
-            writer.writerow(row)
+    path.write_bytes(csv_bytes(rows))
 
 
 def make_seed_record(**overrides):
@@ -75,9 +84,18 @@ def make_seed_record(**overrides):
     return base
 
 
+TEMPLATE_RECORD = script.OutletRecord.model_validate(make_seed_record())
+DEFAULT_CSV_BYTES = csv_bytes([make_seed_record()])
+
+
+def make_record(**overrides) -> script.OutletRecord:
+    # Overrides use field names and skip validation; parsing is covered by the CSV/endpoint tests.
+    return TEMPLATE_RECORD.model_copy(update=overrides)
+
+
 def test_load_outlets_from_csv_parses_services(tmp_path: Path) -> None:
     csv_path = tmp_path / "outlets.csv"
-    write_csv(csv_path, [make_seed_record()])
+    csv_path.write_bytes(DEFAULT_CSV_BYTES)
 
     records = script.load_outlets_from_csv(csv_path)
 
@@ -113,35 +131,23 @@ def test_load_outlets_from_csv_rejects_invalid_time(tmp_path: Path) -> None:
         script.load_outlets_from_csv(csv_path)
 
 
-def test_seed_outlets_writes_to_database(tmp_path: Path) -> None:
-    csv_path = tmp_path / "outlets.csv"
-    write_csv(
-        csv_path,
-        [
-            make_seed_record(),
-            make_seed_record(
-                name="ZUS Coffee Uptown",
-                address="123 Uptown Street, 47400 Petaling Jaya, Selangor",
-                openTime="08:00",
-                closeTime="22:00",
-                servicesJson=json.dumps(["wifi"]),
-                externalId="zus-coffee-uptown",
-                city="Petaling Jaya",
-                state="Selangor",
-                postalCode="47400",
-            ),
-        ],
-    )
-
-    records = script.load_outlets_from_csv(csv_path)
-    db_path = tmp_path / "outlets.db"
-    db_url = f"sqlite:///{db_path}"
+def test_seed_outlets_writes_to_database(db_session: Session) -> None:
+    records = [
+        make_record(),
+        make_record(
+            name="ZUS Coffee Uptown",
+            address="123 Uptown Street, 47400 Petaling Jaya, Selangor",
+            open_time="08:00",
+            close_time="22:00",
+            services=["wifi"],
+            external_id="zus-coffee-uptown",
+            postal_code="47400",
+        ),
+    ]
 
-    script.seed_outlets(records=records, db_url=db_url)
+    script.seed_outlets(records=records, session=db_session)
 
-    engine = create_engine(db_url, future=True)
-    with Session(engine) as session:
-        stored_outlets = session.scalars(select(Outlet).order_by(Outlet.name)).all()
+    stored_outlets = db_session.scalars(select(Outlet).order_by(Outlet.name)).all()
 
     assert len(stored_outlets) == 2
     assert stored_outlets[0].name == "ZUS Coffee SS 2"
@@ -153,6 +159,152 @@ def test_seed_outlets_writes_to_database(tmp_path: Path) -> None:
     assert stored_outlets[0].postal_code == "47300"
 
 
+def test_seed_outlets_upserts_existing_rows_in_batches(memory_engine, monkeypatch) -> None:
+    monkeypatch.setattr(script, "UPSERT_BATCH_SIZE", 2)
+    first = [
+        make_record(),
+        make_record(name="ZUS Coffee Uptown", external_id="zus-coffee-uptown"),
+    ]
+    script.seed_outlets(records=first, engine=memory_engine)
+
+    second = [
+        make_record(close_time="22:00"),
+        make_record(name="ZUS Coffee SS 15", external_id="zus-coffee-ss-15"),
+        make_record(name="ZUS Coffee SS 15 Renamed", external_id="zus-coffee-ss-15"),
+    ]
+    result = script.seed_outlets(records=second, engine=memory_engine)
+
+    assert (result.inserted, result.updated) == (1, 2)
+    with Session(memory_engine) as session:
+        stored = {outlet.external_id: outlet for outlet in session.scalars(select(Outlet))}
+    assert len(stored) == 3
+    assert stored["zus-coffee-ss-2"].close_time == "22:00"
+    assert stored["zus-coffee-ss-15"].name == "ZUS Coffee SS 15 Renamed"
+    assert stored["zus-coffee-uptown"].services == ["wifi", "delivery"]
+
+
+def test_seed_outlets_spans_multiple_full_batches(db_session: Session) -> None:
+    count = script.UPSERT_BATCH_SIZE * 2 + 1
+    records = [
+        make_record(name=f"ZUS Coffee {idx}", external_id=f"zus-coffee-{idx}")
+        for idx in range(count)
+    ]
+
+    result = script.seed_outlets(records=records, session=db_session)
+
+    assert (result.inserted, result.updated) == (count, 0)
+    assert db_session.scalar(select(func.count()).select_from(Outlet)) == count
+
+
+def test_outlet_record_is_immutable() -> None:
+    record = make_record()
+
+    with pytest.raises(ValidationError):
+        record.name = "Renamed"
+
+
+def test_seed_outlets_creates_schema_once_per_database(monkeypatch, tmp_path: Path) -> None:
+    calls: list[str] = []
+    original_create_all = script.Base.metadata.create_all
+
+    def tracking_create_all(engine, *args, **kwargs):
+        calls.append(str(engine.url))
+        return original_create_all(engine, *args, **kwargs)
+
+    monkeypatch.setattr(script.Base.metadata, "create_all", tracking_create_all)
+    db_url = f"sqlite:///{tmp_path / 'outlets.db'}"
+    records = [make_record()]
+
+    script.seed_outlets(records=records, db_url=db_url)
+    script.seed_outlets(records=records, db_url=db_url)
+
+    assert len(calls) == 1
+
+
+def test_seed_outlets_streams_csv_rows(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr(script, "UPSERT_BATCH_SIZE", 1)
+    csv_path = tmp_path / "outlets.csv"
+    write_csv(
+        csv_path,
+        [make_seed_record(), make_seed_record(name="ZUS Coffee Uptown", externalId="zus-coffee-uptown")],
+    )
+
+    result = script.seed_outlets(
+        records=script.iter_outlets_from_csv(csv_path),
+        db_url=f"sqlite:///{tmp_path / 'outlets.db'}",
+    )
+
+    assert (result.inserted, result.updated) == (2, 0)
+
+
+@pytest.mark.parametrize(
+    ("raw", "expected"),
+    [
+        ("09:00", "09:00"),
+        ("9.30", "09:30"),
+        ("0930", "09:30"),
+        ("930", "09:30"),
+        ("2100 hrs", "21:00"),
+        ("9am", "09:00"),
+        ("9:30 PM", "21:30"),
+        ("930pm", "21:30"),
+        ("12am", "00:00"),
+        ("12 pm", "12:00"),
+        ("9", None),
+        ("24:00", None),
+        ("2599", None),
+        ("13pm", None),
+        ("closed", None),
+        (900, "09:00"),
+    ],
+)
+def test_standardize_time_formats(raw, expected) -> None:
+    assert script._standardize_time(raw) == expected
+
+
+@pytest.mark.parametrize(
+    ("raw", "expected"),
+    [
+        ("  Wilayah  Persekutuan\tKuala Lumpur ", "Kuala Lumpur"),
+        ("PULAU PINANG", "Penang"),
+        ("Malaysia", None),
+        ("   ", None),
+        ("sri  lanka", "Sri Lanka"),
+    ],
+)
+def test_normalise_state_collapses_whitespace_before_lookup(raw, expected) -> None:
+    assert script._normalise_state(raw) == expected
+
+
+@pytest.mark.parametrize(
+    ("segment", "expected"),
+    [
+        ("47300 Petaling Jaya", 0),
+        ("Kajang 43000", 7),
+        ("Lot 12345 & 54321 Selangor", 12),
+        ("Tel 0123456789", -1),
+        ("No postal code", -1),
+    ],
+)
+def test_find_postal_returns_rightmost_standalone_code(segment, expected) -> None:
+    assert script._find_postal(segment) == expected
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "<p>No. 1, Jalan SS2/55,<br/>47300 Petaling Jaya</p>",
+        "<p>Lot C32 &amp; C33, Suria KLCC</p>" + "<span>Kuala Lumpur</span>" * 20,
+    ],
+)
+def test_strip_html_text_matches_full_parser(value: str) -> None:
+    from bs4 import BeautifulSoup
+
+    expected = BeautifulSoup(value, "html.parser").get_text(" ", strip=True)
+
+    assert script._strip_html_text(value) == expected
+
+
 def test_load_outlets_from_endpoint_json_payload(monkeypatch) -> None:
     payload = {
         "stores": [
@@ -167,10 +319,7 @@ def test_load_outlets_from_endpoint_json_payload(monkeypatch) -> None:
         ]
     }
 
-    def fake_get(url, timeout):
-        return DummyResponse(json_data=payload, headers={"content-type": "application/json"})
-
-    monkeypatch.setattr(script.httpx, "get", fake_get)
+    use_mock_transport(monkeypatch, lambda request: httpx.Response(200, json=payload))
 
     records = script.load_outlets_from_endpoint("https://example.com/outlets")
 
@@ -180,6 +329,20 @@ def test_load_outlets_from_endpoint_json_payload(monkeypatch) -> None:
     assert records[0].services == ["wifi", "delivery"]
 
 
+def test_parse_outlets_json_skips_records_failing_invariants() -> None:
+    payload = [
+        {"name": "ZUS Coffee SS 2", "address": "<p>No</p>"},
+        {"name": "ZU", "address": "No. 2, Jalan SS2/55, 47300 Petaling Jaya"},
+        {"name": "ZUS Coffee SS 15", "address": "No. 3, Jalan SS15/4, 47500 Subang Jaya", "services": ["wifi"]},
+    ]
+
+    records = script._parse_outlets_json(payload)
+
+    assert [record.name for record in records] == ["ZUS Coffee SS 15"]
+    assert records[0].services == ["wifi"]
+    assert records[0].postal_code == "47500"
+
+
 def test_load_outlets_from_endpoint_html_script(monkeypatch) -> None:
     html = """
     <html>
@@ -193,10 +356,10 @@ def test_load_outlets_from_endpoint_html_script(monkeypatch) -> None:
     </html>
     """
 
-    def fake_get(url, timeout):
-        return DummyResponse(text=html, headers={"content-type": "text/html"})
-
-    monkeypatch.setattr(script.httpx, "get", fake_get)
+    use_mock_transport(
+        monkeypatch,
+        lambda request: httpx.Response(200, text=html, headers={"content-type": "text/html"}),
+    )
 
     records = script.load_outlets_from_endpoint("https://example.com/outlets-html")
 
@@ -210,22 +373,20 @@ def test_load_outlets_from_endpoint_html_script(monkeypatch) -> None:
 
 
 def test_gather_records_prefers_endpoint(monkeypatch) -> None:
-    endpoint_records = [script.OutletRecord.model_validate(make_seed_record())]
+    endpoint_records = [make_record()]
     csv_records = [
-        script.OutletRecord.model_validate(
-            make_seed_record(
-                name="Fallback",
-                externalId="fallback-slug",
-                address="2 Example Avenue, 50000 Kuala Lumpur, Kuala Lumpur",
-                city="Kuala Lumpur",
-                state="Kuala Lumpur",
-                postalCode="50000",
-            )
+        make_record(
+            name="Fallback",
+            external_id="fallback-slug",
+            address="2 Example Avenue, 50000 Kuala Lumpur, Kuala Lumpur",
+            city="Kuala Lumpur",
+            state="Kuala Lumpur",
+            postal_code="50000",
         )
     ]
 
     monkeypatch.setattr(script, "load_outlets_from_endpoint", lambda url: endpoint_records)
-    monkeypatch.setattr(script, "load_outlets_from_csv", lambda path: csv_records)
+    monkeypatch.setattr(script, "iter_outlets_from_csv", lambda path: iter(csv_records))
 
     args = SimpleNamespace(
         endpoint="https://example.com/outlets",
@@ -257,8 +418,6 @@ def test_gather_records_falls_back_to_csv_when_endpoint_fails(monkeypatch, tmp_p
         raise ValueError("endpoint unavailable")
 
     monkeypatch.setattr(script, "load_outlets_from_endpoint", fail_endpoint)
-    real_load_csv = script.load_outlets_from_csv
-    monkeypatch.setattr(script, "load_outlets_from_csv", lambda path: real_load_csv(csv_path))
 
     args = SimpleNamespace(
         endpoint="https://example.com/outlets",
@@ -268,6 +427,8 @@ def test_gather_records_falls_back_to_csv_when_endpoint_fails(monkeypatch, tmp_p
     )
 
     records = script._gather_records(args)
+    assert not isinstance(records, list)
+    records = list(records)
 
     assert len(records) == 1
     assert records[0].name == "Fallback Store"
@@ -275,6 +436,17 @@ def test_gather_records_falls_back_to_csv_when_endpoint_fails(monkeypatch, tmp_p
     assert records[0].city == "Kajang"
 
 
+def test_gather_records_empty_csv_is_rejected_when_seeding(tmp_path: Path, db_session: Session) -> None:
+    csv_path = tmp_path / "outlets.csv"
+    write_csv(csv_path, [])
+    args = SimpleNamespace(endpoint=None, csv=csv_path, skip_endpoint=True, fail_on_endpoint_error=False)
+
+    records = script._gather_records(args)
+
+    with pytest.raises(ValueError, match="No outlet records"):
+        script.seed_outlets(records=records, session=db_session)
+
+
 def test_load_outlets_from_endpoint_html_uses_wp_api(monkeypatch) -> None:
     html = """
     <script type="text/javascript" id="ecs_ajax_load-js-extra">
@@ -282,10 +454,7 @@ def test_load_outlets_from_endpoint_html_uses_wp_api(monkeypatch) -> None:
     </script>
     """
 
-    def fake_get(url, timeout):
-        return DummyResponse(text=html, headers={"content-type": "text/html"})
-
-    def fake_fetch(endpoint, category_id):
+    def fake_fetch(endpoint, category_id, *, client):
         assert category_id == 64
         return [
             {
@@ -296,7 +465,10 @@ def test_load_outlets_from_endpoint_html_uses_wp_api(monkeypatch) -> None:
             }
         ]
 
-    monkeypatch.setattr(script.httpx, "get", fake_get)
+    use_mock_transport(
+        monkeypatch,
+        lambda request: httpx.Response(200, text=html, headers={"content-type": "text/html"}),
+    )
     monkeypatch.setattr(script, "_fetch_wp_category_posts", fake_fetch)
 
     records = script.load_outlets_from_endpoint("https://example.com/category/store/kuala-lumpur-selangor/")
@@ -309,50 +481,52 @@ def test_load_outlets_from_endpoint_html_uses_wp_api(monkeypatch) -> None:
     assert records[0].external_id == "zus-coffee-test-area"
 
 
-def test_default_db_url_prefers_postgres_when_backend_requests_it(monkeypatch) -> None:
-    override_settings(
-        monkeypatch,
+def test_fetch_wp_category_posts_reuses_client_across_pages() -> None:
+    requested_pages: list[int] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.path == "/wp-json/wp/v2/posts"
+        assert request.url.params["categories"] == "64"
+        page = int(request.url.params["page"])
+        requested_pages.append(page)
+        return httpx.Response(200, json=[{"id": page}], headers={"X-WP-TotalPages": "3"})
+
+    with httpx.Client(transport=httpx.MockTransport(handler)) as client:
+        posts = script._fetch_wp_category_posts(
+            "https://example.com/category/store/kuala-lumpur-selangor/", 64, client=client
+        )
+
+    assert [post["id"] for post in posts] == [1, 2, 3]
+    assert sorted(requested_pages) == [1, 2, 3]
+
+
+def test_default_db_url_prefers_postgres_when_backend_requests_it() -> None:
+    settings = db_settings(
         outlets_db_backend="postgres",
         outlets_postgres_url="postgresql+psycopg://supabase",
         outlets_sqlite_url="sqlite:///should-not-use.db",
     )
-    assert script._default_db_url() == "postgresql+psycopg://supabase"
+    assert script._default_db_url(settings) == "postgresql+psycopg://supabase"
 
 
-def test_default_db_url_raises_when_postgres_missing(monkeypatch) -> None:
-    override_settings(
-        monkeypatch,
+def test_default_db_url_raises_when_postgres_missing() -> None:
+    settings = db_settings(
         outlets_db_backend="postgres",
         outlets_postgres_url=None,
         outlets_sqlite_url="sqlite:///preferred.db",
     )
     with pytest.raises(ValueError):
-        script._default_db_url()
+        script._default_db_url(settings)
 
 
-def test_default_db_url_uses_legacy_sqlite_env(monkeypatch) -> None:
-    override_settings(
-        monkeypatch,
-        outlets_db_backend="sqlite",
-        outlets_sqlite_url="sqlite:///legacy.db",
-    )
+def test_default_db_url_uses_legacy_sqlite_env() -> None:
+    settings = db_settings(outlets_db_backend="sqlite", outlets_sqlite_url="sqlite:///legacy.db")
 
-    assert script._default_db_url() == "sqlite:///legacy.db"
+    assert script._default_db_url(settings) == "sqlite:///legacy.db"
 
 
-def test_default_db_url_falls_back_to_constant(monkeypatch, tmp_path: Path) -> None:
-    temp_db = tmp_path / "custom.db"
-    monkeypatch.setattr(
-        script,
-        "DEFAULT_SQLITE_DB_URL",
-        f"sqlite:///{temp_db}",
-    )
-    override_settings(
-        monkeypatch,
-        outlets_db_backend="sqlite",
-        outlets_sqlite_url="",
-        outlets_postgres_url=None,
-    )
+def test_default_db_url_falls_back_to_constant() -> None:
+    settings = db_settings(outlets_db_backend="sqlite", outlets_sqlite_url="", outlets_postgres_url=None)
 
-    assert script._default_db_url() == f"sqlite:///{temp_db}"
+    assert script._default_db_url(settings) == script.DEFAULT_SQLITE_DB_URL
 